@@ -1,14 +1,41 @@
+from datetime import datetime, time
+
+from django.utils import timezone
 from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAdminUser
 from .models import HistorialSesion, HistorialAccion
 from .serializers import HistorialSesionSerializer, HistorialAccionSerializer
+from .particiones import consultar
+
+
+class RangoAuditoriaMixin:
+    """?desde=YYYY-MM-DD&hasta=YYYY-MM-DD en los listados; la consulta solo toca los períodos del rango."""
+
+    def _fecha(self, parametro, hora):
+        valor = self.request.query_params.get(parametro)
+        if not valor:
+            return None
+        try:
+            return timezone.make_aware(datetime.combine(datetime.strptime(valor, '%Y-%m-%d').date(), hora))
+        except ValueError:
+            raise ValidationError({parametro: "Formato esperado: YYYY-MM-DD"})
 
-class HistorialSesionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = HistorialSesion.objects.all().order_by('-timestamp')
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        return consultar(queryset, self._fecha('desde', time.min), self._fecha('hasta', time.max))
+
+
+class HistorialSesionViewSet(RangoAuditoriaMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = HistorialSesion.objects.select_related('usuario').order_by('-timestamp', '-id')
     serializer_class = HistorialSesionSerializer
     permission_classes = [IsAdminUser]
+    orden_cursor = ('-timestamp', '-id')
 
-class HistorialAccionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = HistorialAccion.objects.all().order_by('-timestamp')
+class HistorialAccionViewSet(RangoAuditoriaMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = HistorialAccion.objects.select_related('usuario', 'content_type').order_by('-timestamp', '-id')
     serializer_class = HistorialAccionSerializer
-    permission_classes = [IsAdminUser]
\ No newline at end of file
+    permission_classes = [IsAdminUser]
+    orden_cursor = ('-timestamp', '-id')
\ No newline at end of file
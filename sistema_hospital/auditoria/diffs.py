@@ -0,0 +1,42 @@
+from functools import lru_cache
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+# Diferencias por campo para HistorialAccion.cambios: {"campo": [antes, despues], ...}
+# Se trabaja sobre los valores ya cargados en la instancia (attname, p.ej. "madre_id"), sin
+# consultar la base, y solo se convierten a JSON los campos que cambiaron.
+
+_codificador = DjangoJSONEncoder()
+
+# Nunca se copian al historial.
+CAMPOS_EXCLUIDOS = {'password'}
+
+
+@lru_cache(maxsize=None)
+def _campos(modelo):
+    return tuple(f.attname for f in modelo._meta.concrete_fields if f.attname not in CAMPOS_EXCLUIDOS)
+
+
+def _json(valor):
+    if valor is None or isinstance(valor, (str, int, float, bool)):
+        return valor
+    try:
+        return _codificador.default(valor)
+    except TypeError:
+        return str(valor)
+
+
+def instantanea(instance):
+    valores = instance.__dict__
+    return {campo: valores.get(campo) for campo in _campos(type(instance))}
+
+
+def diferencias(antes, instance):
+    """Compara una instantánea previa con el estado actual de la instancia."""
+    valores = instance.__dict__
+    return {
+        campo: [_json(previo), _json(valores.get(campo))]
+        for campo, previo in antes.items()
+        if valores.get(campo) != previo
+    }
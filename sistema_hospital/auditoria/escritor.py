@@ -0,0 +1,220 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import HistorialAccion
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos, se asume un único proceso escritor.
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+# Escritura diferida de HistorialAccion.
+#
+# Cada evento se agrega primero a un archivo spool propio del escritor (auditoria-<pid>-<id>.jsonl,
+# con un id aleatorio por arranque: un PID reutilizado, habitual en contenedores, no reabre el
+# spool que dejó otro proceso) y luego a la cola en memoria. Un hilo en segundo plano vacía la cola con bulk_create cuando junta
+# AUDITORIA_LOTE eventos o pasan AUDITORIA_INTERVALO segundos. Al vaciar, el spool activo se rota
+# a un segmento que contiene exactamente los eventos del lote y se borra cuando el INSERT se
+# confirma. Si el proceso muere o la base falla, el segmento queda en disco sin bloqueo y se
+# reenvía al arrancar el siguiente escritor (o en el siguiente ciclo). La entrega es "al menos
+# una vez": una caída entre el COMMIT y el borrado del segmento puede duplicar ese lote.
+
+REINTENTO_HUERFANOS = 30  # segundos entre búsquedas de segmentos sin dueño
+
+# bulk_create no dispara post_save: quien cachea datos de auditoría escucha esta señal (kwarg `cantidad`).
+auditoria_guardada = Signal()
+
+
+def _bloquear(archivo):
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _evento_a_modelo(evento):
+    return HistorialAccion(
+        usuario_id=evento['usuario_id'],
+        accion=evento['accion'],
+        content_type_id=evento['content_type_id'],
+        object_id=evento['object_id'],
+        detalles=evento['detalles'],
+        cambios=evento.get('cambios'),
+        timestamp=parse_datetime(evento['timestamp']),
+    )
+
+
+def guardar_eventos(eventos):
+    with transaction.atomic():
+        HistorialAccion.objects.bulk_create([_evento_a_modelo(e) for e in eventos], batch_size=500)
+        auditoria_guardada.send(sender=HistorialAccion, cantidad=len(eventos))
+
+
+class EscritorAuditoria:
+
+    def __init__(self, directorio, tamano_lote, intervalo):
+        self.directorio = directorio
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self._cond = threading.Condition()
+        self._pendientes = []
+        self._archivo = None
+        self._pid = None
+        self._nombre = None
+        self._segmentos = 0
+
+    def _ruta_activa(self):
+        return os.path.join(self.directorio, f'{self._nombre}.jsonl')
+
+    def _abrir_activo(self):
+        # 'x': el spool activo siempre es nuevo. Lo que haya en disco con otro nombre es de un
+        # proceso anterior y lo reenvía reenviar_huerfanos; vaciar() rota este archivo entero.
+        self._archivo = open(self._ruta_activa(), 'x', encoding='utf-8')
+        _bloquear(self._archivo)
+
+    def _iniciar(self):
+        # Se llama con el lock tomado. Tras un fork el hijo no hereda el hilo: se reinicia todo.
+        if self._pid == os.getpid():
+            return
+        os.makedirs(self.directorio, exist_ok=True)
+        self._pid = os.getpid()
+        self._nombre = f'auditoria-{self._pid}-{uuid.uuid4().hex[:12]}'
+        self._segmentos = 0
+        self._pendientes = []
+        self._abrir_activo()
+        threading.Thread(target=self._bucle, name='escritor-auditoria', daemon=True).start()
+        atexit.register(self.vaciar)
+
+    def iniciar(self):
+        """Arranca el hilo (que reenvía de inmediato los spools huérfanos) si aún no corre en este proceso."""
+        with self._cond:
+            self._iniciar()
+
+    def registrar(self, evento):
+        linea = json.dumps(evento, ensure_ascii=False) + '\n'
+        with self._cond:
+            self._iniciar()
+            self._archivo.write(linea)
+            self._archivo.flush()
+            self._pendientes.append(evento)
+            if len(self._pendientes) >= self.tamano_lote:
+                self._cond.notify()
+
+    def vaciar(self):
+        """Escribe en la base todo lo encolado hasta ahora. Bloquea hasta terminar."""
+        with self._cond:
+            if not self._pendientes:
+                return 0
+            lote, self._pendientes = self._pendientes, []
+            self._segmentos += 1
+            segmento = f'{self._ruta_activa()}.{self._segmentos}.lote'
+            # Renombrar antes de cerrar: el segmento sigue bloqueado por este proceso mientras se envía.
+            os.replace(self._ruta_activa(), segmento)
+            archivo_lote = self._archivo
+            self._abrir_activo()
+
+        try:
+            guardar_eventos(lote)
+        except Exception:
+            logger.exception("No se pudo guardar un lote de %d eventos de auditoría; queda en %s", len(lote), segmento)
+        else:
+            os.remove(segmento)
+        finally:
+            archivo_lote.close()
+        return len(lote)
+
+    def reenviar_huerfanos(self):
+        """Reenvía los segmentos que no tienen un proceso dueño (caídas o lotes que fallaron)."""
+        reenviados = 0
+        for ruta in sorted(glob.glob(os.path.join(self.directorio, 'auditoria-*-*.jsonl*'))):
+            with open(ruta, 'r+', encoding='utf-8') as archivo:
+                if not _bloquear(archivo) or (fcntl is None and ruta == self._ruta_activa()):
+                    continue
+                eventos = []
+                for linea in archivo:
+                    try:
+                        eventos.append(json.loads(linea))
+                    except ValueError:
+                        pass  # última línea truncada por una caída a mitad de escritura
+                if not eventos and time.time() - os.path.getmtime(ruta) < REINTENTO_HUERFANOS:
+                    continue  # recién creado: su dueño puede no haberlo bloqueado todavía
+                try:
+                    if eventos:
+                        guardar_eventos(eventos)
+                except Exception:
+                    logger.exception("No se pudo reenviar el spool de auditoría %s", ruta)
+                    continue
+                os.remove(ruta)
+                reenviados += len(eventos)
+        if reenviados:
+            logger.info("Reenviados %d eventos de auditoría desde el spool", reenviados)
+        return reenviados
+
+    def _bucle(self):
+        ultimo_reintento = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._pendientes) >= self.tamano_lote, timeout=self.intervalo)
+            close_old_connections()
+            try:
+                if time.monotonic() - ultimo_reintento > REINTENTO_HUERFANOS:
+                    ultimo_reintento = time.monotonic()
+                    self.reenviar_huerfanos()
+                self.vaciar()
+            except Exception:
+                logger.exception("Error en el escritor de auditoría")
+
+
+_escritor = None
+_lock_escritor = threading.Lock()
+
+
+def escritor_auditoria():
+    global _escritor
+    with _lock_escritor:
+        if _escritor is None:
+            _escritor = EscritorAuditoria(
+                settings.AUDITORIA_SPOOL_DIR, settings.AUDITORIA_LOTE, settings.AUDITORIA_INTERVALO,
+            )
+    return _escritor
+
+
+def registrar_evento(usuario_id, accion, content_type_id, object_id, detalles, cambios=None):
+    evento = {
+        'usuario_id': usuario_id,
+        'accion': accion,
+        'content_type_id': content_type_id,
+        'object_id': object_id,
+        'detalles': detalles,
+        'cambios': cambios,
+        'timestamp': timezone.now().isoformat(),
+    }
+    if settings.AUDITORIA_ASINCRONA:
+        escritor_auditoria().registrar(evento)
+    else:
+        guardar_eventos([evento])
+
+
+def vaciar_auditoria():
+    """Hook explícito (tests, comandos, cierre): fuerza la escritura de los eventos pendientes."""
+    if _escritor is not None:
+        return _escritor.vaciar()
+    return 0
@@ -0,0 +1,61 @@
+import gzip
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from auditoria.particiones import MODELOS, periodo, periodos_separados, filas_periodo, eliminar_periodo, tabla_periodo
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve los meses de auditoría más antiguos que --meses-retencion a archivos JSONL comprimidos '
+        '(<tabla>_pYYYYMM.jsonl.gz) y los quita de la base.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses-retencion', type=int, default=settings.AUDITORIA_MESES_RETENCION)
+        parser.add_argument('--destino', default=settings.AUDITORIA_ARCHIVO_DIR)
+        parser.add_argument('--modelo', choices=[*MODELOS, 'todos'], default='todos')
+        parser.add_argument('--simular', action='store_true', help='Solo listar los períodos que se archivarían.')
+
+    def handle(self, *args, **opts):
+        corte = periodo(timezone.now())
+        for _ in range(opts['meses_retencion']):
+            anio, mes = divmod(corte, 100)
+            corte = (anio - 1) * 100 + 12 if mes == 1 else corte - 1
+
+        os.makedirs(opts['destino'], exist_ok=True)
+        modelos = MODELOS if opts['modelo'] == 'todos' else {opts['modelo']: MODELOS[opts['modelo']]}
+        for nombre, modelo in modelos.items():
+            meses = {periodo(m) for m in modelo.objects.dates('timestamp', 'month')} | set(periodos_separados(modelo))
+            for per in sorted(m for m in meses if m < corte):
+                if opts['simular']:
+                    self.stdout.write(f"{nombre}: se archivaría {per}")
+                    continue
+                ruta = os.path.join(opts['destino'], f"{tabla_periodo(modelo, per)}.jsonl.gz")
+                filas = self._escribir(ruta, filas_periodo(modelo, per))
+                eliminar_periodo(modelo, per)
+                self.stdout.write(f"{nombre}: {filas} filas de {per} -> {ruta}")
+        self.stdout.write(self.style.SUCCESS('Archivado terminado.'))
+
+    def _escribir(self, ruta, filas):
+        # Se escribe a un temporal y se renombra: el período solo se borra de la base si el archivo quedó completo.
+        # Si ya existe un archivo del mismo período (p.ej. filas que llegaron tarde), se agrega un sufijo.
+        destino, n = ruta, 1
+        while os.path.exists(destino):
+            n += 1
+            destino = ruta.replace('.jsonl.gz', f'.{n}.jsonl.gz')
+        temporal = destino + '.tmp'
+        total = 0
+        with gzip.open(temporal, 'wt', encoding='utf-8') as f:
+            for fila in filas:
+                f.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+                total += 1
+        with open(temporal, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(temporal, destino)
+        return total
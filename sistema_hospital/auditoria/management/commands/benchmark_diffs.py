@@ -0,0 +1,44 @@
+import timeit
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from auditoria.diffs import instantanea, diferencias
+from dashboard.models import Madre, RegistroParto, RecienNacido
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark del cálculo de diffs de auditoría (instantánea + comparación), sin base de datos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=100_000)
+
+    def handle(self, *args, **opts):
+        ahora = timezone.now()
+        instancias = {
+            'Madre': Madre(id=1, rut='12345678-5', nombre='María Pérez', fecha_nacimiento=ahora.date(), nacionalidad='Chilena'),
+            'RegistroParto': RegistroParto(
+                id=1, madre_id=1, registrado_por_id=1, fecha_parto=ahora, edad_gestacional_semanas=39,
+                personal_atiende='Matrona Soto', tipo_parto_id=1, tipo_analgesia_id=1,
+            ),
+            'RecienNacido': RecienNacido(
+                id=1, parto_asociado_id=1, sexo='F', peso_grs=3400, talla_cm=Decimal('50.5'),
+                apgar_1_min=8, apgar_5_min=9,
+            ),
+        }
+        n = opts['iteraciones']
+        for nombre, obj in instancias.items():
+            antes = instantanea(obj)
+            t_inst = timeit.timeit(lambda: instantanea(obj), number=n) / n * 1e6
+            t_igual = timeit.timeit(lambda: diferencias(antes, obj), number=n) / n * 1e6
+
+            campo_fecha = 'fecha_alta' if hasattr(obj, 'fecha_alta') else 'fecha_parto'
+            setattr(obj, campo_fecha, ahora + timedelta(days=2))
+            t_cambio = timeit.timeit(lambda: diferencias(antes, obj), number=n) / n * 1e6
+            self.stdout.write(
+                f"{nombre:14} instantánea {t_inst:5.2f} µs | diff sin cambios {t_igual:5.2f} µs | "
+                f"diff con 1 cambio {t_cambio:5.2f} µs -> {diferencias(antes, obj)}"
+            )
+
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from auditoria.particiones import MODELOS, es_postgres, periodo, siguiente, periodos_separados, crear_particion
+
+
+class Command(BaseCommand):
+    help = 'PostgreSQL: crea por adelantado las particiones mensuales de auditoría. En otros motores no hace nada.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses-adelante', type=int, default=3)
+
+    def handle(self, *args, **opts):
+        if not es_postgres():
+            self.stdout.write('Sin particiones en este motor: nada que hacer.')
+            return
+        actual = periodo(timezone.now())
+        for nombre, modelo in MODELOS.items():
+            existentes = set(periodos_separados(modelo))
+            per = actual
+            for _ in range(opts['meses_adelante'] + 1):
+                if per not in existentes:
+                    crear_particion(modelo, per)
+                    self.stdout.write(f"{nombre}: partición {per} creada")
+                per = siguiente(per)
+        self.stdout.write(self.style.SUCCESS('Particiones de auditoría al día.'))
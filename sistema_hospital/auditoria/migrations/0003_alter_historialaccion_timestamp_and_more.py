@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0002_historialaccion_usuario_historialsesion_usuario'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historialaccion',
+            name='timestamp',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='historialsesion',
+            name='timestamp',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0003_alter_historialaccion_timestamp_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historialaccion',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
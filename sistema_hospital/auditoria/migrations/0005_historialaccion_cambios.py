@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0004_alter_historialaccion_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historialaccion',
+            name='cambios',
+            field=models.JSONField(blank=True, null=True, verbose_name='Campos modificados'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+
+# Solo PostgreSQL: convierte las tablas de auditoría en tablas particionadas por mes
+# (RANGE sobre timestamp). En otros motores no hace nada; ver auditoria/particiones.py.
+#
+# Una tabla particionada exige que la PK incluya la columna de partición, así que en la base la
+# PK pasa a ser (id, timestamp). Django sigue usando `id`, que sigue siendo único porque sale de
+# una secuencia. La columna id deja de ser IDENTITY (no soportado en tablas particionadas antes
+# de PostgreSQL 17) y pasa a tomar su valor de una secuencia con el nombre habitual.
+
+TABLAS = ('auditoria_historialaccion', 'auditoria_historialsesion')
+MESES_ADELANTE = 3
+
+
+def _periodos(desde, hasta):
+    anio, mes = desde.year, desde.month
+    while (anio, mes) <= (hasta.year, hasta.month):
+        yield anio, mes
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+
+def _limites(anio, mes):
+    inicio = datetime(anio, mes, 1, tzinfo=timezone.utc)
+    fin = datetime(anio + mes // 12, mes % 12 + 1, 1, tzinfo=timezone.utc)
+    return inicio, fin
+
+
+def particionar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    ahora = datetime.now(timezone.utc)
+    anio, mes = ahora.year, ahora.month + MESES_ADELANTE
+    anio, mes = anio + (mes - 1) // 12, (mes - 1) % 12 + 1
+    hasta = datetime(anio, mes, 1, tzinfo=timezone.utc)
+
+    with schema_editor.connection.cursor() as cursor:
+        for tabla in TABLAS:
+            previa = f'{tabla}_previa'
+            cursor.execute(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND contype = 'f'", [tabla],
+            )
+            foraneas = cursor.fetchall()
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s "
+                "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p')",
+                [tabla, tabla],
+            )
+            indices = cursor.fetchall()
+            cursor.execute(f'SELECT MIN("timestamp"), MAX(id) FROM {tabla}')
+            minimo, max_id = cursor.fetchone()
+
+            cursor.execute(f'ALTER TABLE {tabla} RENAME TO {previa}')
+            cursor.execute(
+                f'CREATE TABLE {tabla} (LIKE {previa} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                f'PARTITION BY RANGE ("timestamp")'
+            )
+            cursor.execute(f'ALTER TABLE {tabla} ADD PRIMARY KEY (id, "timestamp")')
+            cursor.execute(f'CREATE TABLE {tabla}_default PARTITION OF {tabla} DEFAULT')
+            for anio, mes in _periodos(minimo or ahora, hasta):
+                inicio, fin = _limites(anio, mes)
+                cursor.execute(
+                    f'CREATE TABLE {tabla}_p{anio * 100 + mes} PARTITION OF {tabla} FOR VALUES FROM (%s) TO (%s)',
+                    [inicio.isoformat(), fin.isoformat()],
+                )
+            cursor.execute(f'INSERT INTO {tabla} SELECT * FROM {previa}')
+            cursor.execute(f'DROP TABLE {previa}')
+
+            cursor.execute(f'CREATE SEQUENCE {tabla}_id_seq START WITH {(max_id or 0) + 1} OWNED BY {tabla}.id')
+            cursor.execute(f"ALTER TABLE {tabla} ALTER COLUMN id SET DEFAULT nextval('{tabla}_id_seq')")
+            # Las definiciones se leyeron antes del RENAME: apuntan al nombre original, que ahora es la particionada.
+            for nombre, definicion in indices:
+                cursor.execute(definicion)
+            for nombre, definicion in foraneas:
+                cursor.execute(f'ALTER TABLE {tabla} ADD CONSTRAINT {nombre} {definicion}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0005_historialaccion_cambios'),
+    ]
+
+    # Sin reversa: volver a una tabla simple requiere copiar los datos a mano.
+    operations = [
+        migrations.RunPython(particionar, migrations.RunPython.noop),
+    ]
@@ -1,25 +1,36 @@
+import logging
+
 from django.contrib.contenttypes.models import ContentType
-from .models import HistorialAccion
+from .escritor import registrar_evento
+from .diffs import instantanea, diferencias
+
+logger = logging.getLogger(__name__)
 
 class AuditoriaMixin:
-    def registrar_accion(self, instance, accion, detalles=""):
+    # Los eventos se encolan y se escriben por lotes fuera del request (ver auditoria/escritor.py).
+    # ContentType.objects.get_for_model usa la caché por proceso del manager: no consulta tras la primera vez.
+    def registrar_accion(self, instance, accion, detalles="", cambios=None):
         try:
-            HistorialAccion.objects.create(
-                usuario=self.request.user,
+            registrar_evento(
+                usuario_id=self.request.user.pk,
                 accion=accion,
-                objeto_afectado=instance,
-                detalles=detalles or f"Acción {accion} realizada sobre {instance}"
+                content_type_id=ContentType.objects.get_for_model(instance).pk,
+                object_id=instance.pk,
+                detalles=detalles or f"Acción {accion} realizada sobre {instance}",
+                cambios=cambios
             )
-        except Exception as e:
-            print(f"Error generando auditoría: {e}")
+        except Exception:
+            logger.exception("Error generando auditoría de %s sobre %r", accion, instance)
 
     def perform_create(self, serializer):
         instance = serializer.save()
         self.registrar_accion(instance, 'creacion')
 
     def perform_update(self, serializer):
+        # serializer.instance es el objeto que ya cargó get_object(): se compara contra él, sin otro SELECT.
+        antes = instantanea(serializer.instance)
         instance = serializer.save()
-        self.registrar_accion(instance, 'modificacion')
+        self.registrar_accion(instance, 'modificacion', cambios=diferencias(antes, instance))
 
     def perform_destroy(self, instance):
         content_type = ContentType.objects.get_for_model(instance)
@@ -28,10 +39,10 @@ class AuditoriaMixin:
 
         instance.delete()
 
-        HistorialAccion.objects.create(
-            usuario=self.request.user,
+        registrar_evento(
+            usuario_id=self.request.user.pk,
             accion='eliminacion',
-            content_type=content_type,
+            content_type_id=content_type.pk,
             object_id=object_id,
             detalles=f"Eliminó el registro: {str_repr}"
-        )
\ No newline at end of file
+        )
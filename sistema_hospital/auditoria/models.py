@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class HistorialSesion(models.Model):
@@ -9,7 +10,7 @@ class HistorialSesion(models.Model):
     )
 
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
     accion = models.CharField(max_length=10, choices=ACCION_CHOICES)
     ip_address = models.GenericIPAddressField(null=True, blank=True) 
 
@@ -36,12 +37,14 @@ class HistorialAccion(models.Model):
     )
 
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # default y no auto_now_add: el escritor por lotes conserva la hora del evento, no la del INSERT.
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     accion = models.CharField(max_length=15, choices=ACCION_CHOICES)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     objeto_afectado = GenericForeignKey('content_type', 'object_id')
     detalles = models.TextField(blank=True, null=True, verbose_name="Detalles del cambio")
+    cambios = models.JSONField(blank=True, null=True, verbose_name="Campos modificados")  # {"campo": [antes, después]}
 
     def __str__(self):
         return f"{self.usuario} - {self.accion} en {self.content_type.model} (ID: {self.object_id})"
@@ -0,0 +1,117 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .models import HistorialAccion, HistorialSesion
+
+
+# Almacenamiento por período (mes) de las tablas de auditoría.
+#
+# PostgreSQL: la migración 0006 convierte ambas tablas en tablas particionadas por RANGE(timestamp)
+# con una partición por mes (<tabla>_pYYYYMM) y una partición DEFAULT; el planner descarta solas
+# las particiones fuera del rango consultado.
+#
+# Otros motores (SQLite en desarrollo y tests): una sola tabla, y el archivado borra las filas del
+# mes por rango.
+
+MODELOS = {'accion': HistorialAccion, 'sesion': HistorialSesion}
+
+
+def es_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def periodo(fecha):
+    return fecha.year * 100 + fecha.month
+
+
+def limites(per):
+    """[inicio, fin) del período YYYYMM, en UTC."""
+    anio, mes = divmod(per, 100)
+    inicio = datetime(anio, mes, 1, tzinfo=dt_timezone.utc)
+    fin = datetime(anio + mes // 12, mes % 12 + 1, 1, tzinfo=dt_timezone.utc)
+    return inicio, fin
+
+
+def siguiente(per):
+    anio, mes = divmod(per, 100)
+    return (anio + 1) * 100 + 1 if mes == 12 else per + 1
+
+
+def tabla_periodo(modelo, per):
+    return f"{modelo._meta.db_table}_p{per}"
+
+
+def _q(nombre):
+    return connection.ops.quote_name(nombre)
+
+
+def _ts(valor):
+    return connection.ops.adapt_datetimefield_value(valor)
+
+
+def _periodos_de(modelo, nombres):
+    prefijo = f"{modelo._meta.db_table}_p"
+    return sorted((int(n[len(prefijo):]) for n in nombres if n[len(prefijo):].isdigit()), reverse=True)
+
+
+def periodos_separados(modelo):
+    """PostgreSQL: períodos con partición propia, más nuevo primero. En otros motores no hay."""
+    if not es_postgres():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s",
+            [modelo._meta.db_table],
+        )
+        return _periodos_de(modelo, [fila[0] for fila in cursor.fetchall()])
+
+
+def crear_particion(modelo, per):
+    """PostgreSQL: crea la partición mensual, rescatando de DEFAULT las filas que le correspondan."""
+    tabla, nueva = modelo._meta.db_table, tabla_periodo(modelo, per)
+    inicio, fin = limites(per)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {_q(nueva)} (LIKE {_q(tabla)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(
+            f"WITH movidas AS (DELETE FROM {_q(tabla + '_default')} WHERE timestamp >= %s AND timestamp < %s RETURNING *) "
+            f"INSERT INTO {_q(nueva)} SELECT * FROM movidas",
+            [inicio, fin],
+        )
+        cursor.execute(
+            f"ALTER TABLE {_q(tabla)} ATTACH PARTITION {_q(nueva)} FOR VALUES FROM (%s) TO (%s)",
+            [inicio.isoformat(), fin.isoformat()],
+        )
+
+
+def eliminar_periodo(modelo, per):
+    """Quita un período ya archivado: su partición en PostgreSQL, o sus filas en la tabla principal."""
+    tabla = modelo._meta.db_table
+    inicio, fin = limites(per)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if per in periodos_separados(modelo):
+            cursor.execute(f"ALTER TABLE {_q(tabla)} DETACH PARTITION {_q(tabla_periodo(modelo, per))}")
+            cursor.execute(f"DROP TABLE {_q(tabla_periodo(modelo, per))}")
+        else:
+            cursor.execute(f"DELETE FROM {_q(tabla)} WHERE timestamp >= %s AND timestamp < %s", [_ts(inicio), _ts(fin)])
+
+
+def filas_periodo(modelo, per, lote=5000):
+    """Filas crudas (dict columna -> valor) de un período, leídas por lotes, para archivarlas."""
+    inicio, fin = limites(per)
+    yield from modelo.objects.filter(timestamp__gte=inicio, timestamp__lt=fin).order_by('timestamp', 'id').values().iterator(chunk_size=lote)
+
+
+def consultar(queryset, desde=None, hasta=None):
+    """Filtra un listado de auditoría por rango; en PostgreSQL, el planner solo recorre las particiones del rango."""
+    if desde:
+        queryset = queryset.filter(timestamp__gte=desde)
+    if hasta:
+        queryset = queryset.filter(timestamp__lte=hasta)
+    return queryset
+
+
+def ultimos(queryset, n):
+    """Los n más recientes sin COUNT: un escaneo del índice de timestamp."""
+    return list(queryset.order_by('-timestamp', '-id')[:n])
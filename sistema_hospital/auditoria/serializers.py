@@ -20,4 +20,4 @@ class HistorialAccionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = HistorialAccion
-        fields = ['id', 'usuario', 'timestamp', 'accion', 'content_type_model', 'object_id', 'detalles']
\ No newline at end of file
+        fields = ['id', 'usuario', 'timestamp', 'accion', 'content_type_model', 'object_id', 'detalles', 'cambios']
\ No newline at end of file
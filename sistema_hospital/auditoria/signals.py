@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.core.signals import request_started
 from django.dispatch import receiver
 from .models import HistorialSesion
+from .escritor import escritor_auditoria
 
 def get_client_ip(request):
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -25,4 +28,12 @@ def registrar_logout(sender, request, user, **kwargs):
             usuario=user, 
             accion='logout',
             ip_address=get_client_ip(request)
-        )
\ No newline at end of file
+        )
+
+@receiver(request_started, dispatch_uid='auditoria_iniciar_escritor')
+def iniciar_escritor_auditoria(sender, **kwargs):
+    # Primer request del proceso: arranca el escritor para reenviar lo que quedó en el spool.
+    # No se hace en ready() para no tocar la base durante migrate y otros comandos.
+    request_started.disconnect(dispatch_uid='auditoria_iniciar_escritor')
+    if settings.AUDITORIA_ASINCRONA:
+        escritor_auditoria().iniciar()
@@ -1,3 +1,187 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
+
+from cuentas.models import CustomUser
+from dashboard.models import Madre, RegistroParto, RecienNacido
+from sistema_hospital.pruebas import ajustes_prueba
+from .diffs import diferencias, instantanea
+from .escritor import EscritorAuditoria
+from .models import HistorialAccion
+from .particiones import crear_particion, periodo, periodos_separados, tabla_periodo
+
+
+@ajustes_prueba
+class EscritorAuditoriaTests(TestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+        # Sin hilo ni atexit: el test llama a vaciar() y reenviar_huerfanos() directamente.
+        for objetivo in ('auditoria.escritor.threading.Thread', 'auditoria.escritor.atexit'):
+            parche = mock.patch(objetivo)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def _evento(self, detalles):
+        return {
+            'usuario_id': None, 'accion': 'creacion', 'object_id': 1, 'detalles': detalles,
+            'content_type_id': ContentType.objects.get_for_model(CustomUser).pk,
+            'timestamp': timezone.now().isoformat(),
+        }
+
+    def test_pid_reutilizado_no_pierde_el_spool_anterior(self):
+        # Un proceso anterior con el mismo PID murió con eventos sin enviar: su spool activo y un segmento.
+        previo = f'auditoria-{os.getpid()}-{uuid.uuid4().hex[:12]}.jsonl'
+        anteriores = [previo, f'{previo}.1.lote']
+        for nombre in anteriores:
+            with open(os.path.join(self.directorio, nombre), 'w', encoding='utf-8') as archivo:
+                archivo.write(json.dumps(self._evento(nombre)) + '\n')
+
+        escritor = EscritorAuditoria(self.directorio, tamano_lote=100, intervalo=1.0)
+        escritor.registrar(self._evento('nuevo'))
+        self.assertEqual(escritor.vaciar(), 1)
+        self.assertEqual(escritor.reenviar_huerfanos(), 2)
+
+        self.assertEqual(sorted(HistorialAccion.objects.values_list('detalles', flat=True)), sorted(['nuevo', *anteriores]))
+        # Solo queda el spool activo (vacío) del escritor actual.
+        self.assertEqual(os.listdir(self.directorio), [os.path.basename(escritor._ruta_activa())])
+
+
+@ajustes_prueba
+class ParticionesAuditoriaTests(TestCase):
+    ANTIGUO = 202001
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', rol=CustomUser.ADMIN, is_staff=True)
+        tipo = ContentType.objects.get_for_model(CustomUser)
+        cls.antigua = HistorialAccion.objects.create(
+            usuario=cls.admin, accion='creacion', content_type=tipo, object_id=1,
+            timestamp=datetime(2020, 1, 15, tzinfo=dt_timezone.utc),
+        )
+        cls.reciente = HistorialAccion.objects.create(usuario=cls.admin, accion='modificacion', content_type=tipo, object_id=1)
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.admin)
+        self.destino = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.destino)
+
+    def _ids_en(self, consulta):
+        respuesta = self.cliente.get(f'/auditoria/api/acciones/{consulta}')
+        self.assertEqual(respuesta.status_code, 200)
+        return [fila['id'] for fila in respuesta.json()['results']]
+
+    def _archivar(self):
+        call_command('archivar_auditoria', modelo='accion', meses_retencion=1, destino=self.destino, stdout=io.StringIO())
+        with gzip.open(os.path.join(self.destino, f'{tabla_periodo(HistorialAccion, self.ANTIGUO)}.jsonl.gz'), 'rt') as archivo:
+            return [json.loads(linea)['id'] for linea in archivo]
+
+    def test_lista_por_rango_y_detalle(self):
+        self.assertEqual(self._ids_en('?desde=2020-01-01&hasta=2020-01-31'), [self.antigua.pk])
+        self.assertEqual(self._ids_en(''), [self.reciente.pk, self.antigua.pk])
+        self.assertEqual(self.cliente.get(f'/auditoria/api/acciones/{self.antigua.pk}/').status_code, 200)
+
+    def test_archivar_quita_el_mes_de_la_base(self):
+        self.assertEqual(self._archivar(), [self.antigua.pk])
+        self.assertEqual(list(HistorialAccion.objects.values_list('pk', flat=True)), [self.reciente.pk])
+
+    @skipUnless(connection.vendor == 'postgresql', 'particiones nativas de PostgreSQL (migración 0006)')
+    def test_postgres_particion_mensual(self):
+        call_command('mantener_particiones_auditoria', stdout=io.StringIO())
+        crear_particion(HistorialAccion, self.ANTIGUO)  # rescata la fila antigua de la partición DEFAULT
+        self.assertIn(periodo(timezone.now()), periodos_separados(HistorialAccion))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id, tableoid::regclass::text FROM auditoria_historialaccion ORDER BY id')
+            self.assertEqual(cursor.fetchall(), [
+                (self.antigua.pk, tabla_periodo(HistorialAccion, self.ANTIGUO)),
+                (self.reciente.pk, tabla_periodo(HistorialAccion, periodo(self.reciente.timestamp))),
+            ])
+        self.assertEqual(self._ids_en('?desde=2020-01-01&hasta=2020-01-31'), [self.antigua.pk])
+        self.assertEqual(self.cliente.get(f'/auditoria/api/acciones/{self.antigua.pk}/').status_code, 200)
+
+        self.assertEqual(self._archivar(), [self.antigua.pk])
+        self.assertNotIn(self.ANTIGUO, periodos_separados(HistorialAccion))
+
+
+@ajustes_prueba
+class DiffsAuditoriaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = CustomUser.objects.create(username='doctor', rol=CustomUser.DOCTOR)
+        cls.madre = Madre.objects.create(rut='15.000.000-9', nombre='Ana Soto', fecha_nacimiento=date(1990, 1, 1))
+        parto = RegistroParto.objects.create(madre=cls.madre, fecha_parto=timezone.now(), edad_gestacional_semanas=39)
+        cls.rn = RecienNacido.objects.create(
+            parto_asociado=parto, sexo='F', peso_grs=3200, talla_cm=Decimal('49.5'), apgar_1_min=8, apgar_5_min=9,
+        )
+
+    def test_instantanea_por_attname_sin_password(self):
+        self.assertNotIn('password', instantanea(self.doctor))
+        antes = instantanea(self.rn)
+        self.assertEqual(antes['parto_asociado_id'], self.rn.parto_asociado_id)
+        self.assertNotIn('parto_asociado', antes)
+
+    def test_diferencias(self):
+        antes = instantanea(self.rn)
+        self.assertEqual(diferencias(antes, self.rn), {})
+
+        fecha = datetime(2024, 5, 1, 10, 30, 15, 250000, tzinfo=dt_timezone.utc)
+        self.rn.fecha_alta, self.rn.talla_cm, self.rn.responsable_medico = fecha, Decimal('50.0'), self.doctor
+        cambios = diferencias(antes, self.rn)
+        self.assertEqual(cambios, {
+            'fecha_alta': [None, '2024-05-01T10:30:15.250Z'],
+            'talla_cm': ['49.5', '50.0'],
+            'responsable_medico_id': [None, self.doctor.pk],
+        })
+        json.dumps(cambios)
+
+        usuario = instantanea(self.doctor)
+        self.doctor.set_password('otra-clave')
+        self.doctor.first_name = 'Ana'
+        self.assertEqual(diferencias(usuario, self.doctor), {'first_name': ['', 'Ana']})
+
+    def _cambios(self, url):
+        cliente = APIClient()
+        cliente.force_authenticate(self.doctor)
+        respuesta = cliente.post(url)
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return HistorialAccion.objects.latest('id').cambios
+
+    def assertFechaCambiada(self, cambio, valor):
+        # DjangoJSONEncoder guarda milisegundos.
+        self.assertIsNone(cambio[0])
+        self.assertLess(abs(parse_datetime(cambio[1]) - valor), timedelta(milliseconds=1))
+
+    def test_cambios_de_alta_y_defuncion(self):
+        for instancia, url, fallecido in (
+            (self.madre, f'/dashboard/api/madres/{self.madre.pk}/', 'fallecida'),
+            (self.rn, f'/dashboard/api/recien-nacidos/{self.rn.pk}/', 'fallecido'),
+        ):
+            with self.subTest(modelo=type(instancia).__name__):
+                cambios = self._cambios(f'{url}dar_alta/')
+                instancia.refresh_from_db()
+                self.assertFechaCambiada(cambios.pop('fecha_alta'), instancia.fecha_alta)
+                self.assertEqual(cambios, {'responsable_medico_id': [None, self.doctor.pk]})
 
-# Create your tests here.
+                # El responsable ya era el mismo doctor: no aparece en el segundo diff.
+                cambios = self._cambios(f'{url}registrar_defuncion/')
+                instancia.refresh_from_db()
+                self.assertFechaCambiada(cambios.pop('fecha_fallecimiento'), instancia.fecha_fallecimiento)
+                self.assertEqual(cambios, {fallecido: [False, True]})
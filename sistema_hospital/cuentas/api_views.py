@@ -1,26 +1,29 @@
+import logging
+import time
+
 from django.contrib.auth import authenticate, get_user_model
+from django.http import HttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, viewsets
-from rest_framework_simplejwt.tokens import RefreshToken
-from django_otp import devices_for_user
 from django_otp.plugins.otp_totp.models import TOTPDevice
 
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
 from django.utils import timezone
-from auditoria.models import HistorialSesion, HistorialAccion
 from auditoria.signals import registrar_login
 from auditoria.mixins import AuditoriaMixin
+from sistema_hospital.instrumentacion import presupuesto_consultas
 
-import qrcode
-import qrcode.image.svg
-import io
-import base64
 
 
 from .models import CustomUser, Equipo, SolicitudClave
+from .equipos import invalidar_equipos
+from .autenticacion import tokens_para, revocar_tokens, CLAIMS_USUARIO
+from .dos_factores import tiene_dispositivo_confirmado, verificar_codigo, dispositivo_pendiente, data_uri_qr, svg_qr
+from .limites import LIMITES_AUTH
+from .tablero import tablero_admin
 from .serializers import (
     UserSerializer, 
     EquipoSerializer, 
@@ -30,12 +33,15 @@ from .serializers import (
 
 from .permissions import IsDoctorUser, IsAdminRol
 
+logger = logging.getLogger(__name__)
+
 User = get_user_model()
 
 
 class LoginAPIView(APIView):
     permission_classes = [AllowAny]
     authentication_classes = []
+    throttle_classes = LIMITES_AUTH
 
     def post(self, request, *args, **kwargs):
         username = request.data.get('username')
@@ -52,9 +58,7 @@ class LoginAPIView(APIView):
         if not user.is_active:
             return Response({"error": "Usuario inactivo"}, status=status.HTTP_401_UNAUTHORIZED)
 
-        devices = list(devices_for_user(user))
-        
-        if not devices:
+        if not tiene_dispositivo_confirmado(user):
             return Response({"step": "2fa_setup_required", "username": user.username}, status=status.HTTP_200_OK)
 
         return Response({"step": "2fa_required", "username": user.username}, status=status.HTTP_200_OK)
@@ -63,6 +67,7 @@ class LoginAPIView(APIView):
 class Verify2FAAPIView(APIView):
     permission_classes = [AllowAny]
     authentication_classes = []
+    throttle_classes = LIMITES_AUTH
 
     def post(self, request, *args, **kwargs):
         username = request.data.get('username')
@@ -71,30 +76,28 @@ class Verify2FAAPIView(APIView):
         if not username or not otp_token:
             return Response({"error": "Faltan datos"}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            user = User.objects.get(username=username)
-        except User.DoesNotExist:
+        user, valido = verificar_codigo(username, otp_token)
+        if user is None:
             return Response({"error": "Usuario no encontrado"}, status=404)
 
-        for device in devices_for_user(user):
-            if device.verify_token(otp_token):
-                refresh = RefreshToken.for_user(user)
-                try:
-                    registrar_login(sender=User, request=request, user=user)
-                except Exception:
-                    pass
-
-                return Response({
-                    'refresh': str(refresh),
-                    'access': str(refresh.access_token),
-                    'user': {
-                        'id': user.id,
-                        'username': user.username,
-                        'rol': user.rol,
-                        'rut': user.rut, 
-                        'nombre': f"{user.first_name} {user.last_name}".strip() or user.username
-                    }
-                }, status=status.HTTP_200_OK)
+        if valido:
+            refresh = tokens_para(user)
+            try:
+                registrar_login(sender=User, request=request, user=user)
+            except Exception:
+                pass
+
+            return Response({
+                'refresh': str(refresh),
+                'access': str(refresh.access_token),
+                'user': {
+                    'id': user.id,
+                    'username': user.username,
+                    'rol': user.rol,
+                    'rut': user.rut, 
+                    'nombre': f"{user.first_name} {user.last_name}".strip() or user.username
+                }
+            }, status=status.HTTP_200_OK)
         
         return Response({"error": "Código 2FA inválido"}, status=status.HTTP_401_UNAUTHORIZED)
 
@@ -102,6 +105,7 @@ class Verify2FAAPIView(APIView):
 class Generate2FAAPIView(APIView):
     permission_classes = [AllowAny]
     authentication_classes = []
+    throttle_classes = LIMITES_AUTH
 
     def post(self, request, *args, **kwargs):
         username = request.data.get('username')
@@ -110,22 +114,43 @@ class Generate2FAAPIView(APIView):
         except User.DoesNotExist:
             return Response({"error": "Usuario no encontrado"}, status=404)
 
-        TOTPDevice.objects.filter(user=user, confirmed=False).delete()
-        device = user.totpdevice_set.create(confirmed=False)
-        
-        img = qrcode.make(device.config_url, image_factory=qrcode.image.svg.SvgImage)
-        buffer = io.BytesIO()
-        img.save(buffer)
-        
-        svg_data = buffer.getvalue().decode()
-        qr_code = f"data:image/svg+xml;base64,{base64.b64encode(svg_data.encode('utf-8')).decode('utf-8')}"
+        # Sin sesión: con 2FA ya configurado no se entrega otro secreto a quien solo conoce el username.
+        if tiene_dispositivo_confirmado(user):
+            return Response({"error": "El usuario ya tiene 2FA configurado"}, status=403)
+
+        device = dispositivo_pendiente(user)
+        return Response({"qr_code_data": data_uri_qr(device.config_url), "secret_key": device.key}, status=200)
 
-        return Response({"qr_code_data": qr_code, "secret_key": device.key}, status=200)
+
+class QR2FAAPIView(APIView):
+    """El QR de configuración como imagen (image/svg+xml), para usar directo en un <img>."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_classes = LIMITES_AUTH
+
+    def get(self, request, *args, **kwargs):
+        username = request.query_params.get('username')
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            return Response({"error": "Usuario no encontrado"}, status=404)
+
+        if tiene_dispositivo_confirmado(user):
+            return Response({"error": "El usuario ya tiene 2FA configurado"}, status=403)
+        # Solo muestra el dispositivo que creó setup-2fa: un GET no crea dispositivos.
+        device = dispositivo_pendiente(user, crear=False)
+        if not device:
+            return Response({"error": "No hay configuración pendiente"}, status=404)
+        respuesta = HttpResponse(svg_qr(device.config_url), content_type='image/svg+xml')
+        # El QR contiene el secreto del dispositivo.
+        respuesta['Cache-Control'] = 'no-store'
+        return respuesta
 
 
 class VerifySetup2FAAPIView(APIView):
     permission_classes = [AllowAny]
     authentication_classes = []
+    throttle_classes = LIMITES_AUTH
 
     def post(self, request, *args, **kwargs):
         username = request.data.get('username')
@@ -136,14 +161,14 @@ class VerifySetup2FAAPIView(APIView):
         except User.DoesNotExist:
             return Response({"error": "Usuario no encontrado"}, status=404)
 
-        device = user.totpdevice_set.filter(confirmed=False).first()
+        device = dispositivo_pendiente(user, crear=False)
         if not device:
              return Response({"error": "No hay configuración pendiente"}, status=400)
 
         if device.verify_token(otp_token):
             device.confirmed = True
             device.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens_para(user)
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
@@ -178,11 +203,24 @@ class UserViewSet(AuditoriaMixin, viewsets.ModelViewSet):
     queryset = User.objects.all().order_by('username')
     serializer_class = UserSerializer
     permission_classes = [IsAdminRol]
+    presupuesto_consultas = {'list': 2, 'retrieve': 1}
+
+    def perform_update(self, serializer):
+        # Rol, estado o username cambiados: los tokens vigentes llevan los valores anteriores.
+        antes = {c: getattr(serializer.instance, c) for c in CLAIMS_USUARIO}
+        super().perform_update(serializer)
+        if any(getattr(serializer.instance, c) != v for c, v in antes.items()):
+            revocar_tokens(serializer.instance)
+
+    def perform_destroy(self, instance):
+        revocar_tokens(instance)
+        super().perform_destroy(instance)
 
     @action(detail=True, methods=['post'])
     def reset_2fa(self, request, pk=None):
         user = self.get_object()
         TOTPDevice.objects.filter(user=user).delete()
+        revocar_tokens(user)
         self.registrar_accion(user, 'modificacion', f"Admin reseteó 2FA de {user.username}")
         return Response({'status': '2FA eliminado'}, status=200)
 
@@ -191,15 +229,17 @@ class UserViewSet(AuditoriaMixin, viewsets.ModelViewSet):
         user = self.get_object()
         user.is_active = not user.is_active
         user.save()
+        revocar_tokens(user)
         estado = "activado" if user.is_active else "desactivado"
         self.registrar_accion(user, 'modificacion', f"Admin {estado} al usuario {user.username}")
         return Response({'status': estado, 'is_active': user.is_active})
 
 
 class SolicitudClaveViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = SolicitudClave.objects.filter(resuelta=False).order_by('-fecha_solicitud')
+    queryset = SolicitudClave.objects.filter(resuelta=False).select_related('usuario').order_by('-fecha_solicitud')
     serializer_class = SolicitudClaveSerializer
     permission_classes = [IsAuthenticated, IsAdminRol]
+    presupuesto_consultas = {'list': 2, 'retrieve': 1}
 
     @action(detail=True, methods=['post'])
     def marcar_resuelta(self, request, pk=None):
@@ -212,6 +252,8 @@ class SolicitudClaveViewSet(viewsets.ReadOnlyModelViewSet):
 class EquipoViewSet(viewsets.ModelViewSet):
     serializer_class = EquipoSerializer
     permission_classes = [IsAuthenticated] 
+    # count + página + prefetch de miembros
+    presupuesto_consultas = {'list': 3, 'retrieve': 2}
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy', 'activar']:
@@ -220,9 +262,11 @@ class EquipoViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        # lider_nombre y miembros_detalles se leen por equipo: sin esto son 2 consultas por fila.
+        equipos = Equipo.objects.select_related('lider').prefetch_related('miembros')
         if user.rol == CustomUser.DOCTOR:
-            return Equipo.objects.filter(lider=user).order_by('-created_at')
-        return Equipo.objects.filter(miembros=user).order_by('-created_at')
+            return equipos.filter(lider=user).order_by('-created_at')
+        return equipos.filter(miembros=user).order_by('-created_at')
 
     def perform_create(self, serializer):
         serializer.save(lider=self.request.user)
@@ -231,6 +275,7 @@ class EquipoViewSet(viewsets.ModelViewSet):
     def activar(self, request, pk=None):
         equipo = self.get_object()
         Equipo.objects.filter(lider=request.user, turno=equipo.turno, activo=True).update(activo=False)
+        invalidar_equipos()
         equipo.activo = True
         equipo.save()
         return Response({'status': 'Equipo activado'})
@@ -239,57 +284,22 @@ class EquipoViewSet(viewsets.ModelViewSet):
 class UserOptionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = UserOptionSerializer
     permission_classes = [IsAuthenticated, IsDoctorUser]
+    presupuesto_consultas = {'list': 2, 'retrieve': 1}
 
     def get_queryset(self):
         return User.objects.filter(rol='enfermero', is_active=True).order_by('username')
 
 
+# Conteo de usuarios, últimas sesiones y últimas acciones (0 si el tablero sale de la caché).
+@presupuesto_consultas(3)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminRol])
 def dashboard_stats(request):
-    try:
-        total_users = User.objects.count()
-        active_users = User.objects.filter(is_active=True).count()
-        inactive_users = total_users - active_users
-        latest_sessions = HistorialSesion.objects.select_related('usuario').order_by('-timestamp')[:5]
-        fmt_sessions = []
-        for s in latest_sessions:
-            fmt_sessions.append({
-                'username': s.usuario.username if s.usuario else 'Sistema',
-                'event_type': s.get_accion_display(),
-                'timestamp': s.timestamp.strftime('%d/%m/%Y %H:%M'),
-                'ip_address': s.ip_address
-            })
-
-
-        latest_actions = HistorialAccion.objects.select_related('usuario', 'content_type').order_by('-timestamp')[:5]
-        fmt_actions = []
-        for a in latest_actions:
-            try:
-                modelo_afectado = a.content_type.model if a.content_type else "Objeto desconocido"
-                obj_id = a.object_id or "?"
-            except Exception:
-                modelo_afectado = "Error ref"
-                obj_id = "?"
-
-            fmt_actions.append({
-                'username': a.usuario.username if a.usuario else 'Sistema',
-                'action_type': a.get_accion_display(),
-                'target_object_id': f"{modelo_afectado} (ID: {obj_id})",
-                'timestamp': a.timestamp.strftime('%d/%m/%Y %H:%M')
-            })
-
-        return Response({
-            'total_users': total_users,
-            'active_users': active_users,
-            'inactive_users': inactive_users,
-            'latest_sessions': fmt_sessions,
-            'latest_actions': fmt_actions,
-        })
-
-    except Exception as e:
-        print(f"ERROR DASHBOARD STATS: {str(e)}")
-        return Response({
-            'total_users': 0, 'active_users': 0, 'inactive_users': 0,
-            'latest_sessions': [], 'latest_actions': []
-        })
\ No newline at end of file
+    inicio = time.perf_counter()
+    datos, tiempos = tablero_admin()
+    response = Response(datos)
+    partes = [f"{parte};dur={ms:.2f}" for parte, ms in tiempos.items()]
+    partes.append(f'cache;desc="{"miss" if tiempos else "hit"}"')
+    partes.append(f"total;dur={(time.perf_counter() - inicio) * 1000:.2f}")
+    response['Server-Timing'] = ', '.join(partes)
+    return response
@@ -0,0 +1,70 @@
+import time
+
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import CustomUser
+
+
+# Autenticación JWT sin consulta por request.
+#
+# Los tokens que emiten los endpoints de 2FA llevan los datos que usan los permisos (rol,
+# is_active, is_staff) y el username de los mensajes de auditoría, más `emitido`: el momento del
+# login, que se conserva cuando el access token se renueva desde el refresh. Con esos claims el
+# usuario se arma sin ir a la base: una instancia de CustomUser con el resto de los campos
+# diferidos (si algo los lee, se cargan con una consulta; save() solo escribe los cargados).
+#
+# Lo que el token no puede saber (una desactivación, un cambio de rol o de 2FA durante su vigencia)
+# lo cubre la lista de revocación: revocar_tokens(usuario) anota en la caché compartida la hora de
+# revocación y se rechaza todo token con `emitido` anterior. Las entradas duran lo que un refresh
+# token, que es lo máximo que puede vivir un `emitido`.
+
+CLAIMS_USUARIO = ('rol', 'is_active', 'is_staff', 'username')
+CLAIM_EMITIDO = 'emitido'
+
+
+def _clave_revocacion(user_id):
+    return f'jwt:revocado:{user_id}'
+
+
+def tokens_para(user):
+    """RefreshToken con los claims de usuario; su access_token los hereda."""
+    refresh = RefreshToken.for_user(user)
+    for claim in CLAIMS_USUARIO:
+        refresh[claim] = getattr(user, claim)
+    refresh[CLAIM_EMITIDO] = time.time()
+    return refresh
+
+
+def revocar_tokens(user):
+    """Invalida los tokens ya emitidos del usuario (el próximo login emite unos válidos)."""
+    caches['compartida'].set(
+        _clave_revocacion(user.pk), time.time(),
+        timeout=int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()),
+    )
+
+
+class JWTAutenticacionRapida(JWTAuthentication):
+    """JWTAuthentication que construye el usuario desde los claims en vez de leer CustomUser."""
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in (*CLAIMS_USUARIO, CLAIM_EMITIDO)):
+            # Token emitido antes de estos claims: camino normal, con consulta.
+            return super().get_user(validated_token)
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        revocado = caches['compartida'].get(_clave_revocacion(user_id))
+        if revocado is not None and validated_token[CLAIM_EMITIDO] <= revocado:
+            raise AuthenticationFailed(_("Token revocado: inicie sesión nuevamente."), code='token_revocado')
+        if not validated_token['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code='user_inactive')
+
+        datos = {'id': int(user_id), **{c: validated_token[c] for c in CLAIMS_USUARIO}}
+        # from_db espera los valores en el orden de los campos del modelo.
+        campos = [f.attname for f in CustomUser._meta.concrete_fields if f.attname in datos]
+        return CustomUser.from_db(router.db_for_read(CustomUser), campos, [datos[c] for c in campos])
@@ -0,0 +1,106 @@
+import base64
+import functools
+import re
+
+import qrcode
+
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
+from django_otp.plugins.otp_static.models import StaticDevice
+from django_otp.plugins.otp_totp.models import TOTPDevice
+
+
+# Camino de verificación 2FA de la API. Equivale a recorrer devices_for_user() (TOTP y códigos
+# estáticos de respaldo, solo confirmados), pero sin consultar cada plugin por separado.
+#
+# Los dispositivos no se guardan en caché entre requests: verify_token() actualiza en la base
+# last_t (anti-reuso del código) y los contadores de bloqueo de django-otp, y una copia vieja
+# permitiría reutilizar un código en otro proceso.
+
+User = get_user_model()
+
+_CODIGO_TOTP = re.compile(r'\d{6,8}')
+
+
+def tiene_dispositivo_confirmado(user):
+    """Un solo EXISTS sobre todos los tipos de dispositivo."""
+    confirmado = {'user': OuterRef('pk'), 'confirmed': True}
+    return User.objects.filter(pk=user.pk).filter(
+        Exists(TOTPDevice.objects.filter(**confirmado)) | Exists(StaticDevice.objects.filter(**confirmado))
+    ).exists()
+
+
+def verificar_codigo(username, codigo):
+    """
+    (user, valido). user es None si el username no existe. Una consulta trae los TOTP confirmados
+    junto con su usuario; los códigos estáticos solo se consultan si el código no tiene forma de TOTP.
+    """
+    codigo = str(codigo or '').strip()
+    dispositivos = list(
+        TOTPDevice.objects.select_related('user').filter(user__username=username, confirmed=True).order_by('id')
+    )
+    user = dispositivos[0].user if dispositivos else User.objects.filter(username=username).first()
+    if user is None:
+        return None, False
+
+    if _CODIGO_TOTP.fullmatch(codigo):
+        for dispositivo in dispositivos:
+            if dispositivo.verify_token(codigo):
+                return user, True
+        return user, False
+
+    for dispositivo in StaticDevice.objects.filter(user=user, confirmed=True):
+        if dispositivo.verify_token(codigo):
+            return user, True
+    return user, False
+
+
+def dispositivo_pendiente(user, crear=True):
+    """
+    TOTP sin confirmar del usuario. Un reintento de la configuración reutiliza el mismo (mismo
+    secreto, mismo QR) en vez de borrarlo y crear otro.
+    """
+    dispositivo = TOTPDevice.objects.filter(user=user, confirmed=False).order_by('id').first()
+    if dispositivo is None and crear:
+        dispositivo = user.totpdevice_set.create(confirmed=False)
+    return dispositivo
+
+
+# QR de configuración. qrcode solo calcula la matriz (la elección de máscara es lo que más cuesta);
+# el SVG se escribe directo como un único <path> con un segmento por tramo horizontal de módulos,
+# sin pasar por el árbol XML de qrcode.image.svg. El resultado se guarda en memoria del proceso por
+# config_url: como el dispositivo pendiente se reutiliza, un reintento no vuelve a dibujar. No se usa
+# la caché compartida porque la URL lleva el secreto del dispositivo.
+
+MARGEN_QR = 4
+
+
+@functools.lru_cache(maxsize=256)
+def svg_qr(texto):
+    """SVG (bytes) del código QR de `texto`."""
+    qr = qrcode.QRCode(border=MARGEN_QR)
+    qr.add_data(texto)
+    qr.make(fit=True)
+    matriz = qr.get_matrix()
+    lado = len(matriz)
+    tramos = []
+    for y, fila in enumerate(matriz):
+        x = 0
+        while x < lado:
+            if not fila[x]:
+                x += 1
+                continue
+            inicio = x
+            while x < lado and fila[x]:
+                x += 1
+            tramos.append(f'M{inicio} {y}h{x - inicio}v1h-{x - inicio}z')
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {lado} {lado}" shape-rendering="crispEdges">'
+        f'<rect width="{lado}" height="{lado}" fill="#fff"/><path fill="#000" d="{"".join(tramos)}"/></svg>'
+    ).encode('ascii')
+
+
+@functools.lru_cache(maxsize=256)
+def data_uri_qr(texto):
+    """El mismo SVG como data URI, con una sola pasada de base64."""
+    return 'data:image/svg+xml;base64,' + base64.b64encode(svg_qr(texto)).decode('ascii')
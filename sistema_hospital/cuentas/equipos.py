@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import CustomUser, Equipo
+
+
+# Alcance por equipo de los clínicos: un doctor ve sus registros y los de los miembros de su equipo
+# activo; un enfermero, solo los suyos.
+#
+# filtro_registradores() lo resuelve como una subconsulta dentro de la consulta principal (cero
+# viajes extra a la base). Para quien necesita la lista de ids en Python (búsqueda, importaciones),
+# miembros_equipo_activo() la guarda en un LRU en memoria por proceso, con claves (lider, versión).
+# La versión vive en la caché 'compartida' y se incrementa al guardar o borrar un Equipo, al cambiar
+# sus miembros y en EquipoViewSet.activar (que usa .update()); así una invalidación en un proceso
+# vale para todos, y leerla no toca la base.
+
+CLAVE_VERSION = 'equipos:version'
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+
+
+def version_equipos():
+    # Valor inicial basado en la hora: si la caché compartida se vacía, la versión no vuelve a un
+    # número que un proceso ya tenga en su LRU.
+    return caches['compartida'].get_or_set(CLAVE_VERSION, time.time_ns, timeout=None)
+
+
+def _incrementar():
+    cache = caches['compartida']
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, time.time_ns(), timeout=None)
+
+
+def invalidar_equipos():
+    """Descarta los alcances en caché de todos los procesos. Se repite al confirmar la transacción."""
+    _incrementar()
+    transaction.on_commit(_incrementar)
+
+
+def miembros_equipo_activo(lider_id):
+    """Ids de los miembros del equipo activo que lidera `lider_id` (tupla vacía si no lidera ninguno)."""
+    clave = (lider_id, version_equipos())
+    with _lock:
+        if clave in _lru:
+            _lru.move_to_end(clave)
+            return _lru[clave]
+    equipo = Equipo.objects.filter(lider_id=lider_id, activo=True).order_by('id').first()
+    miembros = tuple(equipo.miembros.values_list('id', flat=True)) if equipo else ()
+    if connection.in_atomic_block:
+        # Lo leído dentro de una transacción puede revertirse sin disparar señales: no se guarda.
+        return miembros
+    with _lock:
+        _lru[clave] = miembros
+        while len(_lru) > settings.EQUIPOS_CACHE_MAXIMO:
+            _lru.popitem(last=False)
+    return miembros
+
+
+def registradores_visibles(user):
+    """Ids de los usuarios cuyos registros ve un clínico: los propios y, si lidera un equipo activo, los de sus miembros."""
+    if user.rol == CustomUser.DOCTOR:
+        return [*miembros_equipo_activo(user.id), user.id]
+    return [user.id]
+
+
+def filtro_registradores(user, campo='registrado_por'):
+    """El mismo alcance como Q con subconsulta, para filtrar sin consultas previas."""
+    propios = Q(**{f'{campo}_id': user.id})
+    if user.rol != CustomUser.DOCTOR:
+        return propios
+    # Mismo equipo que elige miembros_equipo_activo: el primero activo por id.
+    equipo = Equipo.objects.filter(lider_id=user.id, activo=True).order_by('id').values('id')[:1]
+    miembros = Equipo.miembros.through.objects.filter(equipo_id__in=equipo).values('customuser_id')
+    return propios | Q(**{f'{campo}_id__in': miembros})
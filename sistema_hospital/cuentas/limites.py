@@ -0,0 +1,46 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+# Límite de intentos para los endpoints de login y 2FA (sin autenticar). Ventana deslizante de
+# SimpleRateThrottle: por cada clave guarda los instantes de los intentos del último período.
+#
+# El almacenamiento es enchufable con AUTH_LIMITE_CACHE: 'default' (memoria del proceso, sin
+# costo de E/S pero cada worker cuenta por separado) o 'compartida' (todos los procesos; archivos
+# por defecto, o la base/Redis según CACHE_COMPARTIDA_BACKEND).
+#
+# Tasas en REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] con los scopes 'auth_ip' y 'auth_usuario'.
+
+
+class _LimiteAuth(SimpleRateThrottle):
+
+    def __init__(self):
+        self.cache = caches[settings.AUTH_LIMITE_CACHE]
+        super().__init__()
+
+
+class LimiteAuthIP(_LimiteAuth):
+    """Intentos por IP de origen, sin importar el usuario (ráfagas de credential stuffing)."""
+    scope = 'auth_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LimiteAuthUsuario(_LimiteAuth):
+    """Intentos por username, sin importar la IP (ataques distribuidos contra una cuenta)."""
+    scope = 'auth_usuario'
+
+    def get_cache_key(self, request, view):
+        username = str(request.data.get('username') or '').strip().lower()
+        if not username:
+            return None
+        # El username viene del cliente: se resume para acotar el largo de la clave.
+        ident = hashlib.sha256(username.encode()).hexdigest()[:32]
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+LIMITES_AUTH = [LimiteAuthIP, LimiteAuthUsuario]
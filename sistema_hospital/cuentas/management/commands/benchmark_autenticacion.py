@@ -0,0 +1,67 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from cuentas.autenticacion import JWTAutenticacionRapida, tokens_para
+from cuentas.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara JWTAuthentication (lee CustomUser en cada request) con JWTAutenticacionRapida '
+        '(usuario desde los claims): consultas y latencia por autenticación y por request completo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=2000)
+        parser.add_argument('--url', default='/cuentas/api/equipos/')
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            usuario = CustomUser.objects.create(username='benchmark_autenticacion', rol=CustomUser.DOCTOR)
+            acceso = str(tokens_para(usuario).access_token)
+            cabecera = f'Bearer {acceso}'
+            fabrica = RequestFactory()
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== Autenticación ({opts['repeticiones']} repeticiones) =="))
+            medianas = {}
+            for nombre, clase in (('JWTAuthentication', JWTAuthentication), ('JWTAutenticacionRapida', JWTAutenticacionRapida)):
+                autenticador = clase()
+                tiempos = []
+                with CaptureQueriesContext(connection) as consultas:
+                    for _ in range(opts['repeticiones']):
+                        request = Request(fabrica.get('/', HTTP_AUTHORIZATION=cabecera))
+                        t0 = time.perf_counter()
+                        user, _ = autenticador.authenticate(request)
+                        tiempos.append((time.perf_counter() - t0) * 1e6)
+                assert user.pk == usuario.pk and user.rol == usuario.rol
+                medianas[nombre] = statistics.median(tiempos)
+                self.stdout.write(
+                    f"{nombre:24} mediana {medianas[nombre]:8.1f} µs | "
+                    f"{len(consultas) / opts['repeticiones']:.0f} consultas por request"
+                )
+
+            host = settings.ALLOWED_HOSTS[0].lstrip('.').replace('*', 'localhost')
+            cliente = APIClient(HTTP_HOST=host)
+            cliente.credentials(HTTP_AUTHORIZATION=cabecera)
+            tiempos = []
+            for _ in range(max(opts['repeticiones'] // 10, 10)):
+                t0 = time.perf_counter()
+                with CaptureQueriesContext(connection) as consultas:
+                    respuesta = cliente.get(opts['url'])
+                tiempos.append((time.perf_counter() - t0) * 1000)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== Request completo GET {opts['url']} =="))
+            self.stdout.write(
+                f"status {respuesta.status_code} | {len(consultas)} consultas | mediana {statistics.median(tiempos):.2f} ms"
+            )
+            for c in consultas.captured_queries:
+                self.stdout.write(f"    {c['sql'][:120]}")
+            transaction.set_rollback(True)
@@ -0,0 +1,106 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django_otp.oath import totp
+from rest_framework.test import APIClient
+
+from cuentas import api_views
+from cuentas.limites import LIMITES_AUTH, LimiteAuthIP, LimiteAuthUsuario
+from cuentas.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula tráfico de ataque (credential stuffing) contra /cuentas/api/auth/verify/ mezclado con '
+        'usuarios legítimos, con y sin límite de intentos, y muestra latencias p50/p95/p99, códigos de '
+        'respuesta y consultas por request. Revierte los datos creados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=3000)
+        parser.add_argument('--ips-atacantes', type=int, default=20)
+        parser.add_argument('--usuarios', type=int, default=50, help='Usuarios reales (con TOTP) que el ataque prueba.')
+        parser.add_argument('--legitimos', type=float, default=0.05, help='Fracción de requests legítimos.')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **opts):
+        host = settings.ALLOWED_HOSTS[0].lstrip('.').replace('*', 'localhost')
+        with transaction.atomic():
+            usuarios = []
+            for i in range(opts['usuarios']):
+                u = CustomUser.objects.create(username=f'carga2fa_{i}', rol=CustomUser.ENFERMERO)
+                usuarios.append((u, u.totpdevice_set.create(confirmed=True)))
+
+            vista = api_views.Verify2FAAPIView
+            originales = vista.throttle_classes
+            for fase, limites in enumerate(([], LIMITES_AUTH)):
+                vista.throttle_classes = limites
+                try:
+                    resultados = self._atacar(APIClient(HTTP_HOST=host), usuarios, fase, opts)
+                finally:
+                    vista.throttle_classes = originales
+                self._informar('con límite' if limites else 'sin límite', resultados)
+            transaction.set_rollback(True)
+
+    def _atacar(self, cliente, usuarios, fase, opts):
+        rnd = random.Random(opts['semilla'])
+        ips = [f'198.51.100.{i + 1}' for i in range(opts['ips_atacantes'])]
+        resultados = {'ataque': [], 'legitimo': []}
+        claves = set()
+        for n in range(opts['requests']):
+            if rnd.random() < opts['legitimos']:
+                # Usuario propio por request: el anti-reuso de TOTP (last_t) y el bloqueo por fallos
+                # del dispositivo rechazarían un segundo login legítimo de una cuenta atacada.
+                tipo, ip = 'legitimo', f'203.0.113.{n % 250 + 1}'
+                user = CustomUser.objects.create(username=f'carga2fa_legitimo_{fase}_{n}', rol=CustomUser.ENFERMERO)
+                dispositivo = user.totpdevice_set.create(confirmed=True)
+                codigo = f"{totp(dispositivo.bin_key, step=dispositivo.step, t0=dispositivo.t0, digits=dispositivo.digits):0{dispositivo.digits}d}"
+                username = user.username
+            else:
+                user, _ = rnd.choice(usuarios)
+                tipo, ip = 'ataque', rnd.choice(ips)
+                codigo = f"{rnd.randrange(10 ** 6):06d}"
+                username = user.username if rnd.random() < 0.5 else f'noexiste_{rnd.randrange(10 ** 6)}'
+            claves.add(('ip', ip))
+            claves.add(('usuario', username))
+            t0 = time.perf_counter()
+            with CaptureQueriesContext(connection) as consultas:
+                respuesta = cliente.post('/cuentas/api/auth/verify/', {'username': username, 'otp_token': codigo}, REMOTE_ADDR=ip)
+            resultados[tipo].append(((time.perf_counter() - t0) * 1000, respuesta.status_code, len(consultas)))
+        self._limpiar(claves)
+        return resultados
+
+    def _limpiar(self, claves):
+        # Solo las claves de esta corrida: la caché compartida guarda también otros datos.
+        cache = caches[settings.AUTH_LIMITE_CACHE]
+        ip, usuario = LimiteAuthIP(), LimiteAuthUsuario()
+        fabrica = type('R', (), {})
+        for tipo, valor in claves:
+            if tipo == 'ip':
+                r = fabrica(); r.META = {'REMOTE_ADDR': valor}
+                cache.delete(ip.get_cache_key(r, None))
+            else:
+                r = fabrica(); r.data = {'username': valor}
+                cache.delete(usuario.get_cache_key(r, None))
+
+    def _informar(self, nombre, resultados):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"== {nombre} =="))
+        for tipo, filas in resultados.items():
+            if not filas:
+                continue
+            tiempos = sorted(f[0] for f in filas)
+            percentil = lambda p: tiempos[min(len(tiempos) - 1, int(len(tiempos) * p))]
+            codigos = {}
+            for _, codigo, _ in filas:
+                codigos[codigo] = codigos.get(codigo, 0) + 1
+            self.stdout.write(
+                f"{tipo:9} n={len(filas):5} | p50 {statistics.median(tiempos):6.2f} ms | p95 {percentil(0.95):6.2f} ms | "
+                f"p99 {percentil(0.99):6.2f} ms | consultas/req {statistics.mean(f[2] for f in filas):4.1f} | "
+                f"respuestas {dict(sorted(codigos.items()))}"
+            )
@@ -1,7 +1,52 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
-class CustomUser(AbstractUser):
+from .rut import partes_rut, validar_rut
+
+
+_SIN_CARGAR = object()
+
+
+class RutCanonico(models.Model):
+    """
+    Guarda junto al `rut` tipeado su forma canónica (cuerpo entero + dígito verificador) en columnas
+    indexadas, para buscar por RUT con una sola lectura de índice sin importar cómo se escribió.
+    Se recalcula en save() cuando el rut es nuevo o cambió; queryset.update(rut=...) y bulk_create
+    deben asignarla a mano.
+
+    Las migraciones dejan sin cuerpo (NULL) los RUT antiguos inválidos o repetidos. Recalcularlo en
+    cada save() haría chocar al segundo de un par repetido con el índice único al guardar cualquier
+    otro campo (un alta, activar un usuario): por eso solo se recalcula si el rut cambió.
+    """
+    rut_cuerpo = models.PositiveIntegerField(null=True, blank=True, unique=True, editable=False, verbose_name='RUT (cuerpo)')
+    rut_dv = models.CharField(max_length=1, blank=True, editable=False, verbose_name='RUT (dígito verificador)')
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._rut_guardado = instancia.__dict__.get('rut', _SIN_CARGAR)
+        return instancia
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or 'rut' in fields:
+            self._rut_guardado = self.__dict__.get('rut', _SIN_CARGAR)
+
+    def save(self, *args, **kwargs):
+        rut = self.__dict__.get('rut', _SIN_CARGAR)  # diferido y sin tocar: no cambió
+        if rut is not _SIN_CARGAR and (self._state.adding or rut != getattr(self, '_rut_guardado', _SIN_CARGAR)):
+            self.rut_cuerpo, self.rut_dv = partes_rut(rut)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'rut' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'rut_cuerpo', 'rut_dv'}
+        super().save(*args, **kwargs)
+        self._rut_guardado = rut
+
+
+class CustomUser(AbstractUser, RutCanonico):
     ADMIN = 'admin'
     SUPERVISOR = 'supervisor'
     DOCTOR = 'doctor'
@@ -14,11 +59,19 @@ class CustomUser(AbstractUser):
         (ENFERMERO, 'Enfermero'),
     )
     rol = models.CharField(max_length=10, choices=ROL_CHOICES, default=ENFERMERO)
-    rut = models.CharField(max_length=12, unique=True, null=True, blank=True, verbose_name='RUT')
+    rut = models.CharField(max_length=12, unique=True, null=True, blank=True, validators=[validar_rut], verbose_name='RUT')
 
     def __str__(self):
         return f"({self.username} {self.get_rol_display()})"
 
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Leer un campo diferido (el usuario que cuentas.autenticacion arma desde el token trae solo
+        # los claims) carga de una vez todos los diferidos, no una consulta por campo.
+        diferidos = self.get_deferred_fields()
+        if fields is not None and diferidos and set(fields) <= diferidos:
+            fields = diferidos
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
 
 class SolicitudClave(models.Model):
     usuario = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='solicitudes_clave')
@@ -0,0 +1,55 @@
+import re
+
+from django.core.exceptions import ValidationError
+
+
+# RUT chileno en forma canónica: cuerpo entero + dígito verificador ('0'-'9' o 'K').
+# Se acepta cualquier forma tipeada: "12.345.678-5", "12345678-5", "123456785", " 12345678 5 ".
+
+_SEPARADORES = re.compile(r'[\s.\-]')
+
+
+def digito_verificador(cuerpo):
+    """Dígito verificador por módulo 11."""
+    suma, factor = 0, 2
+    for d in reversed(str(cuerpo)):
+        suma += int(d) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - suma % 11
+    return {11: '0', 10: 'K'}.get(resto, str(resto))
+
+
+def separar_rut(texto):
+    """(cuerpo, dv) de un RUT válido en cualquier formato. ValueError si no es un RUT o el dígito no cuadra."""
+    compacto = _SEPARADORES.sub('', str(texto or '')).upper()
+    if not re.fullmatch(r'\d{1,9}[\dK]', compacto):
+        raise ValueError("RUT con formato inválido.")
+    cuerpo, dv = int(compacto[:-1]), compacto[-1]
+    if cuerpo == 0 or digito_verificador(cuerpo) != dv:
+        raise ValueError("RUT inválido: el dígito verificador no corresponde.")
+    return cuerpo, dv
+
+
+def partes_rut(texto):
+    """Como separar_rut, pero (None, '') para valores vacíos o inválidos (datos antiguos)."""
+    try:
+        return separar_rut(texto)
+    except ValueError:
+        return None, ''
+
+
+def formatear_rut(cuerpo, dv):
+    return f"{cuerpo}-{dv}"
+
+
+def normalizar_rut(texto):
+    """Forma canónica '12345678-5'. ValueError si el RUT es inválido."""
+    return formatear_rut(*separar_rut(texto))
+
+
+def validar_rut(valor):
+    """Validador de campo (formularios y admin)."""
+    try:
+        separar_rut(valor)
+    except ValueError as e:
+        raise ValidationError(str(e))
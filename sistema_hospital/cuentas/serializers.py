@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Equipo, SolicitudClave
+from .rut import separar_rut, formatear_rut
 
 User = get_user_model()
 
@@ -13,6 +14,20 @@ class UserSerializer(serializers.ModelSerializer):
             'password': {'write_only': True, 'required': False}
         }
 
+    def validate_rut(self, value):
+        if not value:
+            return None
+        try:
+            cuerpo, dv = separar_rut(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        repetidos = User.objects.filter(rut_cuerpo=cuerpo)
+        if self.instance is not None:
+            repetidos = repetidos.exclude(pk=self.instance.pk)
+        if repetidos.exists():
+            raise serializers.ValidationError("Ya existe un usuario con este RUT.")
+        return formatear_rut(cuerpo, dv)
+
     def create(self, validated_data):
         password = validated_data.pop('password', None)
         user = User(**validated_data)
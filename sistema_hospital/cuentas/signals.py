@@ -0,0 +1,33 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from auditoria.escritor import auditoria_guardada
+from auditoria.models import HistorialSesion
+from .equipos import invalidar_equipos
+from .models import CustomUser, Equipo
+from .tablero import invalidar_tablero_admin
+
+
+# Invalida el alcance por equipo en caché (cuentas.equipos). EquipoViewSet.activar usa .update()
+# para desactivar los demás equipos del turno, que no dispara señales: invalida por su cuenta.
+
+@receiver(post_save, sender=Equipo)
+@receiver(post_delete, sender=Equipo)
+def equipo_modificado(sender, **kwargs):
+    invalidar_equipos()
+
+
+@receiver(m2m_changed, sender=Equipo.miembros.through)
+def miembros_modificados(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidar_equipos()
+
+
+# Tablero de administración en caché (cuentas.tablero): contadores de usuarios y últimos eventos.
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_save, sender=HistorialSesion)
+@receiver(auditoria_guardada)
+def tablero_admin_modificado(sender, **kwargs):
+    invalidar_tablero_admin()
@@ -0,0 +1,94 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Q
+
+from auditoria.models import HistorialSesion, HistorialAccion
+from auditoria.particiones import ultimos
+from sistema_hospital.instrumentacion import registro, SEGUNDOS
+from .models import CustomUser
+
+
+# Estadísticas del panel de administración (dashboard_stats).
+#
+# Los contadores de usuarios salen de un solo aggregate con conteos condicionales; las últimas
+# sesiones y acciones, de particiones.ultimos (un escaneo del índice de timestamp, sin ORDER BY
+# sobre la tabla completa). El resultado, ya formateado, vive en la caché 'compartida' hasta
+# ADMIN_TABLERO_TTL segundos y se invalida con las señales de auditoría (lote de HistorialAccion
+# guardado, HistorialSesion nueva) y de CustomUser (ver cuentas.signals).
+#
+# Lo que tarda cada parte al recalcular se publica en el histograma hospital_tablero_admin_segundos
+# y, en la respuesta, en el encabezado Server-Timing.
+
+CLAVE = 'tablero_admin'
+ULTIMOS = 5
+
+registro.describir('hospital_tablero_admin_segundos', 'histogram', 'Tiempo de cada parte del tablero de administración al recalcularlo.')
+
+
+def _medir(tiempos, parte, funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - inicio
+    tiempos[parte] = segundos * 1000
+    registro.observar('hospital_tablero_admin_segundos', SEGUNDOS, segundos, parte=parte)
+    return resultado
+
+
+def calcular_tablero_admin():
+    """(datos, milisegundos por parte)."""
+    tiempos = {}
+    usuarios = _medir(tiempos, 'usuarios', lambda: CustomUser.objects.aggregate(
+        total=Count('id'), activos=Count('id', filter=Q(is_active=True)),
+    ))
+    sesiones = _medir(tiempos, 'sesiones', lambda: ultimos(HistorialSesion.objects.select_related('usuario'), ULTIMOS))
+    acciones = _medir(tiempos, 'acciones', lambda: ultimos(
+        HistorialAccion.objects.select_related('usuario', 'content_type'), ULTIMOS,
+    ))
+    datos = {
+        'total_users': usuarios['total'],
+        'active_users': usuarios['activos'],
+        'inactive_users': usuarios['total'] - usuarios['activos'],
+        'latest_sessions': [
+            {
+                'username': s.usuario.username if s.usuario else 'Sistema',
+                'event_type': s.get_accion_display(),
+                'timestamp': s.timestamp.strftime('%d/%m/%Y %H:%M'),
+                'ip_address': s.ip_address,
+            }
+            for s in sesiones
+        ],
+        'latest_actions': [
+            {
+                'username': a.usuario.username if a.usuario else 'Sistema',
+                'action_type': a.get_accion_display(),
+                'target_object_id': f"{a.content_type.model if a.content_type else 'Objeto desconocido'} (ID: {a.object_id or '?'})",
+                'timestamp': a.timestamp.strftime('%d/%m/%Y %H:%M'),
+            }
+            for a in acciones
+        ],
+    }
+    return datos, tiempos
+
+
+def tablero_admin():
+    """(datos, milisegundos por parte); las partes vienen vacías si los datos salieron de la caché."""
+    cache = caches['compartida']
+    datos = cache.get(CLAVE)
+    if datos is not None:
+        return datos, {}
+    datos, tiempos = calcular_tablero_admin()
+    cache.set(CLAVE, datos, timeout=settings.ADMIN_TABLERO_TTL)
+    return datos, tiempos
+
+
+def _borrar():
+    caches['compartida'].delete(CLAVE)
+
+
+def invalidar_tablero_admin():
+    """Descarta el tablero en caché. Se repite al confirmar, por si otro request lo recalculó entretanto."""
+    _borrar()
+    transaction.on_commit(_borrar)
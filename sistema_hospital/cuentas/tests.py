@@ -1,3 +1,210 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase
+from django_otp.plugins.otp_totp.models import TOTPDevice
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from auditoria.escritor import registrar_evento
+from auditoria.models import HistorialSesion
+from sistema_hospital.pruebas import ajustes_prueba
+from .autenticacion import JWTAutenticacionRapida, tokens_para
+from .models import CustomUser
+from .rut import separar_rut
+
+
+@ajustes_prueba
+class TableroAdminTests(TestCase):
+    URL = '/cuentas/api/dashboard/stats/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', rol=CustomUser.ADMIN)
+        for i in range(4):
+            usuario = CustomUser.objects.create(username=f'enfermero{i}', rol=CustomUser.ENFERMERO, is_active=i % 2 == 0)
+            HistorialSesion.objects.create(usuario=usuario, accion='login', ip_address='10.0.0.1')
+            cls._accion(usuario, f'Acción {i}')
+
+    @staticmethod
+    def _accion(usuario, detalles):
+        tipo = ContentType.objects.get_for_model(CustomUser).pk
+        registrar_evento(usuario.pk, 'modificacion', tipo, usuario.pk, detalles)
+
+    def setUp(self):
+        caches['compartida'].clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.admin)
+
+    def test_contadores_y_cache(self):
+        respuesta = self.cliente.get(self.URL)
+        datos = respuesta.json()
+        self.assertEqual((datos['total_users'], datos['active_users'], datos['inactive_users']), (5, 3, 2))
+        self.assertEqual([s['username'] for s in datos['latest_sessions']], ['enfermero3', 'enfermero2', 'enfermero1', 'enfermero0'])
+        self.assertEqual(datos['latest_actions'][0]['target_object_id'], f"customuser (ID: {CustomUser.objects.get(username='enfermero3').pk})")
+        self.assertIn('cache;desc="miss"', respuesta['Server-Timing'])
+        self.assertIn('acciones;dur=', respuesta['Server-Timing'])
+
+        with self.assertNumQueries(0):
+            respuesta = self.cliente.get(self.URL)
+        self.assertIn('cache;desc="hit"', respuesta['Server-Timing'])
+        self.assertEqual(respuesta.json(), datos)
+
+    def test_auditoria_y_usuarios_invalidan(self):
+        self.cliente.get(self.URL)
+        self._accion(self.admin, 'Acción nueva')
+        self.assertEqual(self.cliente.get(self.URL).json()['latest_actions'][0]['username'], 'admin')
+
+        CustomUser.objects.filter(username='enfermero1').get().delete()
+        self.assertEqual(self.cliente.get(self.URL).json()['total_users'], 4)
+
+    def test_los_errores_no_se_ocultan(self):
+        with mock.patch('cuentas.tablero.ultimos', side_effect=DatabaseError('sin conexión')), \
+                self.assertLogs('django.request', 'ERROR'), self.assertRaises(DatabaseError):
+            self.cliente.get(self.URL)
+
+
+class SepararRutTests(SimpleTestCase):
+
+    def test_formatos_aceptados(self):
+        for texto in ('12.345.678-5', '12345678-5', '123456785', ' 12345678 5 ', '12.345.678-5 '):
+            self.assertEqual(separar_rut(texto), (12_345_678, '5'), texto)
+        self.assertEqual(separar_rut('10.000.013-k'), (10_000_013, 'K'))
+
+    def test_rechazados(self):
+        for texto in ('', None, '12.345.678-4', '0-0', 'abc', '1234567890-1', '12.345.678'):
+            with self.assertRaises(ValueError, msg=texto):
+                separar_rut(texto)
+
+
+@ajustes_prueba
+class RutAntiguoUsuarioTests(TestCase):
+
+    def test_usuario_con_rut_repetido_sin_cuerpo_se_puede_guardar(self):
+        # Como lo deja la migración 0004: el segundo de un par repetido queda con rut_cuerpo NULL.
+        CustomUser.objects.create(username='original', rut='12.345.678-5')
+        repetido = CustomUser.objects.create(username='repetido')
+        CustomUser.objects.filter(pk=repetido.pk).update(rut='12345678-5')
+        admin = CustomUser.objects.create(username='admin', rol=CustomUser.ADMIN)
+
+        cliente = APIClient()
+        cliente.force_authenticate(admin)
+        respuesta = cliente.patch(f'/cuentas/api/users/{repetido.pk}/toggle_active/')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        repetido.refresh_from_db()
+        self.assertEqual((repetido.is_active, repetido.rut_cuerpo), (False, None))
+
+        # Cambiar el rut sí lo recalcula.
+        repetido.rut = '11.111.111-1'
+        repetido.save()
+        self.assertEqual(CustomUser.objects.get(pk=repetido.pk).rut_cuerpo, 11_111_111)
+
+
+@ajustes_prueba
+class AutenticacionJWTTests(TestCase):
+    URL = '/dashboard/api/mis-registros/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', rol=CustomUser.ADMIN)
+        cls.enfermero = CustomUser.objects.create(
+            username='enfermero', rol=CustomUser.ENFERMERO, email='enfermero@hospital.cl', first_name='Ana',
+        )
+
+    def setUp(self):
+        caches['compartida'].clear()
+        self.admin_cliente = APIClient()
+        self.admin_cliente.force_authenticate(self.admin)
+
+    def _usuario(self, token):
+        autenticacion = JWTAutenticacionRapida()
+        return autenticacion.get_user(autenticacion.get_validated_token(str(token)))
+
+    def _get(self, token):
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return cliente.get(self.URL)
+
+    def test_usuario_desde_claims_sin_consultas(self):
+        with self.assertNumQueries(0):
+            usuario = self._usuario(tokens_para(self.enfermero).access_token)
+        self.assertEqual(
+            (usuario.pk, usuario.username, usuario.rol, usuario.is_active, usuario.is_staff),
+            (self.enfermero.pk, 'enfermero', CustomUser.ENFERMERO, True, False),
+        )
+        self.assertIn('email', usuario.get_deferred_fields())
+
+    def test_campos_diferidos_en_una_consulta(self):
+        usuario = self._usuario(tokens_para(self.enfermero).access_token)
+        with self.assertNumQueries(1):
+            self.assertEqual((usuario.email, usuario.first_name, usuario.rut, usuario.last_login), ('enfermero@hospital.cl', 'Ana', None, None))
+        self.assertEqual(usuario.get_deferred_fields(), set())
+
+    def test_guardar_usuario_desde_claims_no_recalcula_rut_sin_cambios(self):
+        # Como el segundo de un par repetido (migración 0004): rut sin cuerpo canónico.
+        CustomUser.objects.filter(pk=self.enfermero.pk).update(rut='12345678-5')
+        usuario = self._usuario(tokens_para(self.enfermero).access_token)
+        self.assertEqual(usuario.rut, '12345678-5')
+        usuario.first_name = 'Ana María'
+        usuario.save()
+        self.assertEqual(CustomUser.objects.get(pk=self.enfermero.pk).rut_cuerpo, None)
+
+    def test_desactivar_revoca_tokens(self):
+        acceso = tokens_para(self.enfermero).access_token
+        self.assertEqual(self._get(acceso).status_code, 200)
+
+        url = f'/cuentas/api/users/{self.enfermero.pk}/toggle_active/'
+        self.assertEqual(self.admin_cliente.patch(url).status_code, 200)
+        respuesta = self._get(acceso)
+        self.assertEqual(respuesta.status_code, 401)
+        self.assertEqual(respuesta.json()['code'], 'token_revocado')
+
+        # Reactivado, el token viejo sigue revocado; uno nuevo funciona.
+        self.assertEqual(self.admin_cliente.patch(url).status_code, 200)
+        self.assertEqual(self._get(acceso).status_code, 401)
+        self.enfermero.refresh_from_db()
+        self.assertEqual(self._get(tokens_para(self.enfermero).access_token).status_code, 200)
+
+    def test_resetear_2fa_revoca_tokens(self):
+        refresh = tokens_para(self.enfermero)
+        self.assertEqual(self._get(refresh.access_token).status_code, 200)
+
+        respuesta = self.admin_cliente.post(f'/cuentas/api/users/{self.enfermero.pk}/reset_2fa/')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(self._get(refresh.access_token).status_code, 401)
+        # Un access nuevo sacado del mismo refresh conserva `emitido`: también queda revocado.
+        with self.assertRaises(AuthenticationFailed):
+            self._usuario(RefreshToken(str(refresh)).access_token)
+
+
+@ajustes_prueba
+class ConfiguracionDosFactoresTests(TestCase):
+    SETUP = '/cuentas/api/auth/setup-2fa/'
+    QR = '/cuentas/api/auth/setup-2fa/qr.svg'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.enfermero = CustomUser.objects.create(username='enfermero', rol=CustomUser.ENFERMERO)
+
+    def setUp(self):
+        caches['compartida'].clear()
+        self.cliente = APIClient()
+
+    def test_qr_del_dispositivo_pendiente(self):
+        self.assertEqual(self.cliente.get(self.QR, {'username': 'enfermero'}).status_code, 404)
+        self.assertFalse(TOTPDevice.objects.exists())
+
+        secreto = self.cliente.post(self.SETUP, {'username': 'enfermero'}).json()['secret_key']
+        respuesta = self.cliente.get(self.QR, {'username': 'enfermero'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'image/svg+xml')
+        self.assertEqual(TOTPDevice.objects.get().key, secreto)
+
+    def test_con_dispositivo_confirmado_no_entrega_secretos(self):
+        self.enfermero.totpdevice_set.create(confirmed=True)
+        self.assertEqual(self.cliente.post(self.SETUP, {'username': 'enfermero'}).status_code, 403)
+        self.assertEqual(self.cliente.get(self.QR, {'username': 'enfermero'}).status_code, 403)
+        self.assertFalse(TOTPDevice.objects.filter(confirmed=False).exists())
@@ -14,6 +14,7 @@ urlpatterns = [
     path('api/auth/login/', api_views.LoginAPIView.as_view(), name='auth-login'),
     path('api/auth/verify/', api_views.Verify2FAAPIView.as_view(), name='auth-verify'),
     path('api/auth/setup-2fa/', api_views.Generate2FAAPIView.as_view(), name='auth-setup-2fa'),
+    path('api/auth/setup-2fa/qr.svg', api_views.QR2FAAPIView.as_view(), name='auth-setup-2fa-qr'),
     path('api/auth/verify-setup/', api_views.VerifySetup2FAAPIView.as_view(), name='auth-verify-setup'),
     path('api/auth/solicitar-clave/', api_views.SolicitarCambioClaveView.as_view(), name='auth-request-pass'),
     path('api/dashboard/stats/', api_views.dashboard_stats, name='dashboard-stats'),
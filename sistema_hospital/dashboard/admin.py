@@ -7,6 +7,7 @@ from .models import (
     RecienNacido, 
     SolicitudCorreccion
 )
+from .busqueda import filtrar_madres
 
 
 
@@ -27,12 +28,23 @@ class MadreAdmin(admin.ModelAdmin):
     list_display = ('id', 'nombre', 'rut', 'fecha_nacimiento', 'telefono')
     search_fields = ('nombre', 'rut')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Índices de búsqueda (dashboard.busqueda) en vez de ILIKE '%..%' sobre toda la tabla.
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        return filtrar_madres(queryset, search_term), False
+
 @admin.register(RegistroParto)
 class RegistroPartoAdmin(admin.ModelAdmin):
     list_display = ('id', 'madre', 'fecha_parto', 'tipo_parto', 'registrado_por')
     list_filter = ('tipo_parto', 'tipo_analgesia', 'fecha_parto')
     search_fields = ('madre__nombre', 'madre__rut')
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(madre__in=filtrar_madres(Madre.objects.all(), search_term)), False
+
 @admin.register(RecienNacido)
 class RecienNacidoAdmin(admin.ModelAdmin):
     list_display = ('id', 'parto_asociado', 'sexo', 'peso_grs', 'talla_cm')
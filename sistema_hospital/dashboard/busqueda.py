@@ -0,0 +1,247 @@
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from cuentas.rut import partes_rut
+from .models import Madre, RegistroParto
+
+
+# Búsqueda de madres (nombre, RUT) y de partos (complicaciones_texto, personal_atiende).
+#
+# PostgreSQL: índices GIN de trigramas sobre el nombre sin tildes y el RUT sin puntos ni guion, y un
+# índice GIN de texto completo ('spanish') sobre el texto libre del parto. Requiere las extensiones
+# pg_trgm y unaccent.
+#
+# SQLite: tablas FTS5 de contenido externo (tokenizador unicode61 sin diacríticos) mantenidas por
+# triggers, y un índice por expresión para el RUT normalizado.
+#
+# Todo el DDL es idempotente y se aplica en post_migrate (dashboard.signals): en SQLite, cualquier
+# migración que reconstruya dashboard_madre o dashboard_registroparto borra sus triggers e índices
+# por expresión, y post_migrate los vuelve a crear (reindexando si faltaba alguno).
+
+LIMITE_MAXIMO = 100
+
+RUT_SQL = "REPLACE(REPLACE(UPPER(rut), '.', ''), '-', '')"
+
+_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() no es IMMUTABLE; esta envoltura (diccionario explícito) permite usarla en índices.
+    "CREATE OR REPLACE FUNCTION busqueda_normalizar(text) RETURNS text AS "
+    "$$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$ "
+    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT",
+    "CREATE INDEX IF NOT EXISTS madre_nombre_trgm_idx ON dashboard_madre "
+    "USING gin (busqueda_normalizar(nombre) gin_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS madre_rut_trgm_idx ON dashboard_madre USING gin (({RUT_SQL}) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS parto_texto_fts_idx ON dashboard_registroparto USING gin "
+    "(to_tsvector('spanish', busqueda_normalizar(coalesce(complicaciones_texto, '') || ' ' || coalesce(personal_atiende, ''))))",
+]
+
+# (tabla FTS, tabla de contenido, columnas)
+_FTS_SQLITE = [
+    ('dashboard_madre_fts', 'dashboard_madre', ('nombre',)),
+    ('dashboard_registroparto_fts', 'dashboard_registroparto', ('complicaciones_texto', 'personal_atiende')),
+]
+
+
+def _triggers_sqlite(fts, tabla, columnas):
+    cols = ', '.join(columnas)
+    nuevos = ', '.join(f'new.{c}' for c in columnas)
+    viejos = ', '.join(f'old.{c}' for c in columnas)
+    borrar = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {viejos});"
+    insertar = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {nuevos});"
+    return {
+        f'{fts}_ai': f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {tabla} BEGIN {insertar} END",
+        f'{fts}_ad': f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {tabla} BEGIN {borrar} END",
+        f'{fts}_au': f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {tabla} BEGIN {borrar} {insertar} END",
+    }
+
+
+def instalar(conexion=connection):
+    """Crea (si faltan) los índices de búsqueda del motor actual."""
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            for sentencia in _POSTGRES:
+                cursor.execute(sentencia)
+            return
+        if conexion.vendor != 'sqlite':
+            return
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS madre_rut_busqueda_idx ON dashboard_madre ({RUT_SQL})")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existentes = {fila[0] for fila in cursor.fetchall()}
+        for fts, tabla, columnas in _FTS_SQLITE:
+            faltantes = False
+            if fts not in existentes:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(columnas)}, content='{tabla}', "
+                    f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                )
+                faltantes = True
+            for nombre, sentencia in _triggers_sqlite(fts, tabla, columnas).items():
+                if nombre not in existentes:
+                    cursor.execute(sentencia)
+                    faltantes = True
+            if faltantes:
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def optimizar(conexion=connection):
+    """
+    SQLite: fusiona los segmentos de las tablas FTS5. Cada INSERT por trigger agrega un segmento y
+    la fusión automática va detrás de una carga grande; con muchos segmentos una consulta lee varias
+    listas por término. PostgreSQL: ANALYZE, para que el planner estime bien los índices GIN.
+    """
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            cursor.execute("ANALYZE dashboard_madre, dashboard_registroparto")
+        elif conexion.vendor == 'sqlite':
+            for fts, _, _ in _FTS_SQLITE:
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('optimize')")
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes ('Sepúlveda' -> 'sepulveda'), igual que unaccent/remove_diacritics."""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower().strip()
+
+
+def _rut_buscado(texto):
+    """Si el texto parece un RUT (completo o su comienzo) devuelve su forma normalizada; si no, None."""
+    compacto = re.sub(r'[\s.\-]', '', texto).upper()
+    return compacto if re.fullmatch(r'\d{3,}K?', compacto) else None
+
+
+def _consulta_fts(texto):
+    # Palabras entre comillas (sin sintaxis FTS del usuario) y AND implícito; solo la última como
+    # prefijo, porque es la que se está escribiendo: "maria" "gonzalez" "so"*
+    palabras = [f'"{p}"' for p in re.findall(r'\w+', normalizar(texto))]
+    if palabras:
+        palabras[-1] += '*'
+    return ' '.join(palabras)
+
+
+def _condicion_rut(rut):
+    """(sql, params) de las madres cuyo RUT normalizado empieza por `rut`, con el índice del motor."""
+    if connection.vendor == 'postgresql':
+        return f"{RUT_SQL} LIKE %s", [rut + '%']
+    # Rango en vez de LIKE: el LIKE de Django lleva ESCAPE y SQLite no lo resuelve con el índice.
+    return f"{RUT_SQL} >= %s AND {RUT_SQL} < %s", [rut, rut + '\uffff']
+
+
+def _ids_madres(cursor, texto, limite):
+    rut = _rut_buscado(texto)
+    cuerpo, _ = partes_rut(rut) if rut else (None, '')
+    if cuerpo is not None:
+        # RUT completo y válido: lectura directa del índice único de rut_cuerpo.
+        cursor.execute("SELECT id, 2.0 FROM dashboard_madre WHERE rut_cuerpo = %s", [cuerpo])
+        filas = cursor.fetchall()
+        if filas:
+            return filas
+    if rut:
+        condicion, params = _condicion_rut(rut)
+        cursor.execute(
+            f"SELECT id, CASE WHEN {RUT_SQL} = %s THEN 2.0 ELSE 1.0 END FROM dashboard_madre "
+            f"WHERE {condicion} ORDER BY 2 DESC, id LIMIT %s",
+            [rut, *params, limite],
+        )
+        return cursor.fetchall()
+    if connection.vendor == 'postgresql':
+        cursor.execute(
+            "SELECT id, word_similarity(busqueda_normalizar(%s), busqueda_normalizar(nombre)) AS puntaje "
+            "FROM dashboard_madre WHERE busqueda_normalizar(%s) <%% busqueda_normalizar(nombre) "
+            "ORDER BY puntaje DESC, id LIMIT %s",
+            [texto, texto, limite],
+        )
+        return cursor.fetchall()
+
+    consulta = _consulta_fts(texto)
+    if not consulta:
+        return []
+    # Todas las coincidencias se rankean dentro de SQLite (bm25 en C); solo salen las `limite` mejores.
+    cursor.execute(
+        "SELECT rowid, -rank FROM dashboard_madre_fts WHERE dashboard_madre_fts MATCH %s ORDER BY rank, rowid LIMIT %s",
+        [consulta, limite],
+    )
+    return cursor.fetchall()
+
+
+def _ids_partos(cursor, texto, limite, registradores):
+    filtro, params = '', []
+    if registradores is not None:
+        filtro = f" AND p.registrado_por_id IN ({', '.join(['%s'] * len(registradores))})"
+        params = list(registradores)
+        if not registradores:
+            return []
+
+    if connection.vendor == 'postgresql':
+        documento = ("to_tsvector('spanish', busqueda_normalizar(coalesce(p.complicaciones_texto, '') || ' ' "
+                     "|| coalesce(p.personal_atiende, '')))")
+        cursor.execute(
+            f"SELECT p.id, ts_rank({documento}, q) AS puntaje "
+            f"FROM dashboard_registroparto p, plainto_tsquery('spanish', busqueda_normalizar(%s)) q "
+            f"WHERE {documento} @@ q{filtro} ORDER BY puntaje DESC, p.id DESC LIMIT %s",
+            [texto, *params, limite],
+        )
+        return cursor.fetchall()
+
+    consulta = _consulta_fts(texto)
+    if not consulta:
+        return []
+    cursor.execute(
+        "SELECT f.rowid, -bm25(dashboard_registroparto_fts) AS puntaje "
+        "FROM dashboard_registroparto_fts f JOIN dashboard_registroparto p ON p.id = f.rowid "
+        f"WHERE dashboard_registroparto_fts MATCH %s{filtro} ORDER BY puntaje DESC, f.rowid DESC LIMIT %s",
+        [consulta, *params, limite],
+    )
+    return cursor.fetchall()
+
+
+def _cargar(queryset, filas):
+    """Trae las instancias de los ids rankeados (una consulta) y les deja `puntaje`, en orden."""
+    puntajes = dict(filas)
+    por_id = queryset.in_bulk(list(puntajes))
+    resultado = []
+    for pk, puntaje in filas:
+        if pk in por_id:
+            por_id[pk].puntaje = round(float(puntaje), 4)
+            resultado.append(por_id[pk])
+    return resultado
+
+
+def buscar_madres(texto, limite=20, queryset=None):
+    limite = min(limite, LIMITE_MAXIMO)
+    with connection.cursor() as cursor:
+        filas = _ids_madres(cursor, texto, limite)
+    return _cargar(queryset if queryset is not None else Madre.objects.all(), filas)
+
+
+def filtrar_madres(queryset, texto):
+    """
+    `queryset` restringido a todas las madres que coinciden con `texto`, sin ranking ni tope: la
+    condición va como subconsulta sobre los índices de búsqueda (para el admin, que ordena y pagina).
+    """
+    rut = _rut_buscado(texto)
+    if rut:
+        condicion, params = _condicion_rut(rut)
+        cuerpo, _ = partes_rut(rut)
+        filtro = Q(pk__in=RawSQL(f"SELECT id FROM dashboard_madre WHERE {condicion}", params))
+        return queryset.filter(filtro | Q(rut_cuerpo=cuerpo) if cuerpo is not None else filtro)
+    if connection.vendor == 'postgresql':
+        sql, params = "SELECT id FROM dashboard_madre WHERE busqueda_normalizar(%s) <%% busqueda_normalizar(nombre)", [texto]
+    else:
+        consulta = _consulta_fts(texto)
+        if not consulta:
+            return queryset.none()
+        sql, params = "SELECT rowid FROM dashboard_madre_fts WHERE dashboard_madre_fts MATCH %s", [consulta]
+    return queryset.filter(pk__in=RawSQL(sql, params))
+
+
+def buscar_partos(texto, limite=20, registradores=None, queryset=None):
+    """`registradores`: ids de usuarios cuyos registros puede ver quien busca (None = todos)."""
+    limite = min(limite, LIMITE_MAXIMO)
+    with connection.cursor() as cursor:
+        filas = _ids_partos(cursor, texto, limite, registradores)
+    return _cargar(queryset if queryset is not None else RegistroParto.objects.all(), filas)
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+# Caché de documentos direccionada por contenido: la clave es el hash de los datos con que se
+# renderiza el documento más la versión de su plantilla. Si cambia cualquier fila de origen
+# (madre, parto, RN, médico...) cambian los datos y con ellos la clave, así que una entrada
+# vieja nunca se vuelve a servir; simplemente queda sin uso hasta que el LRU la desaloja.
+# Subir la versión de una plantilla invalida todos sus documentos.
+VERSION_PLANTILLAS = {
+    'comprobante': 1,
+    'comprobantes': 1,
+    'certificado': 1,
+    'rem': 1,
+}
+
+
+def clave_documento(tipo, datos):
+    contenido = json.dumps(
+        {'tipo': tipo, 'version': VERSION_PLANTILLAS[tipo], 'datos': datos},
+        sort_keys=True, default=str, ensure_ascii=False,
+    )
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+class CacheDocumentos:
+    """
+    LRU en memoria (por proceso) respaldado por un LRU en disco compartido entre procesos.
+
+    Recorrer el directorio en cada escritura costaría O(archivos): cada proceso lleva una estimación
+    del tamaño en disco (el último recuento más lo que escribió desde entonces) y solo lo recorre
+    cuando la estimación pasa el máximo o cada `intervalo_recuento` segundos, para sumar lo que
+    escribieron los demás procesos. Al recortar baja hasta RECORTE_HASTA del máximo, así que las
+    escrituras siguientes no vuelven a recorrerlo enseguida.
+    """
+
+    RECORTE_HASTA = 0.9
+
+    def __init__(self, directorio, max_bytes_disco, max_bytes_memoria, intervalo_recuento=300):
+        self.directorio = directorio
+        self.max_bytes_disco = max_bytes_disco
+        self.max_bytes_memoria = max_bytes_memoria
+        self.intervalo_recuento = intervalo_recuento
+        self._memoria = OrderedDict()  # clave -> (contenido, creado)
+        self._bytes_memoria = 0
+        self._bytes_disco = None  # estimación; None hasta el primer recuento
+        self._recontado = 0.0
+        self._lock = threading.Lock()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave[:2], clave + '.bin')
+
+    def consultar(self, clave):
+        """Devuelve el timestamp de creación si la clave existe, sin leer el contenido."""
+        with self._lock:
+            if clave in self._memoria:
+                return self._memoria[clave][1]
+        try:
+            return os.stat(self._ruta(clave)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def leer(self, clave):
+        with self._lock:
+            if clave in self._memoria:
+                self._memoria.move_to_end(clave)
+                return self._memoria[clave]
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, 'rb') as f:
+                contenido = f.read()
+            creado = os.stat(ruta).st_mtime
+            os.utime(ruta, (time.time(), creado))  # atime marca el último uso para el LRU de disco
+        except FileNotFoundError:
+            return None
+        self._guardar_en_memoria(clave, contenido, creado)
+        return contenido, creado
+
+    def guardar(self, clave, contenido):
+        ruta = self._ruta(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+        creado = os.stat(ruta).st_mtime
+        self._guardar_en_memoria(clave, contenido, creado)
+        self._anotar_escritura(len(contenido))
+        return creado
+
+    def _guardar_en_memoria(self, clave, contenido, creado):
+        if len(contenido) > self.max_bytes_memoria:
+            return
+        with self._lock:
+            if clave in self._memoria:
+                return
+            self._memoria[clave] = (contenido, creado)
+            self._bytes_memoria += len(contenido)
+            while self._bytes_memoria > self.max_bytes_memoria:
+                _, (viejo, _) = self._memoria.popitem(last=False)
+                self._bytes_memoria -= len(viejo)
+
+    def _anotar_escritura(self, tamano):
+        with self._lock:
+            if self._bytes_disco is not None:
+                self._bytes_disco += tamano
+            ahora = time.monotonic()
+            recontar = (
+                self._bytes_disco is None
+                or self._bytes_disco > self.max_bytes_disco
+                or ahora - self._recontado >= self.intervalo_recuento
+            )
+            if recontar:
+                self._recontado = ahora
+        if recontar:
+            self._recortar_disco()
+
+    def _recortar_disco(self):
+        """Recuenta el directorio y, si pasa del máximo, borra los menos usados (por atime)."""
+        archivos = []
+        total = 0
+        for sub in os.scandir(self.directorio):
+            if not sub.is_dir():
+                continue
+            for entrada in os.scandir(sub.path):
+                try:
+                    st = entrada.stat()
+                except FileNotFoundError:
+                    continue  # otro proceso lo borró entretanto
+                archivos.append((st.st_atime, st.st_size, entrada.path))
+                total += st.st_size
+        if total > self.max_bytes_disco:
+            objetivo = self.max_bytes_disco * self.RECORTE_HASTA
+            for _, tamano, ruta in sorted(archivos):
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+                total -= tamano
+                if total <= objetivo:
+                    break
+        with self._lock:
+            self._bytes_disco = total
+
+    def obtener_o_generar(self, clave, generar):
+        encontrado = self.leer(clave)
+        if encontrado:
+            return encontrado
+        contenido = generar()
+        return contenido, self.guardar(clave, contenido)
+
+
+_cache = None
+
+
+def cache_documentos():
+    global _cache
+    if _cache is None:
+        _cache = CacheDocumentos(
+            settings.DOCUMENTOS_CACHE_DIR,
+            settings.DOCUMENTOS_CACHE_MAX_MB_DISCO * 1024 * 1024,
+            settings.DOCUMENTOS_CACHE_MAX_MB_MEMORIA * 1024 * 1024,
+            settings.DOCUMENTOS_CACHE_RECUENTO,
+        )
+    return _cache
+
+
+def documento_cacheado(tipo, datos, renderizar):
+    """Bytes del documento, renderizándolo solo si no está en caché."""
+    contenido, _ = cache_documentos().obtener_o_generar(clave_documento(tipo, datos), lambda: renderizar(datos))
+    return contenido
+
+
+def respuesta_documento(request, tipo, datos, renderizar, content_type='application/pdf', filename=None):
+    """HttpResponse con ETag/Last-Modified; responde 304 sin leer el archivo si el cliente ya lo tiene."""
+    cache = cache_documentos()
+    clave = clave_documento(tipo, datos)
+    etag = quote_etag(clave)
+
+    creado = cache.consultar(clave)
+    if creado is not None:
+        no_modificado = get_conditional_response(request, etag=etag, last_modified=int(creado))
+        if no_modificado is not None:
+            no_modificado['ETag'] = etag
+            no_modificado['Cache-Control'] = 'private, no-cache'
+            return no_modificado
+
+    contenido, creado = cache.obtener_o_generar(clave, lambda: renderizar(datos))
+    response = HttpResponse(contenido, content_type=content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(int(creado))
+    response['Cache-Control'] = 'private, no-cache'
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
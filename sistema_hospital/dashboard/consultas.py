@@ -0,0 +1,41 @@
+from django.db.models import Count, IntegerField, Value
+
+
+def contar_en_una_consulta(**querysets):
+    """Cuenta varios querysets (de cualquier modelo) en una sola sentencia UNION ALL."""
+    nombres = list(querysets)
+    partes = [
+        qs.order_by()
+        .annotate(conteo_idx=Value(i, output_field=IntegerField()))
+        .values('conteo_idx')
+        .annotate(conteo_total=Count('pk'))
+        .values_list('conteo_idx', 'conteo_total')
+        for i, qs in enumerate(querysets.values())
+    ]
+    consulta = partes[0].union(*partes[1:], all=True) if len(partes) > 1 else partes[0]
+    resultado = dict.fromkeys(nombres, 0)
+    for idx, total in consulta:
+        resultado[nombres[idx]] = total
+    return resultado
+
+
+class PlanConsultasMixin:
+    """
+    select_related/prefetch_related según la acción del ViewSet.
+
+    `planes_consultas` mapea acción -> (select_related, prefetch_related); la clave '*' es el plan
+    por defecto. Se aplica en filter_queryset, que DRF usa en list, retrieve y get_object, así que
+    vale también para vistas que redefinen get_queryset.
+    """
+    planes_consultas = {}
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        plan = self.planes_consultas.get(self.action, self.planes_consultas.get('*'))
+        if plan:
+            select, prefetch = plan
+            if select:
+                queryset = queryset.select_related(*select)
+            if prefetch:
+                queryset = queryset.prefetch_related(*prefetch)
+        return queryset
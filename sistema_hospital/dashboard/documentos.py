@@ -0,0 +1,297 @@
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, HRFlowable, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+
+# Generación de documentos PDF. Las funciones pdf_* reciben datos ya resueltos (sin consultas)
+# y devuelven los bytes del documento, para poder usarse dentro o fuera del ciclo request/response.
+# Hojas de estilo y TableStyle se construyen una vez por proceso y se comparten entre documentos.
+
+@lru_cache(maxsize=None)
+def _hoja_estilos():
+    return getSampleStyleSheet()
+
+
+@lru_cache(maxsize=None)
+def _estilos_comprobante():
+    styles = _hoja_estilos()
+    return {
+        'title': ParagraphStyle(name='C', parent=styles['Title'], alignment=TA_CENTER),
+        'header': ParagraphStyle(name='H', parent=styles['Heading3'], alignment=TA_CENTER),
+        'madre': TableStyle([('GRID', (0,0), (-1,-1), 0.5, colors.grey), ('BACKGROUND', (0,0), (0,-1), colors.whitesmoke), ('BACKGROUND', (2,0), (2,-1), colors.whitesmoke)]),
+        'rn': TableStyle([('GRID', (0,0), (-1,-1), 1, colors.black), ('BACKGROUND', (0,0), (-1,0), colors.lightgrey), ('ALIGN', (0,0), (-1,-1), 'CENTER')]),
+    }
+
+
+def datos_comprobante(parto):
+    registrado_por = parto.registrado_por
+    if parto.personal_atiende:
+        atendido = parto.personal_atiende
+    elif registrado_por and registrado_por.rol == 'doctor':
+        atendido = "Dr/a. " + registrado_por.username
+    else:
+        atendido = "No registrado"
+    return {
+        'id': parto.id,
+        'madre_nombre': parto.madre.nombre,
+        'madre_rut': parto.madre.rut,
+        'fecha': parto.fecha_parto.strftime('%d/%m/%Y %H:%M'),
+        'atendido': atendido,
+        'tipo_parto': str(parto.tipo_parto),
+        'tipo_analgesia': str(parto.tipo_analgesia),
+        'recien_nacidos': [
+            [rn.get_sexo_display(), f"{rn.peso_grs} g", f"{rn.talla_cm} cm", rn.apgar_1_min, rn.apgar_5_min]
+            for rn in parto.recien_nacidos.all()
+        ],
+    }
+
+
+def datos_certificado(tipo_paciente, obj):
+    if tipo_paciente == 'madre':
+        nombre, identificacion, titulo = obj.nombre, obj.rut, "PACIENTE (MADRE)"
+    else:
+        nombre = f"Recién Nacido de {obj.parto_asociado.madre.nombre}"
+        identificacion, titulo = f"ID: {obj.id}", "PACIENTE (RECIÉN NACIDO)"
+    fecha = obj.fecha_fallecimiento
+    return {
+        'tipo_paciente': tipo_paciente,
+        'id': obj.id,
+        'titulo': titulo,
+        'nombre': nombre,
+        'identificacion': identificacion,
+        'fecha': fecha.strftime('%d/%m/%Y %H:%M') if fecha else 'Sin registro',
+        'certificado_por': f"Dr/a. {obj.responsable_medico.username}" if obj.responsable_medico else "Sistema",
+    }
+
+
+def pdf_rem(data, f_inicio_str, f_fin_str):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=50, leftMargin=50, topMargin=50, bottomMargin=50
+    )
+
+    elements = []
+    styles = _hoja_estilos()
+    style_title = ParagraphStyle(
+        'ReportTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        alignment=TA_CENTER,
+        textColor=colors.HexColor('#1a237e'),
+        spaceAfter=10
+    )
+
+
+    style_section = ParagraphStyle(
+        'SectionHeader',
+        parent=styles['Heading2'],
+        fontSize=12,
+        textColor=colors.HexColor('#0d47a1'),
+        spaceBefore=15,
+        spaceAfter=5,
+        borderPadding=5,
+        borderColor=colors.HexColor('#e0e0e0'),
+        borderWidth=0,
+        backColor=None
+    )
+
+    style_cell_header = ParagraphStyle('HeaderCell', parent=styles['Normal'], fontSize=9, fontName='Helvetica-Bold', textColor=colors.HexColor('#1a237e'), alignment=TA_LEFT)
+    style_cell_data = ParagraphStyle('DataCell', parent=styles['Normal'], fontSize=9, textColor=colors.black, alignment=TA_LEFT)
+    style_cell_num = ParagraphStyle('NumCell', parent=styles['Normal'], fontSize=9, textColor=colors.black, alignment=TA_CENTER)
+
+
+    def get_clean_table_style():
+        return TableStyle([
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('LINEBELOW', (0,0), (-1,0), 1.5, colors.HexColor('#1a237e')),
+            ('LINEBELOW', (0,1), (-1,-1), 0.5, colors.lightgrey),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.HexColor('#1a237e')),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+            ('TOPPADDING', (0,0), (-1,-1), 6),
+        ])
+
+
+    elements.append(Paragraph("SERVICIO DE SALUD ÑUBLE", styles['Normal']))
+    elements.append(Paragraph("<b>HOSPITAL CLÍNICO HERMINDA MARTÍN</b>", styles['Normal']))
+    elements.append(Spacer(1, 20))
+    elements.append(Paragraph("INFORME ESTADÍSTICO REM A.24", style_title))
+    elements.append(Paragraph(f"Periodo de Análisis: {f_inicio_str} al {f_fin_str}", ParagraphStyle('Sub', parent=styles['Normal'], alignment=TA_CENTER)))
+    elements.append(Spacer(1, 10))
+    elements.append(HRFlowable(width="100%", thickness=1, color=colors.lightgrey))
+    elements.append(Spacer(1, 20))
+    elements.append(Paragraph("I. Resumen Ejecutivo y Demografía", style_section))
+    d_resumen = [
+        [Paragraph('Indicador Clave', style_cell_header), Paragraph('Valor', style_cell_header)],
+        ['Total de Partos Registrados', data['a']['total_partos']],
+        ['Total Recién Nacidos Vivos', data['d1']['total_rn']],
+        ['Cesáreas (Total)', data['a']['cesarea_electiva'] + data['a']['cesarea_urgencia']],
+        ['Madres Adolescentes (<18 años)', data['demo']['adolescente']],
+        ['Madres Extranjeras', data['demo']['extranjera']],
+        ['Mortalidad Neonatal en Periodo', data['mort']['neonatal']],
+    ]
+
+
+    t_resumen = Table(d_resumen, colWidths=[350, 150])
+    t_resumen.setStyle(get_clean_table_style())
+    elements.append(t_resumen)
+    elements.append(Spacer(1, 20))
+    elements.append(Paragraph("II. Caracterización del Parto", style_section))
+    d_seccion_a = [
+        [Paragraph('Tipo de Parto / Condición', style_cell_header), Paragraph('Cantidad', style_cell_header)],
+        [Paragraph('<b>Por Vía del Parto</b>', style_cell_data), ''],
+        ['   - Parto Vaginal Espontáneo', data['a']['vaginal_espontaneo']],
+        ['   - Parto Vaginal Instrumental', data['a']['vaginal_instrumental']],
+        ['   - Cesárea Electiva', data['a']['cesarea_electiva']],
+        ['   - Cesárea de Urgencia', data['a']['cesarea_urgencia']],
+        [Paragraph('<b>Condiciones Clínicas</b>', style_cell_data), ''],
+        ['   - Uso de Oxitocina', data['a']['con_oxitocina']],
+        ['   - Ligadura Tardía de Cordón', data['a']['con_ligadura_tardia']],
+        ['   - Contacto Piel a Piel', data['a']['con_piel_a_piel']],
+        [Paragraph('<b>Edad Gestacional</b>', style_cell_data), ''],
+        ['   - Pretérmino (< 37 semanas)', data['a']['pretermino']],
+        ['   - Post-término (> 42 semanas)', data['a']['posttermino']],
+    ]
+
+    t_a = Table(d_seccion_a, colWidths=[350, 150])
+    t_a.setStyle(get_clean_table_style())
+    t_a.setStyle(TableStyle([
+        ('BACKGROUND', (0,1), (-1,1), colors.HexColor('#f5f5f5')),
+        ('BACKGROUND', (0,6), (-1,6), colors.HexColor('#f5f5f5')),
+        ('BACKGROUND', (0,10), (-1,10), colors.HexColor('#f5f5f5')),
+    ]))
+    elements.append(t_a)
+    elements.append(Spacer(1, 20))
+    elements.append(Paragraph("III. Estadísticas del Recién Nacido (Peso)", style_section))
+
+    d_d1 = [
+        [Paragraph('Rango de Peso', style_cell_header), Paragraph('Total', style_cell_header), Paragraph('Sexo (M/F)', style_cell_header)],
+        ['< 1500 g (Muy bajo peso)', data['d1']['peso_menor_1500'], f"{data['d1']['sexo_m']} / {data['d1']['sexo_f']}"],
+        ['1500 - 2499 g (Bajo peso)', data['d1']['peso_1500_2499'], ''],
+        ['2500 - 3999 g (Peso normal)', data['d1']['peso_2500_3999'], ''],
+        ['≥ 4000 g (Macrosomía)', data['d1']['peso_mayor_4000'], ''],
+        [Paragraph('<b>TOTAL NACIDOS VIVOS</b>', style_cell_data), Paragraph(f"<b>{data['d1']['total_rn']}</b>", style_cell_data), ''],
+    ]
+
+    t_d1 = Table(d_d1, colWidths=[250, 100, 150])
+    t_d1.setStyle(get_clean_table_style())
+    elements.append(t_d1)
+    elements.append(Spacer(1, 20))
+    elements.append(Paragraph("IV. Atención Inmediata y Reanimación", style_section))
+
+    d_d2 = [
+        [Paragraph('Indicador', style_cell_header), Paragraph('Casos', style_cell_header)],
+        ['Apgar min 1 critico (≤ 3)', data['d2']['apgar_1_critico']],
+        ['Apgar min 5 critico (≤ 6)', data['d2']['apgar_5_critico']],
+        ['Reanimación Básica', data['d2']['reanimacion_basica']],
+        ['Reanimación Avanzada', data['d2']['reanimacion_avanzada']],
+        ['Profilaxis Ocular Entregada', data['d2']['profilaxis_ocular']],
+        ['Vacuna Hepatitis B Administrada', data['d2']['profilaxis_hepb']],
+        ['Anomalía Congénita Detectada', data['d1']['con_anomalia']],
+    ]
+
+    t_d2 = Table(d_d2, colWidths=[350, 150])
+    t_d2.setStyle(get_clean_table_style())
+    elements.append(t_d2)
+    elements.append(Spacer(1, 20))
+    elements.append(Paragraph("V. Alimentación al Alta", style_section))
+
+    d_e = [
+        [Paragraph('Tipo', style_cell_header), Paragraph('Total', style_cell_header), Paragraph('Migrantes', style_cell_header)],
+        ['Lactancia Materna Exclusiva', data['e']['lme_total'], data['e']['lme_migrante']],
+        ['Lactancia Mixta', data['e']['mixta_total'], data['e']['mixta_migrante']],
+        ['Fórmula Artificial', data['e']['formula_total'], data['e']['formula_migrante']],
+    ]
+
+    t_e = Table(d_e, colWidths=[250, 100, 150])
+    t_e.setStyle(get_clean_table_style())
+    elements.append(t_e)
+
+    elements.append(Spacer(1, 40))
+    elements.append(Paragraph("Documento generado automáticamente por Sistema de Gestión Hospitalaria.", ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, textColor=colors.grey, alignment=TA_CENTER)))
+    elements.append(Paragraph(f"Fecha de emisión: {datetime.now().strftime('%d/%m/%Y %H:%M')}", ParagraphStyle('FooterTime', parent=styles['Normal'], fontSize=8, textColor=colors.grey, alignment=TA_CENTER)))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def _elementos_comprobante(datos):
+    estilos = _estilos_comprobante()
+    title, header = estilos['title'], estilos['header']
+    elements = []
+
+    elements.append(Paragraph("HOSPITAL CLÍNICO HERMINDA MARTÍN", title))
+    elements.append(Paragraph("SERVICIO DE OBSTETRICIA Y GINECOLOGÍA", header))
+    elements.append(Spacer(1, 20))
+    elements.append(Paragraph(f"COMPROBANTE DE PARTO N° {datos['id']}", title))
+    elements.append(Spacer(1, 10))
+
+    data_madre = [
+        ['Madre:', datos['madre_nombre'], 'RUT:', datos['madre_rut']],
+        ['Fecha:', datos['fecha'], 'Atendido por:', datos['atendido']],
+        ['Tipo Parto:', datos['tipo_parto'], 'Analgesia:', datos['tipo_analgesia']]
+    ]
+    t_madre = Table(data_madre, colWidths=[80, 200, 60, 180])
+    t_madre.setStyle(estilos['madre'])
+    elements.append(t_madre)
+    elements.append(Spacer(1, 20))
+
+    data_rn = [['Sexo', 'Peso', 'Talla', 'APGAR 1', 'APGAR 5']] + datos['recien_nacidos']
+
+    t_rn = Table(data_rn, colWidths=[80, 80, 80, 80, 80])
+    t_rn.setStyle(estilos['rn'])
+    elements.append(t_rn)
+    return elements
+
+
+def pdf_comprobante(datos):
+    buffer = BytesIO()
+    SimpleDocTemplate(buffer, pagesize=letter).build(_elementos_comprobante(datos))
+    return buffer.getvalue()
+
+
+def pdf_comprobantes(lista_datos):
+    """Un solo PDF con un comprobante por página (o más, si el comprobante no cabe)."""
+    elements = []
+    for i, datos in enumerate(lista_datos):
+        if i:
+            elements.append(PageBreak())
+        elements.extend(_elementos_comprobante(datos))
+    buffer = BytesIO()
+    SimpleDocTemplate(buffer, pagesize=letter).build(elements)
+    return buffer.getvalue()
+
+
+def pdf_certificado(datos):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    elements = []
+    styles = _hoja_estilos()
+
+    elements.append(Paragraph("HOSPITAL CLÍNICO HERMINDA MARTÍN", styles['Title']))
+    elements.append(Paragraph("CERTIFICADO DE DEFUNCIÓN", styles['Heading2']))
+    elements.append(Spacer(1, 20))
+    elements.append(Paragraph(f"<b>{datos['titulo']}</b>", styles['Heading3']))
+
+    data = [
+        ['Nombre:', datos['nombre']],
+        ['Identificación:', datos['identificacion']],
+        ['Fecha Defunción:', datos['fecha']],
+        ['Certificado por:', datos['certificado_por']]
+    ]
+    t = Table(data, colWidths=[120, 300])
+    t.setStyle(TableStyle([('GRID', (0,0), (-1,-1), 1, colors.black), ('BACKGROUND', (0,0), (0,-1), colors.whitesmoke)]))
+    elements.append(t)
+
+    elements.append(Spacer(1, 50))
+    elements.append(Paragraph("__________________________<br/>Firma Médico Responsable", styles['Normal']))
+
+    doc.build(elements)
+    return buffer.getvalue()
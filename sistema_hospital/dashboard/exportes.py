@@ -0,0 +1,194 @@
+import csv
+import io
+import tempfile
+
+from openpyxl import Workbook
+
+from .models import RegistroParto, RecienNacido
+
+
+TAMANO_LOTE = 2000
+
+_REANIMACION = dict(RecienNacido.REANIMACION_CHOICES)
+_ALIMENTACION = dict(RecienNacido.ALIMENTACION_CHOICES)
+
+# (encabezado, campo para .values(), formateador)
+COLUMNAS_EXCEL = [
+    ("RUT Madre", 'parto_asociado__madre__rut', None),
+    ("Fecha", 'parto_asociado__fecha_parto', lambda v: v.strftime('%d/%m/%Y')),
+    ("Peso", 'peso_grs', None),
+    ("APGAR 1", 'apgar_1_min', None),
+    ("APGAR 5", 'apgar_5_min', None),
+    ("Reanimacion", 'reanimacion', lambda v: _REANIMACION.get(v, v)),
+    ("Anomalia", 'anomalia_congenita', lambda v: "SI" if v else "NO"),
+    ("Alimentacion", 'alimentacion_alta', lambda v: _ALIMENTACION.get(v, v)),
+]
+
+
+def filas_registros(fecha_inicio, fecha_fin, columnas=COLUMNAS_EXCEL):
+    """Genera las filas de la exportación de a una, leyendo la base por lotes con .values()."""
+    campos = [campo for _, campo, _ in columnas]
+    formateadores = [fmt for _, _, fmt in columnas]
+    qs = (
+        RecienNacido.objects
+        .filter(parto_asociado__fecha_parto__range=(fecha_inicio, fecha_fin))
+        .order_by('parto_asociado__fecha_parto')
+        .values_list(*campos)
+    )
+    for fila in qs.iterator(chunk_size=TAMANO_LOTE):
+        yield [fmt(v) if fmt and v is not None else v for v, fmt in zip(fila, formateadores)]
+
+
+def generar_excel_registros(fecha_inicio, fecha_fin):
+    """Escribe el xlsx en modo write-only (memoria constante) y devuelve un archivo temporal listo para leer."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title='Sheet1')
+    ws.append([encabezado for encabezado, _, _ in COLUMNAS_EXCEL])
+    for fila in filas_registros(fecha_inicio, fecha_fin):
+        ws.append(fila)
+
+    archivo = tempfile.TemporaryFile()
+    wb.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+# --- Exportación analítica (CSV / Parquet) sobre RegistroParto + Madre + RecienNacido ---
+# Una fila por recién nacido; los partos sin RN salen una vez con las columnas rn_* vacías.
+
+def _iso(v):
+    return v.isoformat()
+
+
+# nombre: (campo para .values(), tipo parquet, formateador CSV)
+COLUMNAS_EXPORT = {
+    'parto_id': ('id', 'int64', None),
+    'fecha_parto': ('fecha_parto', 'timestamp', _iso),
+    'edad_gestacional_semanas': ('edad_gestacional_semanas', 'int32', None),
+    'tipo_parto': ('tipo_parto__nombre', 'string', None),
+    'tipo_analgesia': ('tipo_analgesia__nombre', 'string', None),
+    'personal_atiende': ('personal_atiende', 'string', None),
+    'uso_oxitocina': ('uso_oxitocina', 'bool', None),
+    'ligadura_tardia_cordon': ('ligadura_tardia_cordon', 'bool', None),
+    'contacto_piel_a_piel': ('contacto_piel_a_piel', 'bool', None),
+    'complicaciones': ('complicaciones_texto', 'string', None),
+    'registrado_por': ('registrado_por__username', 'string', None),
+    'madre_rut': ('madre__rut', 'string', None),
+    'madre_nombre': ('madre__nombre', 'string', None),
+    'madre_fecha_nacimiento': ('madre__fecha_nacimiento', 'date', _iso),
+    'madre_nacionalidad': ('madre__nacionalidad', 'string', None),
+    'madre_pueblo_originario': ('madre__pertenece_pueblo_originario', 'bool', None),
+    'madre_fallecida': ('madre__fallecida', 'bool', None),
+    'rn_id': ('recien_nacidos__id', 'int64', None),
+    'rn_sexo': ('recien_nacidos__sexo', 'string', None),
+    'rn_peso_grs': ('recien_nacidos__peso_grs', 'int32', None),
+    'rn_talla_cm': ('recien_nacidos__talla_cm', 'float64', None),
+    'rn_apgar_1_min': ('recien_nacidos__apgar_1_min', 'int32', None),
+    'rn_apgar_5_min': ('recien_nacidos__apgar_5_min', 'int32', None),
+    'rn_reanimacion': ('recien_nacidos__reanimacion', 'string', None),
+    'rn_anomalia_congenita': ('recien_nacidos__anomalia_congenita', 'bool', None),
+    'rn_alimentacion_alta': ('recien_nacidos__alimentacion_alta', 'string', None),
+    'rn_fecha_alta': ('recien_nacidos__fecha_alta', 'timestamp', _iso),
+    'rn_fallecido': ('recien_nacidos__fallecido', 'bool', None),
+}
+
+
+def validar_columnas(nombres):
+    """Devuelve la lista de columnas pedidas (todas si viene vacía) o lanza ValueError con las desconocidas."""
+    if not nombres:
+        return list(COLUMNAS_EXPORT)
+    desconocidas = [n for n in nombres if n not in COLUMNAS_EXPORT]
+    if desconocidas:
+        raise ValueError(', '.join(desconocidas))
+    return nombres
+
+
+def lotes_registros(fecha_inicio, fecha_fin, columnas):
+    """Genera listas de tuplas (TAMANO_LOTE filas cada una) con los valores crudos de las columnas pedidas."""
+    qs = (
+        RegistroParto.objects
+        .filter(fecha_parto__range=(fecha_inicio, fecha_fin))
+        .order_by('fecha_parto', 'id', 'recien_nacidos__id')
+        .values_list(*[COLUMNAS_EXPORT[c][0] for c in columnas])
+    )
+    lote = []
+    for fila in qs.iterator(chunk_size=TAMANO_LOTE):
+        lote.append(fila)
+        if len(lote) == TAMANO_LOTE:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def stream_csv(fecha_inicio, fecha_fin, columnas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    formateadores = [COLUMNAS_EXPORT[c][2] for c in columnas]
+
+    def vaciar():
+        datos = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return datos.encode('utf-8')
+
+    escritor.writerow(columnas)
+    yield vaciar()
+    for lote in lotes_registros(fecha_inicio, fecha_fin, columnas):
+        escritor.writerows(
+            [fmt(v) if fmt and v is not None else v for v, fmt in zip(fila, formateadores)]
+            for fila in lote
+        )
+        yield vaciar()
+
+
+class Sumidero(io.RawIOBase):
+    """Destino de escritura secuencial (Parquet, ZIP de comprobantes): acumula bytes hasta que el generador los entrega."""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def stream_parquet(fecha_inicio, fecha_fin, columnas):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tipos = {
+        'int32': pa.int32(), 'int64': pa.int64(), 'float64': pa.float64(), 'bool': pa.bool_(),
+        'string': pa.string(), 'date': pa.date32(), 'timestamp': pa.timestamp('us', tz='UTC'),
+    }
+    esquema = pa.schema([(c, tipos[COLUMNAS_EXPORT[c][1]]) for c in columnas])
+    conversores = [float if COLUMNAS_EXPORT[c][1] == 'float64' else None for c in columnas]
+
+    sumidero = Sumidero()
+    escritor = pq.ParquetWriter(sumidero, esquema, compression='snappy')
+    for lote in lotes_registros(fecha_inicio, fecha_fin, columnas):
+        arreglos = []
+        for i, conv in enumerate(conversores):
+            valores = [fila[i] for fila in lote]
+            if conv:
+                valores = [conv(v) if v is not None else None for v in valores]
+            arreglos.append(pa.array(valores, type=esquema.field(i).type))
+        escritor.write_batch(pa.record_batch(arreglos, schema=esquema))
+        datos = sumidero.vaciar()
+        if datos:
+            yield datos
+    escritor.close()
+    yield sumidero.vaciar()
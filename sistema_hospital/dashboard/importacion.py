@@ -0,0 +1,285 @@
+import csv
+import io
+import json
+import re
+import time
+from itertools import islice
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from auditoria.escritor import registrar_evento
+from cuentas.rut import separar_rut
+from .models import TipoParto, TipoAnalgesia, Madre, RegistroParto, RecienNacido
+from .serializers import ImportacionMadreSerializer, ImportacionPartoSerializer, ImportacionRecienNacidoSerializer
+from .signals import programar_resumen
+from .tablero import invalidar_tablero_supervisor
+
+
+# Importación masiva de partos históricos (CSV o JSONL), por lotes de `tamano_lote` filas.
+#
+# Cada fila es un parto con su madre y sus recién nacidos:
+#   JSONL: {"madre": {...}, "parto": {...}, "recien_nacidos": [{...}, ...]}
+#   CSV:   columnas madre_<campo>, <campo del parto>, rn_<campo> y, para partos múltiples,
+#          rn2_<campo>, rn3_<campo>... (tipo_parto y tipo_analgesia van por nombre)
+#
+# Por lote: validación con los serializers de importación (una instancia por modelo), una
+# consulta para las madres ya registradas (por rut_cuerpo) y, en una transacción, un bulk_create
+# por modelo. Una fila con cualquier error se descarta entera y se informa con su número de línea;
+# el resto del lote se inserta. bulk_create no dispara señales: el resumen REM de los días tocados
+# se recalcula al terminar, la búsqueda se indexa sola (triggers FTS en SQLite, índices de
+# expresión en PostgreSQL), el tablero del supervisor se invalida una vez y la auditoría es un
+# evento de resumen por lote.
+
+TAMANO_LOTE = 1000
+MAXIMO_ERRORES = 500  # errores de fila que se conservan en el resultado (se cuentan todos)
+
+_COLUMNA_RN = re.compile(r'rn(\d*)_(.+)')
+_VERDADEROS_CSV = {'si', 'sí', 's'}
+_FALSOS_CSV = {'no', 'n'}
+
+
+class ResultadoImportacion:
+    def __init__(self):
+        self.filas = self.madres_nuevas = self.madres_existentes = self.partos = self.recien_nacidos = 0
+        self.filas_con_error = 0
+        self.errores = []
+        self.segundos = 0.0
+
+    def error(self, linea, detalle):
+        self.filas_con_error += 1
+        if len(self.errores) < MAXIMO_ERRORES:
+            self.errores.append({'linea': linea, 'errores': detalle})
+
+    @property
+    def filas_por_segundo(self):
+        return self.filas / self.segundos if self.segundos else 0.0
+
+    def como_dict(self):
+        return {
+            'filas': self.filas,
+            'filas_con_error': self.filas_con_error,
+            'madres_nuevas': self.madres_nuevas,
+            'madres_existentes': self.madres_existentes,
+            'partos': self.partos,
+            'recien_nacidos': self.recien_nacidos,
+            'segundos': round(self.segundos, 3),
+            'filas_por_segundo': round(self.filas_por_segundo, 1),
+            'errores': self.errores,
+        }
+
+
+def _valor_csv(valor):
+    valor = valor.strip()
+    if valor.lower() in _VERDADEROS_CSV:
+        return True
+    if valor.lower() in _FALSOS_CSV:
+        return False
+    return valor
+
+
+def _fila_csv(columnas):
+    fila = {'madre': {}, 'parto': {}, 'recien_nacidos': []}
+    rns = {}
+    for columna, valor in columnas.items():
+        if columna is None or valor is None or not valor.strip():
+            continue  # celda vacía: el campo toma su valor por defecto
+        columna = columna.strip()
+        valor = _valor_csv(valor)
+        if columna.startswith('madre_'):
+            fila['madre'][columna[len('madre_'):]] = valor
+        elif m := _COLUMNA_RN.fullmatch(columna):
+            rns.setdefault(int(m.group(1) or 1), {})[m.group(2)] = valor
+        else:
+            fila['parto'][columna] = valor
+    fila['recien_nacidos'] = [rns[n] for n in sorted(rns)]
+    return fila
+
+
+def leer_filas(archivo, formato):
+    """Genera (línea, fila) desde un archivo binario, sin cargarlo entero en memoria."""
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    if formato == 'csv':
+        lector = csv.DictReader(texto)
+        for columnas in lector:
+            yield lector.line_num, _fila_csv(columnas)
+    elif formato == 'jsonl':
+        for linea, contenido in enumerate(texto, start=1):
+            if not contenido.strip():
+                continue
+            try:
+                fila = json.loads(contenido)
+            except ValueError as e:
+                yield linea, ValueError(f"JSON inválido: {e}")
+                continue
+            yield linea, fila
+    else:
+        raise ValueError("Formato no soportado. Opciones: csv, jsonl")
+
+
+def _catalogos():
+    return {
+        'tipos_parto': {n.lower(): i for i, n in TipoParto.objects.values_list('id', 'nombre')},
+        'tipos_analgesia': {n.lower(): i for i, n in TipoAnalgesia.objects.values_list('id', 'nombre')},
+    }
+
+
+def _validar_lote(lote, contexto, resultado):
+    """Valida el lote completo; devuelve [(línea, madre, parto, [rn, ...])] de las filas sin errores."""
+    filas = []
+    for linea, fila in lote:
+        if not isinstance(fila, dict):
+            resultado.error(linea, {'fila': [str(fila) if isinstance(fila, Exception) else "Se esperaba un objeto JSON."]})
+            continue
+        rns = fila.get('recien_nacidos') or []
+        if not isinstance(fila.get('madre'), dict) or not isinstance(fila.get('parto'), dict) or not isinstance(rns, list):
+            resultado.error(linea, {'fila': ["Se esperan las claves madre y parto (objetos) y recien_nacidos (lista)."]})
+            continue
+        filas.append((linea, fila['madre'], fila['parto'], rns))
+
+    madres = _validar(ImportacionMadreSerializer(), [f[1] for f in filas])
+    partos = _validar(ImportacionPartoSerializer(context=contexto), [f[2] for f in filas])
+    rns = _validar(ImportacionRecienNacidoSerializer(), [rn for f in filas for rn in f[3]])
+
+    validas = []
+    posicion_rn = 0
+    for i, (linea, _, _, rns_fila) in enumerate(filas):
+        rns_de_fila = rns[posicion_rn:posicion_rn + len(rns_fila)]
+        posicion_rn += len(rns_fila)
+        errores = {}
+        if madres[i][1]:
+            errores['madre'] = madres[i][1]
+        if partos[i][1]:
+            errores['parto'] = partos[i][1]
+        errores_rn = {str(n + 1): error for n, (_, error) in enumerate(rns_de_fila) if error}
+        if errores_rn:
+            errores['recien_nacidos'] = errores_rn
+        if errores:
+            resultado.error(linea, errores)
+        else:
+            validas.append((linea, madres[i][0], partos[i][0], [datos for datos, _ in rns_de_fila]))
+    return validas
+
+
+def _validar(serializer, filas):
+    """
+    [(datos_validados, errores)] alineado con `filas`. Una sola instancia del serializer para todo
+    el lote (los campos se construyen una vez), como hace ListSerializer con su child, pero sin
+    descartar las filas válidas cuando alguna falla.
+    """
+    salida = []
+    for datos in filas:
+        try:
+            salida.append((serializer.run_validation(datos), None))
+        except ValidationError as e:
+            salida.append((None, as_serializer_error(e)))
+    return salida
+
+
+def _insertar_lote(validas, usuario_id, numero_lote, origen, resultado):
+    cuerpos = [separar_rut(madre['rut']) for _, madre, _, _ in validas]
+    existentes = dict(
+        Madre.objects.filter(rut_cuerpo__in={c for c, _ in cuerpos}).values_list('rut_cuerpo', 'id')
+    )
+
+    # Una madre que aparece varias veces en el lote se crea una vez (con los datos de su primera fila).
+    # bulk_create no pasa por RutCanonico.save(): las columnas canónicas se asignan aquí.
+    nuevas = {}
+    for (cuerpo, dv), (_, madre, _, _) in zip(cuerpos, validas):
+        if cuerpo not in existentes and cuerpo not in nuevas:
+            nuevas[cuerpo] = Madre(**madre, rut_cuerpo=cuerpo, rut_dv=dv)
+
+    with transaction.atomic():
+        Madre.objects.bulk_create(nuevas.values())
+        ids_madre = {**existentes, **{cuerpo: m.id for cuerpo, m in nuevas.items()}}
+
+        partos = []
+        for (cuerpo, _), (_, _, parto, _) in zip(cuerpos, validas):
+            parto = dict(parto)
+            partos.append(RegistroParto(
+                tipo_parto_id=parto.pop('tipo_parto', None),
+                tipo_analgesia_id=parto.pop('tipo_analgesia', None),
+                madre_id=ids_madre[cuerpo],
+                registrado_por_id=usuario_id,
+                **parto,
+            ))
+        RegistroParto.objects.bulk_create(partos)
+        rns = RecienNacido.objects.bulk_create([
+            RecienNacido(parto_asociado_id=parto.id, **datos)
+            for parto, (_, _, _, datos_rn) in zip(partos, validas) for datos in datos_rn
+        ])
+
+        detalles = (
+            f"Importación masiva{f' de {origen}' if origen else ''}, lote {numero_lote}: "
+            f"{len(partos)} partos (ids {partos[0].id}-{partos[-1].id}), {len(nuevas)} madres nuevas, "
+            f"{len(rns)} recién nacidos"
+        )
+        content_type_id = ContentType.objects.get_for_model(RegistroParto).pk
+        transaction.on_commit(lambda: registrar_evento(
+            usuario_id=usuario_id, accion='creacion', content_type_id=content_type_id,
+            object_id=partos[0].id, detalles=detalles,
+        ))
+
+    resultado.madres_nuevas += len(nuevas)
+    resultado.madres_existentes += sum(1 for cuerpo, _ in cuerpos if cuerpo in existentes)
+    resultado.partos += len(partos)
+    resultado.recien_nacidos += len(rns)
+
+    fechas = [p.fecha_parto for p in partos]
+    fechas += [m.fecha_fallecimiento for m in nuevas.values() if m.fallecida]
+    fechas += [rn.fecha_fallecimiento for rn in rns if rn.fallecido]
+    return {timezone.localdate(f) for f in fechas if f}
+
+
+def importar(archivo, formato, usuario=None, tamano_lote=TAMANO_LOTE, origen='', al_avanzar=None):
+    """
+    Importa un archivo binario CSV o JSONL y devuelve un ResultadoImportacion. Cada lote se confirma
+    por separado: si el proceso se interrumpe, los lotes anteriores quedan cargados.
+    `al_avanzar(resultado)` se llama tras cada lote.
+
+    El resumen REM se recalcula una vez al final, sobre todos los días tocados (los días seguidos
+    se recalculan en una sola pasada); si la importación se corta antes, reconstruir_resumen_rem
+    lo pone al día.
+    """
+    if formato not in ('csv', 'jsonl'):
+        raise ValueError("Formato no soportado. Opciones: csv, jsonl")
+    resultado = ResultadoImportacion()
+    usuario_id = usuario.pk if usuario is not None else None
+    contexto = _catalogos()
+    filas = leer_filas(archivo, formato)
+    inicio = time.perf_counter()
+    numero_lote = 0
+    dias = set()
+    while True:
+        try:
+            lote = list(islice(filas, tamano_lote))
+        except (UnicodeDecodeError, csv.Error) as e:
+            resultado.error(resultado.filas + 1, {'archivo': [f"Archivo ilegible, importación detenida: {e}"]})
+            break
+        if not lote:
+            break
+        numero_lote += 1
+        resultado.filas += len(lote)
+        validas = _validar_lote(lote, contexto, resultado)
+        if validas:
+            try:
+                dias |= _insertar_lote(validas, usuario_id, numero_lote, origen, resultado)
+            except IntegrityError:
+                # Otro proceso registró alguna de estas madres entre la consulta y el INSERT.
+                # Un reintento vuelve a consultarlas; si falla de nuevo, el lote se informa como error.
+                try:
+                    dias |= _insertar_lote(validas, usuario_id, numero_lote, origen, resultado)
+                except IntegrityError as e:
+                    for linea, _, _, _ in validas:
+                        resultado.error(linea, {'fila': [f"No se pudo insertar: {e}"]})
+        if al_avanzar:
+            al_avanzar(resultado)
+    programar_resumen(dias)
+    if resultado.partos:
+        invalidar_tablero_supervisor()
+    resultado.errores.sort(key=lambda e: e['linea'])
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
@@ -0,0 +1,141 @@
+import logging
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .cache_documentos import cache_documentos, clave_documento
+from .documentos import pdf_comprobante
+from .exportes import Sumidero
+from .models import RegistroParto
+
+
+logger = logging.getLogger(__name__)
+
+# Bajo este número de documentos pendientes no compensa repartir el trabajo entre procesos.
+MINIMO_PARALELO = 8
+
+
+def partos_para_comprobantes(fecha_inicio=None, fecha_fin=None, ids=None):
+    """Partos con todo lo que usa el comprobante: dos consultas sin importar cuántos sean."""
+    qs = (
+        RegistroParto.objects
+        .select_related('madre', 'tipo_parto', 'tipo_analgesia', 'registrado_por')
+        .prefetch_related('recien_nacidos')
+        .order_by('fecha_parto', 'id')
+    )
+    if ids is not None:
+        return qs.filter(pk__in=ids)
+    return qs.filter(fecha_parto__range=(fecha_inicio, fecha_fin))
+
+
+# Pool de procesos para renderizar lotes grandes, uno por proceso web (cada worker de gunicorn
+# tiene el suyo, así que COMPROBANTES_LOTE_WORKERS es por worker). Se crea al primer lote, se
+# reutiliza mientras haya lotes seguidos y se cierra tras COMPROBANTES_LOTE_INACTIVIDAD segundos
+# sin uso. Si un proceso muere (BrokenProcessPool), el pool se descarta, el lote en curso termina
+# en el proceso web y el siguiente lote crea uno nuevo.
+_pool = None
+_en_uso = 0
+_temporizador = None
+_lock_pool = threading.Lock()
+
+
+@contextmanager
+def _pool_procesos():
+    # pdf_comprobante no toca la base, así que los procesos no necesitan django.setup().
+    global _pool, _en_uso, _temporizador
+    with _lock_pool:
+        if _temporizador is not None:
+            _temporizador.cancel()
+            _temporizador = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.COMPROBANTES_LOTE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        pool = _pool
+        _en_uso += 1
+    try:
+        yield pool
+    finally:
+        with _lock_pool:
+            _en_uso -= 1
+            if _en_uso == 0 and _pool is not None:
+                _temporizador = threading.Timer(settings.COMPROBANTES_LOTE_INACTIVIDAD, _cerrar_inactivo)
+                _temporizador.daemon = True
+                _temporizador.start()
+
+
+def _cerrar_inactivo():
+    global _pool
+    with _lock_pool:
+        if _en_uso or _pool is None:
+            return
+        pool, _pool = _pool, None
+    pool.shutdown(wait=False)
+
+
+def _descartar(pool):
+    global _pool
+    with _lock_pool:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _renderizar(faltantes):
+    """PDF de cada dato de `faltantes`, en orden, a medida que están listos."""
+    if len(faltantes) < MINIMO_PARALELO or settings.COMPROBANTES_LOTE_WORKERS <= 1:
+        yield from map(pdf_comprobante, faltantes)
+        return
+    hechos = 0
+    with _pool_procesos() as pool:
+        try:
+            for pdf in pool.map(pdf_comprobante, faltantes, chunksize=4):
+                hechos += 1
+                yield pdf
+        except BrokenProcessPool:
+            logger.exception("Se cayó el pool de comprobantes; el lote sigue en el proceso web")
+            _descartar(pool)
+        else:
+            return
+    yield from map(pdf_comprobante, faltantes[hechos:])
+
+
+def renderizar_comprobantes(lista_datos):
+    """
+    Genera (datos, pdf) en el mismo orden; solo renderiza lo que no está en la caché de documentos.
+    Los aciertos se detectan sin leerlos (consultar) y cada uno se lee recién al entregarlo, así que
+    en memoria hay un PDF a la vez y no el lote entero.
+    """
+    cache = cache_documentos()
+    claves = [clave_documento('comprobante', datos) for datos in lista_datos]
+    en_cache = [cache.consultar(clave) is not None for clave in claves]
+    renderizados = _renderizar([datos for datos, hit in zip(lista_datos, en_cache) if not hit])
+
+    try:
+        for datos, clave, hit in zip(lista_datos, claves, en_cache):
+            encontrado = cache.leer(clave) if hit else None
+            if encontrado:
+                yield datos, encontrado[0]
+                continue
+            # Sin acierto, o desalojado entre la consulta y la lectura (se renderiza aquí, fuera del lote).
+            pdf = next(renderizados) if not hit else pdf_comprobante(datos)
+            cache.guardar(clave, pdf)
+            yield datos, pdf
+    finally:
+        renderizados.close()  # libera el pool aunque el cliente corte la descarga
+
+
+def stream_zip_comprobantes(lista_datos):
+    """ZIP (sin recomprimir, los PDF ya vienen comprimidos) que se entrega a medida que se renderiza."""
+    sumidero = Sumidero()
+    with zipfile.ZipFile(sumidero, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for datos, pdf in renderizar_comprobantes(lista_datos):
+            zf.writestr(f"Comprobante_Parto_{datos['id']}.pdf", pdf)
+            yield sumidero.vaciar()
+    yield sumidero.vaciar()
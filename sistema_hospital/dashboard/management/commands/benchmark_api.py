@@ -0,0 +1,276 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_otp.oath import totp
+from django_otp.plugins.otp_totp.models import TOTPDevice
+from rest_framework.test import APIClient
+
+from auditoria.escritor import vaciar_auditoria
+from auditoria.models import HistorialAccion, HistorialSesion
+from cuentas import api_views as cuentas_views
+from cuentas.autenticacion import tokens_para
+from cuentas.models import CustomUser, Equipo, SolicitudClave
+from dashboard.models import Madre, RegistroParto, SolicitudCorreccion, TrabajoReporte
+from dashboard.sinteticos import (
+    CLAVE_SINTETICA, generar_personal, generar_equipos, generar_partos,
+    marcar_altas_y_defunciones, generar_solicitudes, generar_auditoria,
+)
+
+
+# Lo que la corrida puede crear, en orden de borrado (los RN caen con sus partos, los miembros con
+# sus equipos). Al terminar se borran las filas con id mayor que el máximo tomado al empezar: correr
+# contra una base de desarrollo o de benchmark, donde nadie más escribe mientras tanto.
+CREADOS = (
+    SolicitudCorreccion, TrabajoReporte, RegistroParto, Madre, Equipo, SolicitudClave, TOTPDevice,
+    HistorialAccion, HistorialSesion, CustomUser,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide los endpoints principales en el mismo proceso (cliente de prueba de DRF con JWT real): '
+        'p50/p95/p99, primera llamada, consultas, memoria pico y tamaño de respuesta. Usa los datos de '
+        'generar_datos_sinteticos (o siembra y borra al terminar con --sembrar) y guarda el resultado en '
+        'JSON para comparar entre commits con --comparar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=30)
+        parser.add_argument('--casos', help='Lista separada por comas (por defecto, todos).')
+        parser.add_argument('--prefijo', default='sintetico', help='Prefijo de los usuarios de generar_datos_sinteticos.')
+        parser.add_argument('--sembrar', type=int, default=0, metavar='PARTOS',
+                            help='Siembra esta cantidad de partos; se borran al terminar.')
+        parser.add_argument('--salida', help='Archivo JSON donde guardar el resultado.')
+        parser.add_argument('--comparar', help='JSON de una corrida anterior contra el cual comparar.')
+        parser.add_argument('--tolerancia', type=float, default=0.2, help='Aumento relativo de p95 que cuenta como regresión.')
+        parser.add_argument('--estricto', action='store_true', help='Termina con error si hay regresiones.')
+
+    def handle(self, *args, **opts):
+        marcas = {modelo: modelo.objects.aggregate(maximo=Max('pk'))['maximo'] or 0 for modelo in CREADOS}
+        try:
+            with transaction.atomic():
+                if opts['sembrar']:
+                    self._sembrar(opts['sembrar'], opts['prefijo'], marcas[RegistroParto])
+                usuarios = self._usuarios(opts['prefijo'])
+                dispositivo = usuarios['doctor'].totpdevice_set.create(name='benchmark', confirmed=True)
+
+            # Los requests se miden fuera de toda transacción, como en producción: on_commit se ejecuta
+            # (invalidaciones de caché), el LRU de equipos se llena y la auditoría va por el escritor.
+            with self._entorno():
+                casos = self._casos(usuarios, dispositivo)
+                if opts['casos']:
+                    pedidos = [c.strip() for c in opts['casos'].split(',')]
+                    desconocidos = set(pedidos) - set(casos)
+                    if desconocidos:
+                        raise CommandError(f"Casos desconocidos: {', '.join(sorted(desconocidos))}. Opciones: {', '.join(casos)}")
+                    casos = {nombre: casos[nombre] for nombre in pedidos}
+
+                resultado = self._metadatos()
+                for nombre, caso in casos.items():
+                    resultado['casos'][nombre] = medicion = self._medir(caso, opts['repeticiones'])
+                    self.stdout.write(
+                        f"{nombre:28} p50 {medicion['p50_ms']:8.2f} | p95 {medicion['p95_ms']:8.2f} | p99 {medicion['p99_ms']:8.2f} | "
+                        f"frío {medicion['primera_ms']:8.2f} ms | {medicion['consultas']:3} consultas | "
+                        f"{medicion['memoria_pico_kb']:8.0f} KB | {medicion['bytes']:>9} B | {medicion['status']}"
+                    )
+        finally:
+            self._limpiar(marcas)
+
+        if opts['salida']:
+            with open(opts['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Resultado guardado en {opts['salida']}"))
+        if opts['comparar']:
+            regresiones = self._comparar(resultado, opts['comparar'], opts['tolerancia'])
+            if regresiones and opts['estricto']:
+                raise CommandError(f"Regresiones en: {', '.join(regresiones)}")
+
+    @contextmanager
+    def _entorno(self):
+        # Sin límite de intentos en login/2FA: el benchmark repite el mismo usuario.
+        vistas = (cuentas_views.LoginAPIView, cuentas_views.Verify2FAAPIView)
+        originales = [vista.throttle_classes for vista in vistas]
+        for vista in vistas:
+            vista.throttle_classes = []
+        try:
+            yield
+        finally:
+            for vista, clases in zip(vistas, originales):
+                vista.throttle_classes = clases
+
+    def _sembrar(self, partos, prefijo, ultimo_parto):
+        inicio = time.perf_counter()
+        personal = generar_personal(5, 20, 2, 1, prefijo=prefijo)
+        clinicos = personal[CustomUser.DOCTOR] + personal[CustomUser.ENFERMERO]
+        generar_equipos(personal[CustomUser.DOCTOR], personal[CustomUser.ENFERMERO])
+        generar_partos(partos, usuarios=clinicos)
+        # Solo los partos sembrados: los que ya estaban en la base no se modifican.
+        sembrados = RegistroParto.objects.filter(pk__gt=ultimo_parto)
+        marcar_altas_y_defunciones(partos=sembrados)
+        generar_solicitudes(clinicos, partos=sembrados)
+        generar_auditoria([u for grupo in personal.values() for u in grupo], partos * 2, partos // 2, dias=365)
+        self.stdout.write(f"Sembrados {partos} partos en {time.perf_counter() - inicio:.1f}s (se borran al terminar)")
+
+    def _limpiar(self, marcas):
+        """Borra lo creado por la corrida: datos sembrados, dispositivo TOTP, sesiones y auditoría de los requests."""
+        vaciar_auditoria()  # lo que el escritor en segundo plano aún no insertó
+        with transaction.atomic():
+            for modelo, maximo in marcas.items():
+                borrados, _ = modelo.objects.filter(pk__gt=maximo).delete()
+                if borrados:
+                    self.stdout.write(f"Limpieza: {borrados} filas de {modelo._meta.label} (y sus dependientes)")
+
+    def _usuarios(self, prefijo):
+        usuarios = {}
+        for rol in (CustomUser.DOCTOR, CustomUser.ENFERMERO, CustomUser.SUPERVISOR, CustomUser.ADMIN):
+            # El doctor es el líder de un equipo activo (el caso caro de Mis Registros).
+            filtro = {'equipos_liderados__activo': True} if rol == CustomUser.DOCTOR else {}
+            usuario = CustomUser.objects.filter(username__startswith=f"{prefijo}_{rol}_", rol=rol, **filtro).order_by('id').first()
+            if usuario is None:
+                raise CommandError(
+                    f"No hay usuario '{prefijo}_{rol}_*'. Ejecute generar_datos_sinteticos o use --sembrar PARTOS."
+                )
+            usuarios[rol] = usuario
+        return usuarios
+
+    def _casos(self, usuarios, dispositivo):
+        hoy = timezone.localdate()
+        mes = f"fecha_inicio={hoy - timedelta(days=30)}&fecha_fin={hoy}"
+        anio = f"fecha_inicio={hoy - timedelta(days=365)}&fecha_fin={hoy}"
+        parto = RegistroParto.objects.filter(recien_nacidos__isnull=False).order_by('-fecha_parto').first()
+        doctor, enfermero = usuarios[CustomUser.DOCTOR], usuarios[CustomUser.ENFERMERO]
+        supervisor, admin = usuarios[CustomUser.SUPERVISOR], usuarios[CustomUser.ADMIN]
+
+        def verificar_2fa():
+            # Cada llamada necesita un código no usado: se olvida el último aceptado (fuera de la medición).
+            TOTPDevice.objects.filter(pk=dispositivo.pk).update(last_t=-1, throttling_failure_count=0)
+            codigo = totp(dispositivo.bin_key, step=dispositivo.step, t0=dispositivo.t0, digits=dispositivo.digits)
+            return {'username': doctor.username, 'otp_token': f"{codigo:0{dispositivo.digits}d}"}
+
+        casos = {
+            'login': ('post', '/cuentas/api/auth/login/', None, lambda: {'username': doctor.username, 'password': CLAVE_SINTETICA}),
+            'verificar_2fa': ('post', '/cuentas/api/auth/verify/', None, verificar_2fa),
+            'mis_registros_enfermero': ('get', '/dashboard/api/mis-registros/', enfermero, None),
+            'mis_registros_doctor': ('get', '/dashboard/api/mis-registros/', doctor, None),
+            'registros_parto': ('get', '/dashboard/api/registros-parto/', supervisor, None),
+            'registros_parto_pagina_100': ('get', '/dashboard/api/registros-parto/?page=100', supervisor, None),
+            'registros_parto_cursor': ('get', '/dashboard/api/registros-parto/?paginacion=cursor', supervisor, None),
+            'registro_parto_detalle': ('get', f'/dashboard/api/registros-parto/{parto.pk}/', supervisor, None),
+            'busqueda': ('get', '/dashboard/api/busqueda/?q=gonzalez', doctor, None),
+            'rem_mensual': ('get', f'/dashboard/api/reportes/rem/?{mes}', supervisor, None),
+            'rem_anual': ('get', f'/dashboard/api/reportes/rem/?{anio}', supervisor, None),
+            'rem_pdf': ('get', f'/dashboard/api/reportes/rem/pdf/?{mes}', supervisor, None),
+            'export_csv_mensual': ('get', f'/dashboard/api/export/registros/?formato=csv&{mes}', supervisor, None),
+            'export_excel_mensual': ('get', f'/dashboard/api/export/excel/?{mes}', supervisor, None),
+            'comprobante_pdf': ('get', f'/dashboard/api/comprobante/{parto.pk}/pdf/', supervisor, None),
+            'supervisor_dashboard_stats': ('get', '/dashboard/api/supervisor_dashboard_stats/', supervisor, None),
+            'admin_dashboard_stats': ('get', '/cuentas/api/dashboard/stats/', admin, None),
+        }
+        host = settings.ALLOWED_HOSTS[0].lstrip('.').replace('*', 'localhost')
+        clientes = {}
+        for usuario in {caso[2] for caso in casos.values()}:
+            cliente = APIClient(HTTP_HOST=host)
+            if usuario is not None:
+                cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_para(usuario).access_token}")
+            clientes[usuario] = cliente
+        return {
+            nombre: (getattr(clientes[usuario], metodo), url, datos)
+            for nombre, (metodo, url, usuario, datos) in casos.items()
+        }
+
+    def _pedir(self, caso):
+        metodo, url, datos = caso
+        respuesta = metodo(url, datos(), format='json') if datos else metodo(url)
+        # Las respuestas en streaming (exportes, archivos) se consumen enteras, como lo haría el cliente.
+        cuerpo = b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+        return respuesta.status_code, len(cuerpo)
+
+    def _medir(self, caso, repeticiones):
+        t0 = time.perf_counter()
+        self._pedir(caso)
+        primera = (time.perf_counter() - t0) * 1000
+
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            self._pedir(caso)
+            tiempos.append((time.perf_counter() - t0) * 1000)
+
+        # Consultas y memoria en una pasada aparte: tracemalloc y el registro de SQL alteran los tiempos.
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as consultas:
+                status, tamano = self._pedir(caso)
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        cuantiles = statistics.quantiles(tiempos, n=100, method='inclusive') if len(tiempos) > 1 else tiempos * 99
+        return {
+            'p50_ms': round(statistics.median(tiempos), 3),
+            'p95_ms': round(cuantiles[94], 3),
+            'p99_ms': round(cuantiles[98], 3),
+            'media_ms': round(statistics.fmean(tiempos), 3),
+            'primera_ms': round(primera, 3),
+            'consultas': len(consultas),
+            'memoria_pico_kb': round(pico / 1024, 1),
+            'bytes': tamano,
+            'status': status,
+            'repeticiones': len(tiempos),
+        }
+
+    def _metadatos(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=10,
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'fecha': timezone.now().isoformat(),
+            'commit': commit,
+            'motor': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'partos': RegistroParto.objects.count(),
+            'casos': {},
+        }
+
+    def _comparar(self, actual, ruta, tolerancia):
+        with open(ruta, encoding='utf-8') as archivo:
+            anterior = json.load(archivo)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"== Comparación con {anterior.get('commit') or ruta} ({anterior.get('partos')} partos) =="
+        ))
+        regresiones = []
+        for nombre, medicion in actual['casos'].items():
+            previa = anterior.get('casos', {}).get(nombre)
+            if previa is None:
+                self.stdout.write(f"{nombre:28} (sin medición anterior)")
+                continue
+            cambio = medicion['p95_ms'] / max(previa['p95_ms'], 1e-6) - 1
+            mas_consultas = medicion['consultas'] > previa['consultas']
+            linea = (
+                f"{nombre:28} p95 {previa['p95_ms']:8.2f} -> {medicion['p95_ms']:8.2f} ms ({cambio:+.0%}) | "
+                f"consultas {previa['consultas']} -> {medicion['consultas']}"
+            )
+            if cambio > tolerancia or mas_consultas:
+                regresiones.append(nombre)
+                self.stdout.write(self.style.ERROR(linea + '  REGRESIÓN'))
+            else:
+                self.stdout.write(linea)
+        return regresiones
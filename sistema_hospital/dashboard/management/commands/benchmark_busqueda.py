@@ -0,0 +1,78 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from dashboard.busqueda import buscar_madres, buscar_partos, optimizar
+from dashboard.models import Madre, RegistroParto
+from dashboard.sinteticos import generar_partos, digito_verificador
+
+
+COMPLICACIONES = [
+    'Hemorragia postparto leve', 'Desgarro perineal grado II', 'Preeclampsia severa',
+    'Distocia de hombros', 'Retención placentaria', 'Sufrimiento fetal agudo', 'Corioamnionitis',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Siembra madres y partos sintéticos y mide la búsqueda (dashboard.busqueda) por nombre, RUT '
+        'y texto de complicaciones. Siempre revierte los datos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--madres', type=int, default=500_000)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--repeticiones', type=int, default=30)
+
+    def handle(self, *args, **opts):
+        rut_inicial = 30_000_000
+        with transaction.atomic():
+            self._sembrar(opts['madres'], opts['semilla'], rut_inicial)
+            cuerpo = rut_inicial + opts['madres'] // 2
+            consultas = {
+                'nombre_completo': lambda: buscar_madres('María González Soto'),
+                'nombre_sin_tildes': lambda: buscar_madres('josefa sepulveda munoz'),
+                'apellido_prefijo': lambda: buscar_madres('contre'),
+                'rut_con_puntos': lambda: buscar_madres(f"{cuerpo:,}".replace(',', '.') + f"-{digito_verificador(cuerpo)}"),
+                'rut_prefijo': lambda: buscar_madres(str(cuerpo)[:5]),
+                'complicaciones': lambda: buscar_partos('hemorragia postparto'),
+                'personal_atiende': lambda: buscar_partos('matrona diaz'),
+            }
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== Búsqueda ({connection.vendor}, {opts['madres']} madres) =="))
+            for nombre, consulta in consultas.items():
+                resultados = consulta()
+                tiempos = []
+                for _ in range(opts['repeticiones']):
+                    t0 = time.perf_counter()
+                    consulta()
+                    tiempos.append((time.perf_counter() - t0) * 1000)
+                tiempos.sort()
+                p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+                primero = resultados[0] if resultados else None
+                muestra = f"{primero} ({primero.puntaje})" if isinstance(primero, Madre) else (
+                    f"parto {primero.pk}: {primero.complicaciones_texto or primero.personal_atiende}" if primero else '-')
+                self.stdout.write(
+                    f"{nombre:18} mediana {statistics.median(tiempos):7.2f} ms | p95 {p95:7.2f} ms | "
+                    f"{len(resultados):3} resultados | 1º {muestra}"
+                )
+            transaction.set_rollback(True)
+
+    def _sembrar(self, madres, semilla, rut_inicial):
+        rnd = random.Random(semilla)
+        inicio = time.perf_counter()
+        generar_partos(madres, semilla=semilla, rut_inicial=rut_inicial)
+        # ~10% de los partos con complicaciones registradas.
+        ids = list(RegistroParto.objects.values_list('id', flat=True))
+        por_texto = {}
+        for pk in ids:
+            if rnd.random() < 0.1:
+                por_texto.setdefault(rnd.choice(COMPLICACIONES), []).append(pk)
+        for texto, grupo in por_texto.items():
+            for i in range(0, len(grupo), 5000):
+                RegistroParto.objects.filter(pk__in=grupo[i:i + 5000]).update(complicaciones_texto=texto)
+        # Estado estable: los índices recién cargados quedan en muchos segmentos (ver optimizar_busqueda).
+        optimizar()
+        self.stdout.write(f"Datos sembrados en {time.perf_counter() - inicio:.1f}s")
@@ -0,0 +1,58 @@
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from cuentas.models import CustomUser
+from dashboard.api_views import ExportRegistrosExcelView, ExportRegistrosView
+from dashboard.sinteticos import generar_partos
+
+
+class Command(BaseCommand):
+    help = 'Compara tiempo, primer byte, tamaño y memoria máxima de las exportaciones xlsx, csv y parquet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partos', type=int, default=20_000)
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            generar_partos(opts['partos'], semilla=opts['semilla'])
+            supervisor = CustomUser.objects.create(username='benchmark_exportes', rol=CustomUser.SUPERVISOR)
+            hoy = timezone.localdate()
+            params = {'fecha_inicio': str(hoy - timedelta(days=366)), 'fecha_fin': str(hoy)}
+
+            casos = {
+                'xlsx': (ExportRegistrosExcelView, '/dashboard/api/export/excel/', {}),
+                'csv': (ExportRegistrosView, '/dashboard/api/export/registros/', {'formato': 'csv'}),
+                'parquet': (ExportRegistrosView, '/dashboard/api/export/registros/', {'formato': 'parquet'}),
+            }
+            for nombre, (vista, url, extra) in casos.items():
+                total, primer_byte, tamano = self._medir(vista, url, {**params, **extra}, supervisor)
+                tracemalloc.start()
+                self._medir(vista, url, {**params, **extra}, supervisor)
+                pico = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                self.stdout.write(
+                    f"{nombre:8} total {total:6.2f}s | primer byte {primer_byte * 1000:8.1f} ms | "
+                    f"{tamano / 1e6:7.2f} MB | {opts['partos'] / total:9.0f} partos/s | memoria máx {pico / 1e6:7.1f} MB"
+                )
+            transaction.set_rollback(True)
+
+    def _medir(self, vista, url, params, usuario):
+        request = APIRequestFactory().get(url, params)
+        force_authenticate(request, user=usuario)
+        inicio = time.perf_counter()
+        respuesta = vista.as_view()(request)
+        contenido = respuesta.streaming_content if respuesta.streaming else [respuesta.content]
+        primer_byte = None
+        tamano = 0
+        for parte in contenido:
+            if primer_byte is None:
+                primer_byte = time.perf_counter() - inicio
+            tamano += len(parte)
+        return time.perf_counter() - inicio, primer_byte or 0, tamano
@@ -0,0 +1,96 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from cuentas.models import CustomUser
+from dashboard.models import Madre, RegistroParto, RecienNacido, SolicitudCorreccion
+from dashboard.sinteticos import generar_partos, marcar_altas_y_defunciones, generar_solicitudes
+
+
+class Command(BaseCommand):
+    help = (
+        'Siembra datos sintéticos y muestra EXPLAIN y tiempos de las consultas de los ViewSets '
+        'con los índices de dashboard y sin ellos. Siempre revierte los datos y los índices.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partos', type=int, default=100_000)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--repeticiones', type=int, default=20)
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            usuario = self._sembrar(opts['partos'], opts['semilla'])
+            consultas = {
+                'historial_altas': lambda: RecienNacido.objects.filter(fecha_alta__isnull=False).order_by('-fecha_alta', '-id')[:15],
+                'altas_validadas': lambda: RecienNacido.objects.filter(alta_validada=True).order_by('-fecha_alta')[:15],
+                'rn_fallecidos': lambda: RecienNacido.objects.filter(fallecido=True).order_by('-fecha_fallecimiento'),
+                'historial_altas_madres': lambda: Madre.objects.filter(fecha_alta__isnull=False).order_by('-fecha_alta', '-id')[:15],
+                'madres_fallecidas': lambda: Madre.objects.filter(fallecida=True).order_by('-fecha_fallecimiento'),
+                'solicitudes_pendientes': lambda: SolicitudCorreccion.objects.filter(estado='pendiente').order_by('-timestamp_creacion')[:5],
+                'mis_registros': lambda: RegistroParto.objects.filter(registrado_por=usuario).order_by('-fecha_parto')[:15],
+            }
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== Con índices ({connection.vendor}) =="))
+            con = self._medir(consultas, opts['repeticiones'], 'con')
+
+            # DROP INDEX directo: el schema editor de SQLite no puede usarse dentro de atomic().
+            # Ambos motores lo revierten junto con los datos al final.
+            with connection.cursor() as cursor:
+                for modelo in (Madre, RegistroParto, RecienNacido, SolicitudCorreccion):
+                    for indice in modelo._meta.indexes:
+                        cursor.execute(f"DROP INDEX {connection.ops.quote_name(indice.name)}")
+
+            self.stdout.write(self.style.MIGRATE_HEADING("== Sin índices =="))
+            sin = self._medir(consultas, opts['repeticiones'], 'sin')
+
+            self.stdout.write(self.style.MIGRATE_HEADING("== Resumen (mediana) =="))
+            for nombre in consultas:
+                self.stdout.write(f"{nombre:24} sin {sin[nombre]:8.2f} ms | con {con[nombre]:8.2f} ms | x{sin[nombre] / max(con[nombre], 1e-6):6.1f}")
+            transaction.set_rollback(True)
+
+    def _sembrar(self, partos, semilla):
+        inicio = time.perf_counter()
+        usuarios = [CustomUser.objects.create(username=f'benchmark_indices_{i}', rol=CustomUser.ENFERMERO) for i in range(20)]
+        generar_partos(partos, semilla=semilla, usuarios=usuarios)
+        self._analizar()
+        marcar_altas_y_defunciones(semilla)
+        generar_solicitudes(usuarios, semilla=semilla)
+        self._analizar()
+        self.stdout.write(f"Datos sembrados en {time.perf_counter() - inicio:.1f}s")
+        return usuarios[0]
+
+    def _analizar(self):
+        # PostgreSQL: sin estadísticas de las filas recién sembradas (aún sin confirmar, fuera del
+        # alcance de autovacuum) el planner las supone pocas y elige a ciegas.
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            for modelo in (Madre, RegistroParto, RecienNacido, SolicitudCorreccion):
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(modelo._meta.db_table)}")
+
+    def _explicar(self, qs, pasada):
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            # El comentario cambia el texto de la sentencia: sqlite3 reutiliza los EXPLAIN
+            # cacheados por texto y mostraría el plan anterior al DROP INDEX.
+            # En PostgreSQL, EXPLAIN ANALYZE: el plan con filas y tiempos reales. SQLite solo da el plan.
+            opciones = {'analyze': True} if connection.vendor == 'postgresql' else {}
+            cursor.execute(f"{connection.ops.explain_query_prefix(**opciones)} {sql} /* {pasada} */", params)
+            return '\n'.join(' '.join(str(c) for c in fila) for fila in cursor.fetchall())
+
+    def _medir(self, consultas, repeticiones, pasada):
+        medianas = {}
+        for nombre, construir in consultas.items():
+            self.stdout.write(self.style.SQL_KEYWORD(nombre))
+            self.stdout.write('    ' + self._explicar(construir(), pasada).replace('\n', '\n    '))
+            tiempos = []
+            for _ in range(repeticiones):
+                t0 = time.perf_counter()
+                list(construir())
+                tiempos.append((time.perf_counter() - t0) * 1000)
+            medianas[nombre] = statistics.median(tiempos)
+            self.stdout.write(f"    mediana {medianas[nombre]:.2f} ms, min {min(tiempos):.2f} ms")
+        return medianas
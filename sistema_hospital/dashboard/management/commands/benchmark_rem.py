@@ -0,0 +1,55 @@
+import itertools
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from dashboard.rem import calcular_datos_rem, calcular_datos_rem_directo, recalcular_resumen
+from dashboard.sinteticos import generar_partos, periodo_completo
+
+
+class Command(BaseCommand):
+    help = 'Mide calcular_datos_rem (REM A.24) sobre partos sintéticos. Por defecto revierte los datos al terminar.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partos', type=int, default=100_000)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--conservar', action='store_true', help='No revertir los datos sintéticos.')
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            hoy = timezone.localdate()
+            inicio = time.perf_counter()
+            madres, partos, rn = generar_partos(opts['partos'], semilla=opts['semilla'])
+            self.stdout.write(f"Sembrados {madres} madres, {partos} partos y {rn} RN en {time.perf_counter() - inicio:.1f}s")
+
+            t0 = time.perf_counter()
+            dias = recalcular_resumen(hoy - timedelta(days=366), hoy)
+            self.stdout.write(f"ResumenDiarioREM: {dias} días materializados en {time.perf_counter() - t0:.1f}s")
+
+            rangos = {
+                'anual': periodo_completo(hoy - timedelta(days=365), hoy),
+                'mensual': periodo_completo(hoy - timedelta(days=30), hoy),
+            }
+            caminos = {'directo': calcular_datos_rem_directo, 'resumen': calcular_datos_rem}
+            for (nombre, (fi, ff)), (camino, funcion) in itertools.product(rangos.items(), caminos.items()):
+                tiempos = []
+                for _ in range(opts['repeticiones']):
+                    with CaptureQueriesContext(connection) as ctx:
+                        t0 = time.perf_counter()
+                        datos = funcion(fi, ff)
+                        tiempos.append((time.perf_counter() - t0) * 1000)
+                self.stdout.write(
+                    f"REM {nombre} ({camino}): mediana {statistics.median(tiempos):.1f} ms, "
+                    f"min {min(tiempos):.1f} ms, consultas {len(ctx.captured_queries)}, "
+                    f"partos {datos['a']['total_partos']}, rn {datos['d1']['total_rn']}"
+                )
+
+            if not opts['conservar']:
+                transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Benchmark REM terminado.'))
@@ -0,0 +1,88 @@
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from cuentas.models import CustomUser
+from dashboard.busqueda import optimizar
+from dashboard.models import Madre, RegistroParto, RecienNacido
+from dashboard.sinteticos import (
+    CLAVE_SINTETICA, generar_personal, generar_equipos, generar_partos,
+    marcar_altas_y_defunciones, generar_solicitudes, generar_auditoria,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Carga datos sintéticos realistas (personal, equipos, madres, partos, RN, altas, defunciones, '
+        'solicitudes de corrección y auditoría) con bulk_create, para pruebas de rendimiento. '
+        'Los datos quedan en la base: úsese en una base de pruebas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partos', type=int, default=100_000, help='Escala: partos (y madres) a generar.')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--dias', type=int, default=730, help='Antigüedad máxima de los partos y la auditoría.')
+        parser.add_argument('--doctores', type=int, default=20)
+        parser.add_argument('--enfermeros', type=int, default=80)
+        parser.add_argument('--supervisores', type=int, default=3)
+        parser.add_argument('--admins', type=int, default=1)
+        parser.add_argument('--acciones-por-parto', type=float, default=2.0, help='Filas de HistorialAccion por parto.')
+        parser.add_argument('--sesiones-por-parto', type=float, default=0.5, help='Filas de HistorialSesion por parto.')
+        parser.add_argument('--prefijo', default='sintetico', help='Prefijo de los usernames generados.')
+        parser.add_argument('--rut-inicial', type=int, default=30_000_000, help='Primer RUT de las madres.')
+
+    def handle(self, *args, **opts):
+        if CustomUser.objects.filter(username__startswith=f"{opts['prefijo']}_").exists():
+            raise CommandError(f"Ya hay usuarios con el prefijo '{opts['prefijo']}': use otro --prefijo.")
+        if Madre.objects.filter(rut_cuerpo__gte=opts['rut_inicial'], rut_cuerpo__lt=opts['rut_inicial'] + opts['partos']).exists():
+            raise CommandError("El rango de RUT de madres ya está ocupado: use otro --rut-inicial.")
+
+        inicio = time.perf_counter()
+        semilla = opts['semilla']
+
+        def paso(nombre, funcion, resumen=str):
+            t0 = time.perf_counter()
+            resultado = funcion()
+            self.stdout.write(f"  {nombre:32} {time.perf_counter() - t0:7.1f}s  {resumen(resultado)}")
+            return resultado
+
+        with transaction.atomic():
+            personal = paso('personal', lambda: generar_personal(
+                opts['doctores'], opts['enfermeros'], opts['supervisores'], opts['admins'], prefijo=opts['prefijo'],
+            ), resumen=lambda p: {rol: len(usuarios) for rol, usuarios in p.items()})
+            doctores = personal.get(CustomUser.DOCTOR, [])
+            enfermeros = personal.get(CustomUser.ENFERMERO, [])
+            todos = [u for grupo in personal.values() for u in grupo]
+            clinicos = doctores + enfermeros or todos
+            paso('equipos', lambda: generar_equipos(doctores, enfermeros, semilla=semilla))
+
+            hasta = timezone.now()
+            paso('madres / partos / RN', lambda: generar_partos(
+                opts['partos'], semilla=semilla, desde=hasta - timedelta(days=opts['dias']), hasta=hasta,
+                rut_inicial=opts['rut_inicial'], usuarios=clinicos,
+            ))
+            paso('altas y defunciones', lambda: marcar_altas_y_defunciones(semilla), resumen=lambda _: '')
+            paso('solicitudes de corrección', lambda: generar_solicitudes(clinicos, semilla=semilla))
+            paso('auditoría (acciones, sesiones)', lambda: generar_auditoria(
+                todos, int(opts['partos'] * opts['acciones_por_parto']), int(opts['partos'] * opts['sesiones_por_parto']),
+                semilla=semilla, dias=opts['dias'],
+            ))
+        paso('reconstruir resumen REM', self._resumen_rem)
+        paso('optimizar búsqueda', optimizar, resumen=lambda _: '')
+
+        total = time.perf_counter() - inicio
+        filas = RegistroParto.objects.count() + RecienNacido.objects.count() + Madre.objects.count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo en {total:.1f}s. Usuarios '{opts['prefijo']}_<rol>_<n>' con contraseña '{CLAVE_SINTETICA}'. "
+            f"La base tiene {filas:,} filas clínicas (madres + partos + RN)."
+        ))
+
+    def _resumen_rem(self):
+        salida = StringIO()
+        call_command('reconstruir_resumen_rem', tramo=366, stdout=salida)
+        return salida.getvalue().strip()
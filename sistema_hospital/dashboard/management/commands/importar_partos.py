@@ -0,0 +1,56 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cuentas.models import CustomUser
+from dashboard.importacion import importar, TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa partos históricos (con sus madres y recién nacidos) desde CSV o JSONL, por lotes. '
+        'Ver el formato en dashboard/importacion.py.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Por defecto, según la extensión del archivo.')
+        parser.add_argument('--usuario', help='Username que queda como registrado_por y en la auditoría.')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE)
+        parser.add_argument('--errores', help='Escribe los errores de fila en este archivo JSONL.')
+
+    def handle(self, *args, **opts):
+        formato = opts['formato'] or os.path.splitext(opts['archivo'])[1].lstrip('.').lower()
+        if formato not in ('csv', 'jsonl'):
+            raise CommandError('No se reconoce el formato: use --formato csv o --formato jsonl')
+        usuario = None
+        if opts['usuario']:
+            usuario = CustomUser.objects.filter(username=opts['usuario']).first()
+            if usuario is None:
+                raise CommandError(f"No existe el usuario {opts['usuario']}")
+
+        def avance(r):
+            self.stdout.write(f"  {r.filas} filas, {r.partos} partos, {r.filas_con_error} con error", ending='\r')
+
+        with open(opts['archivo'], 'rb') as archivo:
+            resultado = importar(
+                archivo, formato, usuario=usuario, tamano_lote=opts['lote'],
+                origen=os.path.basename(opts['archivo']), al_avanzar=avance,
+            )
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.filas} filas en {resultado.segundos:.1f}s ({resultado.filas_por_segundo:,.0f} filas/s): "
+            f"{resultado.partos} partos, {resultado.recien_nacidos} RN, {resultado.madres_nuevas} madres nuevas, "
+            f"{resultado.madres_existentes} filas de madres ya registradas."
+        ))
+        if resultado.filas_con_error:
+            self.stdout.write(self.style.WARNING(f"{resultado.filas_con_error} filas con error (no importadas)."))
+            if opts['errores']:
+                with open(opts['errores'], 'w', encoding='utf-8') as salida:
+                    for error in resultado.errores:
+                        salida.write(json.dumps(error, ensure_ascii=False) + '\n')
+            else:
+                for error in resultado.errores[:20]:
+                    self.stdout.write(f"  línea {error['linea']}: {json.dumps(error['errores'], ensure_ascii=False)}")
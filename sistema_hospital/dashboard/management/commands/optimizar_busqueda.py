@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.busqueda import instalar, optimizar
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea los índices de búsqueda que falten y los compacta (SQLite: optimize de FTS5; '
+        'PostgreSQL: ANALYZE). Conviene correrlo tras cargas masivas y periódicamente.'
+    )
+
+    def handle(self, *args, **opts):
+        instalar()
+        optimizar()
+        self.stdout.write(self.style.SUCCESS('Índices de búsqueda al día.'))
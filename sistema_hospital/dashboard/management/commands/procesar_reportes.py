@@ -0,0 +1,56 @@
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from dashboard.models import TrabajoReporte
+from dashboard.trabajos import ejecutar_trabajo, latir, liberar_colgados, reclamar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Worker de reportes: genera en segundo plano los TrabajoReporte pendientes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Reportes simultáneos (por defecto settings.REPORTES_MAX_CONCURRENTES).')
+        parser.add_argument('--modo', choices=['hilos', 'procesos'], default='hilos')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos entre consultas a la cola.')
+        parser.add_argument('--timeout-minutos', type=int, default=30,
+                            help='Trabajos en proceso sin latido hace más de esto se vuelven a encolar.')
+        parser.add_argument('--una-vez', action='store_true', help='Procesar la cola actual y terminar.')
+
+    def handle(self, *args, **opts):
+        workers = opts['workers'] or settings.REPORTES_MAX_CONCURRENTES
+        if opts['modo'] == 'procesos':
+            # spawn: cada proceso abre su propia conexión en vez de heredar la del padre.
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers)
+        self.stdout.write(f"Procesando reportes con {workers} {opts['modo']}...")
+
+        en_curso = {}  # futuro -> intento
+        with pool:
+            try:
+                while True:
+                    en_curso = {f: intento for f, intento in en_curso.items() if not f.done()}
+                    # Mientras este worker viva, sus trabajos no cuentan como colgados.
+                    latir(en_curso.values())
+                    liberados = liberar_colgados(opts['timeout_minutos'])
+                    if liberados:
+                        self.stdout.write(self.style.WARNING(f"{liberados} trabajos colgados devueltos a la cola"))
+
+                    for pk, intento in reclamar_pendientes(workers - len(en_curso)):
+                        futuro = pool.submit(ejecutar_trabajo, pk, intento)
+                        futuro.add_done_callback(lambda f, pk=pk: self.stdout.write(f"Trabajo {pk}: {f.exception() or f.result()}"))
+                        en_curso[futuro] = intento
+
+                    if opts['una_vez'] and not en_curso and not TrabajoReporte.objects.filter(estado='pendiente').exists():
+                        break
+                    connection.close()
+                    time.sleep(opts['intervalo'])
+            except KeyboardInterrupt:
+                self.stdout.write("Deteniendo worker; esperando los reportes en curso...")
@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from dashboard.models import Madre, RegistroParto, RecienNacido
+from dashboard.rem import recalcular_resumen
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye ResumenDiarioREM para un rango de fechas (por defecto, desde el primer registro hasta hoy).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='YYYY-MM-DD')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='YYYY-MM-DD')
+        parser.add_argument('--tramo', type=int, default=31, help='Días recalculados por consulta.')
+
+    def handle(self, *args, **opts):
+        hasta = opts['hasta'] or timezone.localdate()
+        desde = opts['desde'] or self._primer_dia() or hasta
+        if desde > hasta:
+            raise CommandError('--desde debe ser anterior o igual a --hasta')
+
+        total = 0
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(inicio + timedelta(days=opts['tramo'] - 1), hasta)
+            total += recalcular_resumen(inicio, fin)
+            inicio = fin + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f'Resumen REM reconstruido: {total} días ({desde} a {hasta}).'))
+
+    def _primer_dia(self):
+        fechas = [
+            RegistroParto.objects.aggregate(m=Min('fecha_parto'))['m'],
+            Madre.objects.aggregate(m=Min('fecha_fallecimiento'))['m'],
+            RecienNacido.objects.aggregate(m=Min('fecha_fallecimiento'))['m'],
+        ]
+        fechas = [timezone.localdate(f) for f in fechas if f]
+        return min(fechas) if fechas else None
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_madre_pertenece_pueblo_originario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioREM',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True, verbose_name='Día')),
+                ('total_partos', models.PositiveIntegerField(default=0)),
+                ('vaginal_espontaneo', models.PositiveIntegerField(default=0)),
+                ('vaginal_instrumental', models.PositiveIntegerField(default=0)),
+                ('cesarea_electiva', models.PositiveIntegerField(default=0)),
+                ('cesarea_urgencia', models.PositiveIntegerField(default=0)),
+                ('con_oxitocina', models.PositiveIntegerField(default=0)),
+                ('con_ligadura_tardia', models.PositiveIntegerField(default=0)),
+                ('con_piel_a_piel', models.PositiveIntegerField(default=0)),
+                ('pretermino', models.PositiveIntegerField(default=0)),
+                ('termino', models.PositiveIntegerField(default=0)),
+                ('posttermino', models.PositiveIntegerField(default=0)),
+                ('total_rn', models.PositiveIntegerField(default=0)),
+                ('peso_menor_1500', models.PositiveIntegerField(default=0)),
+                ('peso_1500_2499', models.PositiveIntegerField(default=0)),
+                ('peso_2500_3999', models.PositiveIntegerField(default=0)),
+                ('peso_mayor_4000', models.PositiveIntegerField(default=0)),
+                ('p_lt_500', models.PositiveIntegerField(default=0)),
+                ('p_500_999', models.PositiveIntegerField(default=0)),
+                ('p_1000_1499', models.PositiveIntegerField(default=0)),
+                ('p_1500_1999', models.PositiveIntegerField(default=0)),
+                ('p_2000_2499', models.PositiveIntegerField(default=0)),
+                ('p_2500_2999', models.PositiveIntegerField(default=0)),
+                ('p_3000_3999', models.PositiveIntegerField(default=0)),
+                ('p_gte_4000', models.PositiveIntegerField(default=0)),
+                ('con_anomalia', models.PositiveIntegerField(default=0)),
+                ('sexo_m', models.PositiveIntegerField(default=0)),
+                ('sexo_f', models.PositiveIntegerField(default=0)),
+                ('sexo_i', models.PositiveIntegerField(default=0)),
+                ('profilaxis_ocular', models.PositiveIntegerField(default=0)),
+                ('profilaxis_hepb', models.PositiveIntegerField(default=0)),
+                ('rn_vaginal', models.PositiveIntegerField(default=0)),
+                ('rn_instrumental', models.PositiveIntegerField(default=0)),
+                ('rn_cesarea', models.PositiveIntegerField(default=0)),
+                ('apgar_1_critico', models.PositiveIntegerField(default=0)),
+                ('apgar_5_critico', models.PositiveIntegerField(default=0)),
+                ('reanimacion_basica', models.PositiveIntegerField(default=0)),
+                ('reanimacion_avanzada', models.PositiveIntegerField(default=0)),
+                ('lme_total', models.PositiveIntegerField(default=0)),
+                ('mixta_total', models.PositiveIntegerField(default=0)),
+                ('formula_total', models.PositiveIntegerField(default=0)),
+                ('lme_migrante', models.PositiveIntegerField(default=0)),
+                ('mixta_migrante', models.PositiveIntegerField(default=0)),
+                ('formula_migrante', models.PositiveIntegerField(default=0)),
+                ('lme_pueblo', models.PositiveIntegerField(default=0)),
+                ('mixta_pueblo', models.PositiveIntegerField(default=0)),
+                ('formula_pueblo', models.PositiveIntegerField(default=0)),
+                ('mort_materna', models.PositiveIntegerField(default=0)),
+                ('mort_neonatal', models.PositiveIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario REM',
+                'verbose_name_plural': 'Resúmenes Diarios REM',
+                'ordering': ['fecha'],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_resumendiariorem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('rem_pdf', 'Informe REM A.24 (PDF)'), ('registros_excel', 'Registros de Partos (Excel)'), ('comprobante_pdf', 'Comprobante de Parto (PDF)'), ('certificado_defuncion_pdf', 'Certificado de Defunción (PDF)')], max_length=30)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En Proceso'), ('completado', 'Completado'), ('error', 'Error')], db_index=True, default='pendiente', max_length=12)),
+                ('archivo', models.CharField(blank=True, max_length=255, verbose_name='Archivo generado (relativo a REPORTES_DIR)')),
+                ('nombre_archivo', models.CharField(blank=True, max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('timestamp_creacion', models.DateTimeField(auto_now_add=True)),
+                ('timestamp_inicio', models.DateTimeField(blank=True, null=True)),
+                ('timestamp_fin', models.DateTimeField(blank=True, null=True)),
+                ('solicitado_por', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_reporte', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Reporte',
+                'verbose_name_plural': 'Trabajos de Reporte',
+                'ordering': ['-timestamp_creacion'],
+            },
+        ),
+    ]
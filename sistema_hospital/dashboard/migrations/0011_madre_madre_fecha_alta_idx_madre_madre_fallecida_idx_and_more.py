@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_trabajoreporte'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='madre',
+            index=models.Index(condition=models.Q(('fecha_alta__isnull', False)), fields=['-fecha_alta', '-id'], name='madre_fecha_alta_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='madre',
+            index=models.Index(condition=models.Q(('fallecida', True)), fields=['-fecha_fallecimiento'], name='madre_fallecida_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reciennacido',
+            index=models.Index(condition=models.Q(('fecha_alta__isnull', False)), fields=['-fecha_alta', '-id'], name='rn_fecha_alta_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reciennacido',
+            index=models.Index(condition=models.Q(('alta_validada', True)), fields=['-fecha_alta'], name='rn_alta_validada_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reciennacido',
+            index=models.Index(condition=models.Q(('fallecido', True)), fields=['-fecha_fallecimiento'], name='rn_fallecido_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroparto',
+            index=models.Index(fields=['registrado_por', '-fecha_parto'], name='parto_registrado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitudcorreccion',
+            index=models.Index(condition=models.Q(('estado', 'pendiente')), fields=['-timestamp_creacion'], name='solicitud_pendiente_idx'),
+        ),
+    ]
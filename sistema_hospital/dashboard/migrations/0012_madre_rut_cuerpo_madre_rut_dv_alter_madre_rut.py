@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:33
+
+import cuentas.rut
+from cuentas.rut import partes_rut
+from django.db import migrations, models
+
+
+def completar_rut_madres(apps, schema_editor):
+    # Datos antiguos con RUT inválido o repetido en forma canónica quedan sin cuerpo (NULL).
+    Modelo = apps.get_model('dashboard', 'Madre')
+    vistos, completos = set(), []
+    # Se lee todo antes de escribir: SQLite no aísla un cursor abierto de los UPDATE sobre la misma tabla.
+    for pk, rut in Modelo.objects.exclude(rut__isnull=True).order_by('id').values_list('id', 'rut'):
+        cuerpo, dv = partes_rut(rut)
+        if cuerpo is None or cuerpo in vistos:
+            continue
+        vistos.add(cuerpo)
+        completos.append(Modelo(id=pk, rut_cuerpo=cuerpo, rut_dv=dv))
+    Modelo.objects.bulk_update(completos, ['rut_cuerpo', 'rut_dv'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_madre_madre_fecha_alta_idx_madre_madre_fallecida_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='madre',
+            name='rut_cuerpo',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='RUT (cuerpo)'),
+        ),
+        migrations.AddField(
+            model_name='madre',
+            name='rut_dv',
+            field=models.CharField(blank=True, editable=False, max_length=1, verbose_name='RUT (dígito verificador)'),
+        ),
+        migrations.AlterField(
+            model_name='madre',
+            name='rut',
+            field=models.CharField(db_index=True, max_length=12, unique=True, validators=[cuentas.rut.validar_rut], verbose_name='RUT'),
+        ),
+        migrations.RunPython(completar_rut_madres, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0012_madre_rut_cuerpo_madre_rut_dv_alter_madre_rut'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trabajoreporte',
+            name='tipo',
+            field=models.CharField(choices=[('rem_pdf', 'Informe REM A.24 (PDF)'), ('registros_excel', 'Registros de Partos (Excel)'), ('comprobante_pdf', 'Comprobante de Parto (PDF)'), ('certificado_defuncion_pdf', 'Certificado de Defunción (PDF)'), ('importacion_partos', 'Importación de Partos (CSV/JSONL)')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+def latido_desde_inicio(apps, schema_editor):
+    # Los trabajos ya en_proceso cuentan como si hubieran latido al empezar: liberar_colgados los alcanza.
+    TrabajoReporte = apps.get_model('dashboard', 'TrabajoReporte')
+    TrabajoReporte.objects.filter(estado='en_proceso').update(timestamp_latido=models.F('timestamp_inicio'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0014_registroparto_sin_indice_registrado_por'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoreporte',
+            name='intento',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='trabajoreporte',
+            name='timestamp_latido',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(latido_desde_inicio, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models import Q
 from django.conf import settings 
 from django.core.validators import MinValueValidator, MaxValueValidator
+from cuentas.models import RutCanonico
+from cuentas.rut import validar_rut
 
 class TipoParto(models.Model):
     nombre = models.CharField(max_length=100, unique=True, verbose_name="Nombre del Tipo de Parto")
@@ -17,8 +20,8 @@ class TipoAnalgesia(models.Model):
         return self.nombre
 
 
-class Madre(models.Model):
-    rut = models.CharField(max_length=12, unique=True, verbose_name="RUT", db_index=True)
+class Madre(RutCanonico):
+    rut = models.CharField(max_length=12, unique=True, verbose_name="RUT", db_index=True, validators=[validar_rut])
     nombre = models.CharField(max_length=255, verbose_name="Nombre Completo")
     fecha_nacimiento = models.DateField(verbose_name="Fecha de Nacimiento")
     direccion = models.CharField(max_length=255, blank=True, null=True, verbose_name="Dirección")
@@ -42,6 +45,11 @@ class Madre(models.Model):
     class Meta:
         verbose_name = "Madre"
         verbose_name_plural = "Madres"
+        indexes = [
+            # HistorialAltasMadresViewSet y DefuncionesViewSet
+            models.Index(fields=['-fecha_alta', '-id'], condition=Q(fecha_alta__isnull=False), name='madre_fecha_alta_idx'),
+            models.Index(fields=['-fecha_fallecimiento'], condition=Q(fallecida=True), name='madre_fallecida_idx'),
+        ]
 
 
 class RegistroParto(models.Model):
@@ -50,6 +58,8 @@ class RegistroParto(models.Model):
         settings.AUTH_USER_MODEL, 
         on_delete=models.SET_NULL, 
         null=True, blank=True,
+        # Sin índice propio: parto_registrado_fecha_idx empieza por esta columna y cubre el filtro y el SET_NULL.
+        db_index=False,
         verbose_name="Registrado por"
     )
     
@@ -83,6 +93,10 @@ class RegistroParto(models.Model):
         verbose_name = "Registro de Parto"
         verbose_name_plural = "Registros de Partos"
         ordering = ['-fecha_parto'] 
+        indexes = [
+            # MisRegistrosViewSet: registros propios o del equipo, más recientes primero
+            models.Index(fields=['registrado_por', '-fecha_parto'], name='parto_registrado_fecha_idx'),
+        ]
 
 
 class RecienNacido(models.Model):
@@ -159,6 +173,12 @@ class RecienNacido(models.Model):
     class Meta:
         verbose_name = "Recién Nacido"
         verbose_name_plural = "Recién Nacidos"
+        indexes = [
+            # HistorialAltasViewSet, RecienNacidosAltaValidadaViewSet y DefuncionesViewSet
+            models.Index(fields=['-fecha_alta', '-id'], condition=Q(fecha_alta__isnull=False), name='rn_fecha_alta_idx'),
+            models.Index(fields=['-fecha_alta'], condition=Q(alta_validada=True), name='rn_alta_validada_idx'),
+            models.Index(fields=['-fecha_fallecimiento'], condition=Q(fallecido=True), name='rn_fallecido_idx'),
+        ]
 
 
 class SolicitudCorreccion(models.Model):
@@ -182,4 +202,115 @@ class SolicitudCorreccion(models.Model):
     class Meta:
         verbose_name = "Solicitud de Corrección"
         verbose_name_plural = "Solicitudes de Corrección"
-        ordering = ['-timestamp_creacion']
\ No newline at end of file
+        ordering = ['-timestamp_creacion']
+        indexes = [
+            # Bandeja de pendientes del supervisor
+            models.Index(fields=['-timestamp_creacion'], condition=Q(estado='pendiente'), name='solicitud_pendiente_idx'),
+        ]
+
+class ResumenDiarioREM(models.Model):
+    # Contadores pre-agregados por día para el REM A.24 (ver dashboard/rem.py).
+    # Los partos y RN se asignan al día de fecha_parto; la mortalidad al día de fecha_fallecimiento.
+    fecha = models.DateField(unique=True, verbose_name="Día")
+
+    total_partos = models.PositiveIntegerField(default=0)
+    vaginal_espontaneo = models.PositiveIntegerField(default=0)
+    vaginal_instrumental = models.PositiveIntegerField(default=0)
+    cesarea_electiva = models.PositiveIntegerField(default=0)
+    cesarea_urgencia = models.PositiveIntegerField(default=0)
+    con_oxitocina = models.PositiveIntegerField(default=0)
+    con_ligadura_tardia = models.PositiveIntegerField(default=0)
+    con_piel_a_piel = models.PositiveIntegerField(default=0)
+    pretermino = models.PositiveIntegerField(default=0)
+    termino = models.PositiveIntegerField(default=0)
+    posttermino = models.PositiveIntegerField(default=0)
+
+    total_rn = models.PositiveIntegerField(default=0)
+    peso_menor_1500 = models.PositiveIntegerField(default=0)
+    peso_1500_2499 = models.PositiveIntegerField(default=0)
+    peso_2500_3999 = models.PositiveIntegerField(default=0)
+    peso_mayor_4000 = models.PositiveIntegerField(default=0)
+    p_lt_500 = models.PositiveIntegerField(default=0)
+    p_500_999 = models.PositiveIntegerField(default=0)
+    p_1000_1499 = models.PositiveIntegerField(default=0)
+    p_1500_1999 = models.PositiveIntegerField(default=0)
+    p_2000_2499 = models.PositiveIntegerField(default=0)
+    p_2500_2999 = models.PositiveIntegerField(default=0)
+    p_3000_3999 = models.PositiveIntegerField(default=0)
+    p_gte_4000 = models.PositiveIntegerField(default=0)
+    con_anomalia = models.PositiveIntegerField(default=0)
+    sexo_m = models.PositiveIntegerField(default=0)
+    sexo_f = models.PositiveIntegerField(default=0)
+    sexo_i = models.PositiveIntegerField(default=0)
+
+    profilaxis_ocular = models.PositiveIntegerField(default=0)
+    profilaxis_hepb = models.PositiveIntegerField(default=0)
+    rn_vaginal = models.PositiveIntegerField(default=0)
+    rn_instrumental = models.PositiveIntegerField(default=0)
+    rn_cesarea = models.PositiveIntegerField(default=0)
+    apgar_1_critico = models.PositiveIntegerField(default=0)
+    apgar_5_critico = models.PositiveIntegerField(default=0)
+    reanimacion_basica = models.PositiveIntegerField(default=0)
+    reanimacion_avanzada = models.PositiveIntegerField(default=0)
+
+    lme_total = models.PositiveIntegerField(default=0)
+    mixta_total = models.PositiveIntegerField(default=0)
+    formula_total = models.PositiveIntegerField(default=0)
+    lme_migrante = models.PositiveIntegerField(default=0)
+    mixta_migrante = models.PositiveIntegerField(default=0)
+    formula_migrante = models.PositiveIntegerField(default=0)
+    lme_pueblo = models.PositiveIntegerField(default=0)
+    mixta_pueblo = models.PositiveIntegerField(default=0)
+    formula_pueblo = models.PositiveIntegerField(default=0)
+
+    mort_materna = models.PositiveIntegerField(default=0)
+    mort_neonatal = models.PositiveIntegerField(default=0)
+
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Resumen REM {self.fecha}"
+
+    class Meta:
+        verbose_name = "Resumen Diario REM"
+        verbose_name_plural = "Resúmenes Diarios REM"
+        ordering = ['fecha']
+
+
+class TrabajoReporte(models.Model):
+    TIPO_CHOICES = (
+        ('rem_pdf', 'Informe REM A.24 (PDF)'),
+        ('registros_excel', 'Registros de Partos (Excel)'),
+        ('comprobante_pdf', 'Comprobante de Parto (PDF)'),
+        ('certificado_defuncion_pdf', 'Certificado de Defunción (PDF)'),
+        ('importacion_partos', 'Importación de Partos (CSV/JSONL)'),
+    )
+    ESTADO_CHOICES = (
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En Proceso'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    )
+
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES)
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default='pendiente', db_index=True)
+    solicitado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="trabajos_reporte")
+    archivo = models.CharField(max_length=255, blank=True, verbose_name="Archivo generado (relativo a REPORTES_DIR)")
+    nombre_archivo = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True, null=True)
+    timestamp_creacion = models.DateTimeField(auto_now_add=True)
+    timestamp_inicio = models.DateTimeField(null=True, blank=True)
+    timestamp_fin = models.DateTimeField(null=True, blank=True)
+    # Intento en curso (uno nuevo en cada reclamo) y último latido del worker que lo ejecuta.
+    intento = models.UUIDField(null=True, blank=True, editable=False)
+    timestamp_latido = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.id} ({self.estado})"
+
+    class Meta:
+        verbose_name = "Trabajo de Reporte"
+        verbose_name_plural = "Trabajos de Reporte"
+        ordering = ['-timestamp_creacion']
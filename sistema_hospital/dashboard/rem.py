@@ -0,0 +1,235 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .consultas import contar_en_una_consulta
+from .models import Madre, RegistroParto, RecienNacido, ResumenDiarioREM
+
+
+# Cada indicador del REM A.24 se expresa como un Count condicional sobre un único
+# recorrido de RegistroParto LEFT JOIN RecienNacido (más madre y tipo de parto).
+# Los conteos de partos y madres usan distinct=True porque el join con los recién
+# nacidos repite la fila del parto una vez por cada RN.
+
+def _parto(condicion=None):
+    return Count('id', distinct=True, filter=condicion)
+
+
+def _madre(condicion=None):
+    return Count('madre', distinct=True, filter=condicion)
+
+
+def _rn(condicion=None):
+    return Count('recien_nacidos', filter=condicion)
+
+
+def _rango_peso(desde=None, hasta=None):
+    condicion = Q()
+    if desde is not None:
+        condicion &= Q(recien_nacidos__peso_grs__gte=desde)
+    if hasta is not None:
+        condicion &= Q(recien_nacidos__peso_grs__lte=hasta)
+    return _rn(condicion)
+
+
+ES_CHILENA = Q(madre__nacionalidad='Chilena')
+ES_MIGRANTE = ~ES_CHILENA & Q(madre__nacionalidad__isnull=False)
+ES_PUEBLO = Q(madre__pertenece_pueblo_originario=True)
+
+SECCION_A = {
+    'total_partos': _parto(),
+    'vaginal_espontaneo': _parto(Q(tipo_parto__nombre__icontains='Espontáneo')),
+    'vaginal_instrumental': _parto(Q(tipo_parto__nombre__icontains='Instrumental')),
+    'cesarea_electiva': _parto(Q(tipo_parto__nombre='Cesárea Electiva')),
+    'cesarea_urgencia': _parto(Q(tipo_parto__nombre='Cesárea de Urgencia')),
+    'con_oxitocina': _parto(Q(uso_oxitocina=True)),
+    'con_ligadura_tardia': _parto(Q(ligadura_tardia_cordon=True)),
+    'con_piel_a_piel': _parto(Q(contacto_piel_a_piel=True)),
+    'pretermino': _parto(Q(edad_gestacional_semanas__lt=37)),
+    'termino': _parto(Q(edad_gestacional_semanas__gte=37, edad_gestacional_semanas__lte=41)),
+    'posttermino': _parto(Q(edad_gestacional_semanas__gte=42)),
+}
+
+SECCION_D1 = {
+    'total_rn': _rn(),
+    'peso_menor_1500': _rango_peso(hasta=1499),
+    'peso_1500_2499': _rango_peso(1500, 2499),
+    'peso_2500_3999': _rango_peso(2500, 3999),
+    'peso_mayor_4000': _rango_peso(desde=4000),
+
+    'p_lt_500': _rango_peso(hasta=499),
+    'p_500_999': _rango_peso(500, 999),
+    'p_1000_1499': _rango_peso(1000, 1499),
+    'p_1500_1999': _rango_peso(1500, 1999),
+    'p_2000_2499': _rango_peso(2000, 2499),
+    'p_2500_2999': _rango_peso(2500, 2999),
+    'p_3000_3999': _rango_peso(3000, 3999),
+    'p_gte_4000': _rango_peso(desde=4000),
+
+    'con_anomalia': _rn(Q(recien_nacidos__anomalia_congenita=True)),
+    'sexo_m': _rn(Q(recien_nacidos__sexo='M')),
+    'sexo_f': _rn(Q(recien_nacidos__sexo='F')),
+    'sexo_i': _rn(Q(recien_nacidos__sexo='I')),
+}
+
+SECCION_D2 = {
+    'profilaxis_ocular': _rn(Q(recien_nacidos__profilaxis_ocular=True)),
+    'profilaxis_hepb': _rn(Q(recien_nacidos__vacuna_hepatitis_b=True)),
+    'rn_vaginal': _rn(Q(tipo_parto__nombre__icontains='Espontáneo')),
+    'rn_instrumental': _rn(Q(tipo_parto__nombre__icontains='Instrumental')),
+    'rn_cesarea': _rn(Q(tipo_parto__nombre__icontains='Cesárea')),
+    'apgar_1_critico': _rn(Q(recien_nacidos__apgar_1_min__lte=3)),
+    'apgar_5_critico': _rn(Q(recien_nacidos__apgar_5_min__lte=6)),
+    'reanimacion_basica': _rn(Q(recien_nacidos__reanimacion='basica')),
+    'reanimacion_avanzada': _rn(Q(recien_nacidos__reanimacion='avanzada')),
+}
+
+_LME = Q(recien_nacidos__alimentacion_alta='LME')
+_MIXTA = Q(recien_nacidos__alimentacion_alta='LMixta')
+_FORMULA = Q(recien_nacidos__alimentacion_alta='Formula')
+
+SECCION_E = {
+    'lme_total': _rn(_LME),
+    'mixta_total': _rn(_MIXTA),
+    'formula_total': _rn(_FORMULA),
+    'lme_migrante': _rn(_LME & ES_MIGRANTE),
+    'mixta_migrante': _rn(_MIXTA & ES_MIGRANTE),
+    'formula_migrante': _rn(_FORMULA & ES_MIGRANTE),
+    'lme_pueblo': _rn(_LME & ES_PUEBLO),
+    'mixta_pueblo': _rn(_MIXTA & ES_PUEBLO),
+    'formula_pueblo': _rn(_FORMULA & ES_PUEBLO),
+}
+
+
+def seccion_demografia(year_actual):
+    # La edad se calcula como en el informe original: año del periodo menos año de nacimiento.
+    # Se compara directamente contra el año de nacimiento para que la base use rangos de fecha.
+    return {
+        'adolescente': _madre(Q(madre__fecha_nacimiento__year__gt=year_actual - 18)),
+        'adulta': _madre(Q(madre__fecha_nacimiento__year__gt=year_actual - 35,
+                           madre__fecha_nacimiento__year__lte=year_actual - 18)),
+        'anosa': _madre(Q(madre__fecha_nacimiento__year__lte=year_actual - 35)),
+        'chilena': _madre(ES_CHILENA),
+        'extranjera': _madre(~ES_CHILENA),
+        'pueblo_originario': _madre(ES_PUEBLO),
+    }
+
+
+def _prefijar(prefijo, seccion):
+    return {f'{prefijo}_{k}': v for k, v in seccion.items()}
+
+
+def _separar(prefijo, seccion, fila):
+    return {k: fila[f'{prefijo}_{k}'] for k in seccion}
+
+
+def calcular_datos_rem_directo(fecha_inicio, fecha_fin):
+    rango = (fecha_inicio, fecha_fin)
+    demo = seccion_demografia(fecha_inicio.year)
+    secciones = {'a': SECCION_A, 'demo': demo, 'd1': SECCION_D1, 'd2': SECCION_D2, 'e': SECCION_E}
+
+    agregados = {}
+    for prefijo, seccion in secciones.items():
+        agregados.update(_prefijar(prefijo, seccion))
+
+    fila = RegistroParto.objects.filter(fecha_parto__range=rango).order_by().aggregate(**agregados)
+    datos = {prefijo: _separar(prefijo, seccion, fila) for prefijo, seccion in secciones.items()}
+
+    datos['mort'] = contar_en_una_consulta(
+        materna=Madre.objects.filter(fallecida=True, fecha_fallecimiento__range=rango),
+        neonatal=RecienNacido.objects.filter(fallecido=True, fecha_fallecimiento__range=rango),
+    )
+    return datos
+
+
+# --- Resumen diario materializado (ResumenDiarioREM) ---
+# Las secciones A, D1, D2, E y la mortalidad son sumables por día. La demografía cuenta
+# madres distintas del periodo, así que no es sumable y se sigue calculando en vivo.
+
+SECCIONES_SUMABLES = {'a': SECCION_A, 'd1': SECCION_D1, 'd2': SECCION_D2, 'e': SECCION_E}
+CAMPOS_RESUMEN = [k for seccion in SECCIONES_SUMABLES.values() for k in seccion] + ['mort_materna', 'mort_neonatal']
+
+
+def _inicio_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _fin_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.max))
+
+
+def _dias_completos(fecha_inicio, fecha_fin):
+    """Devuelve (desde, hasta) si el rango cubre días completos; None en otro caso."""
+    fi = timezone.localtime(fecha_inicio) if timezone.is_aware(fecha_inicio) else fecha_inicio
+    ff = timezone.localtime(fecha_fin) if timezone.is_aware(fecha_fin) else fecha_fin
+    if fi.time() != time.min or ff.time() < time(23, 59, 59):
+        return None
+    return fi.date(), ff.date()
+
+
+def recalcular_resumen(desde, hasta):
+    """Recalcula y guarda el resumen de cada día entre desde y hasta (fechas inclusive)."""
+    rango = (_inicio_dia(desde), _fin_dia(hasta))
+    filas = {}
+
+    def fila(dia):
+        return filas.setdefault(dia, dict.fromkeys(CAMPOS_RESUMEN, 0))
+
+    agregados = {k: v for seccion in SECCIONES_SUMABLES.values() for k, v in seccion.items()}
+    por_dia = (
+        RegistroParto.objects.filter(fecha_parto__range=rango).order_by()
+        .annotate(dia=TruncDate('fecha_parto')).values('dia').annotate(**agregados)
+    )
+    for conteos in por_dia:
+        fila(conteos.pop('dia')).update(conteos)
+
+    for modelo, filtro, campo in (
+        (Madre, Q(fallecida=True), 'mort_materna'),
+        (RecienNacido, Q(fallecido=True), 'mort_neonatal'),
+    ):
+        muertes = (
+            modelo.objects.filter(filtro, fecha_fallecimiento__range=rango).order_by()
+            .annotate(dia=TruncDate('fecha_fallecimiento')).values('dia').annotate(n=Count('id'))
+        )
+        for conteo in muertes:
+            fila(conteo['dia'])[campo] = conteo['n']
+
+    # Se guardan también los días sin eventos: así el lector sabe que el día está cubierto.
+    resumenes = []
+    dia = desde
+    while dia <= hasta:
+        resumenes.append(ResumenDiarioREM(fecha=dia, **fila(dia)))
+        dia += timedelta(days=1)
+    ResumenDiarioREM.objects.bulk_create(
+        resumenes, batch_size=500,
+        update_conflicts=True, unique_fields=['fecha'], update_fields=CAMPOS_RESUMEN + ['actualizado'],
+    )
+    return len(resumenes)
+
+
+def _datos_desde_resumen(desde, hasta, fecha_inicio, fecha_fin):
+    dias_esperados = (hasta - desde).days + 1
+    sumas = ResumenDiarioREM.objects.filter(fecha__range=(desde, hasta)).aggregate(
+        dias=Count('id'), **{campo: Sum(campo) for campo in CAMPOS_RESUMEN}
+    )
+    if sumas['dias'] != dias_esperados:
+        return None
+
+    datos = {prefijo: {k: sumas[k] for k in seccion} for prefijo, seccion in SECCIONES_SUMABLES.items()}
+    datos['demo'] = RegistroParto.objects.filter(fecha_parto__range=(fecha_inicio, fecha_fin)).order_by().aggregate(
+        **seccion_demografia(fecha_inicio.year)
+    )
+    datos['mort'] = {'materna': sumas['mort_materna'], 'neonatal': sumas['mort_neonatal']}
+    return datos
+
+
+def calcular_datos_rem(fecha_inicio, fecha_fin):
+    """Datos del REM A.24. Usa ResumenDiarioREM si el rango son días completos ya materializados."""
+    dias = _dias_completos(fecha_inicio, fecha_fin)
+    if dias:
+        datos = _datos_desde_resumen(*dias, fecha_inicio, fecha_fin)
+        if datos is not None:
+            return {clave: datos[clave] for clave in ('a', 'demo', 'd1', 'd2', 'e', 'mort')}
+    return calcular_datos_rem_directo(fecha_inicio, fecha_fin)
@@ -2,9 +2,12 @@ from rest_framework import serializers
 from .models import (
     TipoParto, TipoAnalgesia,
     Madre, RegistroParto, RecienNacido,
-    SolicitudCorreccion 
+    SolicitudCorreccion, TrabajoReporte
 )
 from auditoria.serializers import SimpleUserSerializer
+from cuentas.models import CustomUser
+from cuentas.rut import separar_rut, formatear_rut, validar_rut
+from .trabajos import TIPOS_INTERNOS, TIPOS_SUPERVISOR, validar_parametros
 
 
 class TipoPartoSerializer(serializers.ModelSerializer):
@@ -23,6 +26,19 @@ class MadreSerializer(serializers.ModelSerializer):
         model = Madre
         fields = '__all__'
 
+    def validate_rut(self, value):
+        # Se guarda siempre en forma canónica; el duplicado se detecta aunque venga escrito distinto.
+        try:
+            cuerpo, dv = separar_rut(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        repetidas = Madre.objects.filter(rut_cuerpo=cuerpo)
+        if self.instance is not None:
+            repetidas = repetidas.exclude(pk=self.instance.pk)
+        if repetidas.exists():
+            raise serializers.ValidationError("Ya existe una madre con este RUT.")
+        return formatear_rut(cuerpo, dv)
+
 class RecienNacidoSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecienNacido
@@ -41,6 +57,51 @@ class MisRegistrosWriteSerializer(serializers.ModelSerializer):
         exclude = ('registrado_por',) 
 
 
+# Importación masiva (dashboard/importacion.py): las mismas reglas de campo que los serializers de
+# escritura, sin las validaciones que consultan la base fila a fila. El RUT duplicado se resuelve con
+# una consulta por lote y las FK se arman desde tablas cargadas una vez.
+
+class ImportacionMadreSerializer(MadreSerializer):
+    class Meta(MadreSerializer.Meta):
+        exclude = ('responsable_medico',)
+        fields = None
+        extra_kwargs = {'rut': {'validators': [validar_rut]}}
+
+    def validate_rut(self, value):
+        try:
+            return formatear_rut(*separar_rut(value))
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+
+class ImportacionPartoSerializer(MisRegistrosWriteSerializer):
+    tipo_parto = serializers.CharField(required=False, allow_blank=True)
+    tipo_analgesia = serializers.CharField(required=False, allow_blank=True)
+
+    class Meta(MisRegistrosWriteSerializer.Meta):
+        exclude = ('registrado_por', 'madre')
+
+    def _tipo(self, value, catalogo):
+        if not value:
+            return None
+        try:
+            return self.context[catalogo][value.strip().lower()]
+        except KeyError:
+            raise serializers.ValidationError(f"No existe el tipo '{value}'.")
+
+    def validate_tipo_parto(self, value):
+        return self._tipo(value, 'tipos_parto')
+
+    def validate_tipo_analgesia(self, value):
+        return self._tipo(value, 'tipos_analgesia')
+
+
+class ImportacionRecienNacidoSerializer(RecienNacidoSerializer):
+    class Meta(RecienNacidoSerializer.Meta):
+        exclude = ('parto_asociado', 'responsable_medico')
+        fields = None
+
+
 class RegistroPartoReadSerializer(serializers.ModelSerializer):
     madre = MadreSerializer(read_only=True)
     tipo_parto = serializers.StringRelatedField(read_only=True)
@@ -73,4 +134,29 @@ class SolicitudCorreccionSerializer(serializers.ModelSerializer):
         read_only_fields = (
             'solicitado_por', 'resuelta_por', 'estado', 
             'timestamp_creacion', 'timestamp_resolucion'
-        )
\ No newline at end of file
+        )
+
+
+class TrabajoReporteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TrabajoReporte
+        fields = [
+            'id', 'tipo', 'parametros', 'estado', 'error', 'nombre_archivo',
+            'timestamp_creacion', 'timestamp_inicio', 'timestamp_fin'
+        ]
+        read_only_fields = (
+            'estado', 'error', 'nombre_archivo',
+            'timestamp_creacion', 'timestamp_inicio', 'timestamp_fin'
+        )
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+        if attrs['tipo'] in TIPOS_INTERNOS:
+            raise serializers.ValidationError({"tipo": "Este trabajo se solicita desde su propio endpoint."})
+        if attrs['tipo'] in TIPOS_SUPERVISOR and user.rol != CustomUser.SUPERVISOR:
+            raise serializers.ValidationError({"tipo": "Solo un supervisor puede solicitar este reporte."})
+        try:
+            validar_parametros(attrs['tipo'], attrs.get('parametros') or {})
+        except ValueError as e:
+            raise serializers.ValidationError({"parametros": str(e)})
+        return attrs
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+from django.db import connections, transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, post_migrate
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Madre, RegistroParto, RecienNacido, SolicitudCorreccion
+from .rem import recalcular_resumen
+from .tablero import invalidar_tablero_supervisor
+from . import busqueda
+
+
+# Mantención incremental de ResumenDiarioREM: cada escritura recalcula solo los días que toca,
+# antes y después del cambio, cuando la transacción se confirma.
+
+def _dia(valor):
+    if isinstance(valor, str):
+        valor = parse_datetime(valor)
+    if not isinstance(valor, datetime):
+        return None
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    return timezone.localdate(valor)
+
+
+def _dias_afectados(instance):
+    if isinstance(instance, RegistroParto):
+        fechas = [instance.fecha_parto]
+    elif isinstance(instance, RecienNacido):
+        fechas = list(RegistroParto.objects.filter(pk=instance.parto_asociado_id).values_list('fecha_parto', flat=True))
+        if instance.fallecido:
+            fechas.append(instance.fecha_fallecimiento)
+    else:
+        fechas = list(instance.partos.values_list('fecha_parto', flat=True)) if instance.pk else []
+        if instance.fallecida:
+            fechas.append(instance.fecha_fallecimiento)
+    return {d for d in map(_dia, fechas) if d}
+
+
+def _recalcular(dias):
+    # Agrupa los días en tramos consecutivos para recalcular cada tramo con una sola pasada.
+    dias = sorted(dias)
+    inicio = fin = dias[0]
+    for dia in dias[1:]:
+        if dia != fin + timedelta(days=1):
+            recalcular_resumen(inicio, fin)
+            inicio = dia
+        fin = dia
+    recalcular_resumen(inicio, fin)
+
+
+def programar_resumen(dias):
+    """Recalcula los días indicados cuando la transacción se confirma (también para cargas con bulk_create)."""
+    if dias:
+        transaction.on_commit(lambda: _recalcular(dias))
+
+
+@receiver(pre_save, sender=RegistroParto)
+@receiver(pre_save, sender=RecienNacido)
+@receiver(pre_save, sender=Madre)
+def recordar_dias_previos(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    anterior = sender.objects.filter(pk=instance.pk).first()
+    instance._dias_rem = _dias_afectados(anterior) if anterior else set()
+
+
+@receiver(pre_delete, sender=RegistroParto)
+@receiver(pre_delete, sender=RecienNacido)
+@receiver(pre_delete, sender=Madre)
+def recordar_dias_eliminados(sender, instance, **kwargs):
+    instance._dias_rem = _dias_afectados(instance)
+
+
+@receiver(post_save, sender=RegistroParto)
+@receiver(post_save, sender=RecienNacido)
+@receiver(post_save, sender=Madre)
+def actualizar_resumen_rem(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    programar_resumen(getattr(instance, '_dias_rem', set()) | _dias_afectados(instance))
+
+
+@receiver(post_delete, sender=RegistroParto)
+@receiver(post_delete, sender=RecienNacido)
+@receiver(post_delete, sender=Madre)
+def actualizar_resumen_rem_eliminado(sender, instance, **kwargs):
+    programar_resumen(getattr(instance, '_dias_rem', set()))
+
+
+@receiver(post_save, sender=SolicitudCorreccion)
+@receiver(post_delete, sender=SolicitudCorreccion)
+@receiver(post_save, sender=RegistroParto)
+@receiver(post_delete, sender=RegistroParto)
+def invalidar_tablero(sender, raw=False, **kwargs):
+    # Contadores y últimas pendientes del tablero del supervisor (dashboard.tablero).
+    if not raw:
+        invalidar_tablero_supervisor()
+
+
+@receiver(post_migrate)
+def instalar_busqueda(sender, using='default', **kwargs):
+    # Una vez por migrate, después de que dashboard tenga sus tablas (ver dashboard.busqueda).
+    if sender.name == 'dashboard':
+        busqueda.instalar(connections[using])
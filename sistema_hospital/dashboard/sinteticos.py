@@ -0,0 +1,215 @@
+import random
+from datetime import date, datetime, timedelta
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from auditoria.models import HistorialAccion, HistorialSesion
+from cuentas.models import CustomUser, Equipo
+from cuentas.rut import digito_verificador
+from .models import TipoParto, TipoAnalgesia, Madre, RegistroParto, RecienNacido, SolicitudCorreccion
+
+
+NOMBRES = ['María', 'Josefa', 'Camila', 'Valentina', 'Fernanda', 'Constanza', 'Javiera', 'Catalina', 'Ignacia', 'Antonia']
+APELLIDOS = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda']
+NACIONALIDADES = ['Chilena'] * 8 + ['Venezolana', 'Haitiana', 'Peruana', None]
+
+# Contraseña de todos los usuarios sintéticos (el hash se calcula una vez y se comparte).
+CLAVE_SINTETICA = 'Sintetico.2024'
+
+
+def generar_partos(cantidad, semilla=42, desde=None, hasta=None, rut_inicial=30_000_000, lote=5000, usuarios=None):
+    """Inserta `cantidad` partos sintéticos (con sus madres y RN) usando bulk_create. Devuelve (madres, partos, rn)."""
+    rnd = random.Random(semilla)
+    call_command('init_hospital', stdout=StringIO())
+    tipos_parto = list(TipoParto.objects.values_list('id', flat=True))
+    tipos_analgesia = list(TipoAnalgesia.objects.values_list('id', flat=True))
+    hasta = hasta or timezone.now()
+    desde = desde or hasta - timedelta(days=365)
+    segundos = int((hasta - desde).total_seconds())
+    usuarios = list(usuarios or [None])
+
+    total_madres = total_partos = total_rn = 0
+    for inicio in range(0, cantidad, lote):
+        n = min(lote, cantidad - inicio)
+        madres = []
+        for i in range(n):
+            cuerpo = rut_inicial + inicio + i
+            dv = digito_verificador(cuerpo)
+            madres.append(Madre(
+                rut=f"{cuerpo}-{dv}", rut_cuerpo=cuerpo, rut_dv=dv,
+                nombre=f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}",
+                fecha_nacimiento=date(rnd.randint(1975, 2010), rnd.randint(1, 12), rnd.randint(1, 28)),
+                nacionalidad=rnd.choice(NACIONALIDADES),
+                pertenece_pueblo_originario=rnd.random() < 0.1,
+            ))
+        madres = Madre.objects.bulk_create(madres)
+
+        partos = [
+            RegistroParto(
+                madre=m,
+                registrado_por=rnd.choice(usuarios),
+                fecha_parto=desde + timedelta(seconds=rnd.randrange(segundos)),
+                edad_gestacional_semanas=rnd.choices([32, 35, 38, 39, 40, 41, 42], [1, 2, 10, 20, 20, 8, 2])[0],
+                personal_atiende=f"Matrona {rnd.choice(APELLIDOS)}",
+                tipo_parto_id=rnd.choice(tipos_parto),
+                tipo_analgesia_id=rnd.choice(tipos_analgesia),
+                uso_oxitocina=rnd.random() < 0.8,
+                ligadura_tardia_cordon=rnd.random() < 0.6,
+                contacto_piel_a_piel=rnd.random() < 0.7,
+            )
+            for m in madres
+        ]
+        partos = RegistroParto.objects.bulk_create(partos)
+
+        rns = []
+        for p in partos:
+            for _ in range(2 if rnd.random() < 0.02 else 1):
+                rns.append(RecienNacido(
+                    parto_asociado=p,
+                    sexo=rnd.choices('MFI', [49, 50, 1])[0],
+                    peso_grs=max(400, int(rnd.gauss(3300, 550))),
+                    talla_cm=round(rnd.uniform(44, 54), 1),
+                    apgar_1_min=rnd.choices(range(11), [1, 1, 1, 1, 2, 3, 5, 10, 30, 35, 11])[0],
+                    apgar_5_min=rnd.choices(range(11), [1, 1, 1, 1, 1, 1, 2, 5, 15, 50, 22])[0],
+                    reanimacion=rnd.choices(['ninguna', 'basica', 'avanzada'], [90, 8, 2])[0],
+                    anomalia_congenita=rnd.random() < 0.02,
+                    alimentacion_alta=rnd.choices(['LME', 'LMixta', 'Formula'], [70, 20, 10])[0],
+                ))
+        RecienNacido.objects.bulk_create(rns)
+
+        total_madres += len(madres)
+        total_partos += len(partos)
+        total_rn += len(rns)
+    return total_madres, total_partos, total_rn
+
+
+def generar_personal(doctores, enfermeros, supervisores=1, admins=1, prefijo='sintetico', rut_inicial=5_000_000):
+    """Crea el personal con bulk_create y devuelve {rol: [usuarios]}. Todos con CLAVE_SINTETICA."""
+    clave = make_password(CLAVE_SINTETICA)
+    usuarios = []
+    cantidades = (
+        (CustomUser.DOCTOR, doctores), (CustomUser.ENFERMERO, enfermeros),
+        (CustomUser.SUPERVISOR, supervisores), (CustomUser.ADMIN, admins),
+    )
+    for rol, cantidad in cantidades:
+        for i in range(cantidad):
+            cuerpo = rut_inicial + len(usuarios)
+            dv = digito_verificador(cuerpo)
+            usuarios.append(CustomUser(
+                username=f"{prefijo}_{rol}_{i}", password=clave, rol=rol,
+                first_name=NOMBRES[i % len(NOMBRES)], last_name=APELLIDOS[i % len(APELLIDOS)],
+                rut=f"{cuerpo}-{dv}", rut_cuerpo=cuerpo, rut_dv=dv,
+            ))
+    usuarios = CustomUser.objects.bulk_create(usuarios)
+    por_rol = {}
+    for usuario in usuarios:
+        por_rol.setdefault(usuario.rol, []).append(usuario)
+    return por_rol
+
+
+def generar_equipos(doctores, enfermeros, semilla=42):
+    """Un equipo activo por doctor, con los enfermeros repartidos entre ellos. Devuelve la cantidad de equipos."""
+    if not doctores:
+        return 0
+    rnd = random.Random(semilla)
+    equipos = Equipo.objects.bulk_create([
+        Equipo(nombre=f"Equipo {doctor.last_name} {i}", lider=doctor, turno=rnd.choice(['diurno', 'nocturno']))
+        for i, doctor in enumerate(doctores)
+    ])
+    Equipo.miembros.through.objects.bulk_create([
+        Equipo.miembros.through(equipo_id=equipos[i % len(equipos)].id, customuser_id=enfermero.id)
+        for i, enfermero in enumerate(enfermeros)
+    ])
+    return len(equipos)
+
+
+def _actualizar(modelo, ids, **campos):
+    for i in range(0, len(ids), 5000):
+        modelo.objects.filter(pk__in=ids[i:i + 5000]).update(**campos)
+
+
+def marcar_altas_y_defunciones(semilla=42, partos=None):
+    """
+    Proporciones aproximadas de un servicio real: la mayoría con alta, pocas defunciones.
+    Con `partos` (queryset de RegistroParto), solo toca sus RN y madres.
+    """
+    rnd = random.Random(semilla)
+    fecha_parto_rn = Subquery(RegistroParto.objects.filter(pk=OuterRef('parto_asociado_id')).values('fecha_parto')[:1])
+    rns, madres = RecienNacido.objects.all(), Madre.objects.all()
+    if partos is not None:
+        rns, madres = rns.filter(parto_asociado__in=partos), madres.filter(partos__in=partos).distinct()
+    rn_ids = list(rns.values_list('id', flat=True))
+    con_alta = [i for i in rn_ids if rnd.random() < 0.7]
+    sin_alta = sorted(set(rn_ids) - set(con_alta))
+    _actualizar(RecienNacido, con_alta, fecha_alta=fecha_parto_rn)
+    _actualizar(RecienNacido, [i for i in con_alta if rnd.random() < 0.5], alta_validada=True)
+    _actualizar(RecienNacido, [i for i in sin_alta if rnd.random() < 0.01], fallecido=True, fecha_fallecimiento=fecha_parto_rn)
+
+    fecha_parto_madre = Subquery(RegistroParto.objects.filter(madre=OuterRef('pk')).values('fecha_parto')[:1])
+    madre_ids = list(madres.values_list('id', flat=True))
+    fallecidas = [i for i in madre_ids if rnd.random() < 0.001]
+    _actualizar(Madre, fallecidas, fallecida=True, fecha_fallecimiento=fecha_parto_madre)
+    _actualizar(Madre, [i for i in sorted(set(madre_ids) - set(fallecidas)) if rnd.random() < 0.7], fecha_alta=fecha_parto_madre)
+
+
+def generar_solicitudes(usuarios, proporcion=0.05, semilla=42, partos=None):
+    """Solicitudes de corrección para `proporcion` de los partos (todos, o el queryset `partos`), casi todas ya resueltas."""
+    rnd = random.Random(semilla)
+    ids = list((RegistroParto.objects.all() if partos is None else partos).values_list('id', flat=True))
+    solicitudes = SolicitudCorreccion.objects.bulk_create([
+        SolicitudCorreccion(
+            registro_id=rnd.choice(ids), solicitado_por=rnd.choice(usuarios),
+            mensaje="Corregir edad gestacional",
+            estado='pendiente' if rnd.random() < 0.05 else 'resuelta',
+        )
+        for _ in range(max(int(len(ids) * proporcion), 1))
+    ], batch_size=5000)
+    return len(solicitudes)
+
+
+def generar_auditoria(usuarios, acciones, sesiones, semilla=42, dias=365, lote=5000):
+    """
+    Filas de HistorialAccion y HistorialSesion repartidas en los últimos `dias`. Las acciones se
+    insertan con su hora; HistorialSesion.timestamp es auto_now_add (bulk_create lo pisa), así que
+    las sesiones se insertan por hora del día y se llevan a esa hora con un UPDATE por grupo.
+    Devuelve (acciones, sesiones).
+    """
+    rnd = random.Random(semilla)
+    ahora = timezone.now()
+    segundos = dias * 86400
+    tipo_parto = ContentType.objects.get_for_model(RegistroParto).pk
+    ids = list(RegistroParto.objects.values_list('id', flat=True)) or [1]
+    usuario_ids = [u.pk for u in usuarios]
+
+    for inicio in range(0, acciones, lote):
+        HistorialAccion.objects.bulk_create([
+            HistorialAccion(
+                usuario_id=rnd.choice(usuario_ids), content_type_id=tipo_parto, object_id=rnd.choice(ids),
+                accion=rnd.choices(['creacion', 'modificacion', 'solicitud', 'reporte'], [50, 35, 5, 10])[0],
+                detalles="Acción sintética", timestamp=ahora - timedelta(seconds=rnd.randrange(segundos)),
+            )
+            for _ in range(min(lote, acciones - inicio))
+        ])
+
+    por_hora = {}
+    for _ in range(sesiones):
+        por_hora.setdefault(rnd.randrange(dias * 24), []).append(HistorialSesion(
+            usuario_id=rnd.choice(usuario_ids), accion=rnd.choice(['login', 'logout']),
+            ip_address=f"10.0.{rnd.randrange(256)}.{rnd.randrange(1, 255)}",
+        ))
+    for hora, grupo in por_hora.items():
+        creadas = HistorialSesion.objects.bulk_create(grupo)
+        _actualizar(HistorialSesion, [s.pk for s in creadas], timestamp=ahora - timedelta(hours=hora, minutes=rnd.randrange(60)))
+    return acciones, sesiones
+
+
+def periodo_completo(desde, hasta):
+    """Convierte dos fechas en el rango de datetimes que usan las vistas de reportes."""
+    fi = datetime.combine(desde, datetime.min.time())
+    ff = datetime.combine(hasta, datetime.max.time()).replace(microsecond=0)
+    return timezone.make_aware(fi), timezone.make_aware(ff)
@@ -0,0 +1,83 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .consultas import contar_en_una_consulta
+from .models import RegistroParto, SolicitudCorreccion
+
+
+# Estadísticas del tablero del supervisor (supervisor_dashboard_stats), que los navegadores
+# consultan periódicamente.
+#
+# Los contadores salen de una sola sentencia (contar_en_una_consulta) y las últimas solicitudes
+# pendientes de otra, con select_related y el índice parcial solicitud_pendiente_idx. El resultado
+# se guarda en la caché 'compartida' por SUPERVISOR_TABLERO_TTL segundos junto con su ETag (hash
+# del contenido); las señales de SolicitudCorreccion y RegistroParto lo borran al escribir, así que
+# el TTL solo acota lo que no pasa por señales (bulk_create, .update()). Con el ETag, un cliente
+# cuyo tablero no cambió recibe un 304 sin cuerpo.
+
+ULTIMAS_PENDIENTES = 5
+
+
+def _clave(mes):
+    # El mes va en la clave: al cambiar de mes, el contador se recalcula sin esperar al TTL.
+    return f'tablero_supervisor:{mes:%Y-%m}'
+
+
+def _limites_mes(ahora):
+    inicio = timezone.localtime(ahora).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    siguiente = (inicio + timedelta(days=32)).replace(day=1)
+    return inicio, siguiente
+
+
+def calcular_tablero_supervisor(ahora=None):
+    inicio, siguiente = _limites_mes(ahora or timezone.now())
+    pendientes = SolicitudCorreccion.objects.filter(estado='pendiente')
+    conteos = contar_en_una_consulta(
+        pendientes=pendientes,
+        registros_mes=RegistroParto.objects.filter(fecha_parto__gte=inicio, fecha_parto__lt=siguiente),
+    )
+    ultimas = pendientes.select_related('solicitado_por').order_by('-timestamp_creacion')[:ULTIMAS_PENDIENTES]
+    return {
+        'pending_corrections_count': conteos['pendientes'],
+        'registros_this_month': conteos['registros_mes'],
+        'latest_pending_corrections': [
+            {
+                'id': s.id,
+                'mensaje': s.mensaje,
+                'registro_id': s.registro_id,
+                'solicitado_por': s.solicitado_por.username if s.solicitado_por else 'N/A',
+                'timestamp': s.timestamp_creacion.strftime('%Y-%m-%d'),
+            }
+            for s in ultimas
+        ],
+    }
+
+
+def tablero_supervisor():
+    """(datos, etag) del tablero, desde la caché compartida o recién calculados."""
+    cache = caches['compartida']
+    clave = _clave(timezone.localdate())
+    guardado = cache.get(clave)
+    if guardado is None:
+        datos = calcular_tablero_supervisor()
+        contenido = json.dumps(datos, cls=DjangoJSONEncoder, sort_keys=True).encode()
+        guardado = (datos, f'"{hashlib.sha256(contenido).hexdigest()[:32]}"')
+        cache.set(clave, guardado, timeout=settings.SUPERVISOR_TABLERO_TTL)
+    return guardado
+
+
+def _borrar():
+    caches['compartida'].delete(_clave(timezone.localdate()))
+
+
+def invalidar_tablero_supervisor():
+    """Descarta el tablero en caché. Se repite al confirmar, por si otro request lo recalculó entretanto."""
+    _borrar()
+    transaction.on_commit(_borrar)
@@ -1,3 +1,1037 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.db.models import Count, Q
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from openpyxl import load_workbook
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cuentas.equipos import registradores_visibles, filtro_registradores
+from cuentas.models import CustomUser, Equipo
+from cuentas.rut import digito_verificador, formatear_rut
+from sistema_hospital.instrumentacion import huella_sql, registro, Registro, PresupuestoConsultasExcedido
+from sistema_hospital.paginacion import PaginacionHibrida
+from sistema_hospital.pruebas import ajustes_prueba
+from .api_views import ExportRegistrosView, SolicitudCorreccionViewSet
+from .busqueda import LIMITE_MAXIMO, buscar_madres, filtrar_madres
+from . import importacion, lote_comprobantes
+from .cache_documentos import CacheDocumentos, clave_documento
+from .exportes import COLUMNAS_EXCEL, COLUMNAS_EXPORT, generar_excel_registros, stream_csv, stream_parquet
+from .importacion import importar
+from .models import Madre, RegistroParto, RecienNacido, ResumenDiarioREM, SolicitudCorreccion, TipoParto, TrabajoReporte
+from .rem import calcular_datos_rem, calcular_datos_rem_directo, recalcular_resumen
+from .sinteticos import generar_partos
+from . import trabajos
+from .trabajos import ejecutar_trabajo, latir, liberar_colgados, reclamar_pendientes
+
+
+class PresupuestoConsultasMixin:
+    """Verifica que un endpoint no exceda un número fijo de consultas, sin importar cuántas filas devuelva."""
+
+    def assertPresupuesto(self, usuario, url, consultas):
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        with self.assertNumQueries(consultas):
+            respuesta = cliente.get(url)
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return respuesta.json()
+
+
+@ajustes_prueba
+class RegistroPartoConsultasTests(PresupuestoConsultasMixin, TestCase):
+    # count + página + prefetch de recien_nacidos
+    LISTA = 3
+    # get_object + prefetch de recien_nacidos
+    DETALLE = 2
+    # el alcance del equipo va como subconsulta dentro de la misma consulta (cuentas.equipos)
+    EQUIPO = 0
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = CustomUser.objects.create(username='supervisor', rol=CustomUser.SUPERVISOR)
+        cls.doctor = CustomUser.objects.create(username='doctor', rol=CustomUser.DOCTOR)
+        cls.enfermero = CustomUser.objects.create(username='enfermero', rol=CustomUser.ENFERMERO)
+        equipo = Equipo.objects.create(nombre='Equipo A', lider=cls.doctor)
+        equipo.miembros.add(cls.enfermero)
+        generar_partos(40, usuarios=[cls.doctor, cls.enfermero])
+        cls.parto = RegistroParto.objects.filter(recien_nacidos__isnull=False).first()
+        # Un parto con varios RN para que el número de filas relacionadas no sea uniforme.
+        for rn in RecienNacido.objects.filter(parto_asociado=cls.parto)[:1]:
+            rn.pk = None
+            rn.save()
+
+    def test_lista_registros_parto(self):
+        datos = self.assertPresupuesto(self.supervisor, '/dashboard/api/registros-parto/', self.LISTA)
+        self.assertEqual(len(datos['results']), 15)
+        self.assertIn('madre', datos['results'][0])
+
+    def test_lista_no_depende_del_tamano_de_pagina(self):
+        # Páginas de 1, 15 y todas las filas, y una página intermedia: el número de consultas no cambia.
+        for tamano, url, filas in ((1, '', 1), (15, '?page=3', 10), (40, '', 40)):
+            with self.subTest(tamano=tamano, url=url), mock.patch.object(PaginacionHibrida, 'page_size', tamano):
+                datos = self.assertPresupuesto(self.supervisor, f'/dashboard/api/registros-parto/{url}', self.LISTA)
+                self.assertEqual(len(datos['results']), filas)
+
+    def test_lista_no_depende_del_numero_de_filas(self):
+        generar_partos(60, semilla=7, rut_inicial=31_000_000, usuarios=[self.doctor])
+        with mock.patch.object(PaginacionHibrida, 'page_size', 100):
+            datos = self.assertPresupuesto(self.supervisor, '/dashboard/api/registros-parto/', self.LISTA)
+        self.assertEqual(len(datos['results']), 100)
+
+    def test_detalle_registro_parto(self):
+        datos = self.assertPresupuesto(self.supervisor, f'/dashboard/api/registros-parto/{self.parto.pk}/', self.DETALLE)
+        self.assertEqual(len(datos['recien_nacidos']), self.parto.recien_nacidos.count())
+
+    def test_mis_registros_enfermero(self):
+        self.assertPresupuesto(self.enfermero, '/dashboard/api/mis-registros/', self.LISTA)
+
+    def test_mis_registros_doctor_con_equipo(self):
+        datos = self.assertPresupuesto(self.doctor, '/dashboard/api/mis-registros/', self.EQUIPO + self.LISTA)
+        self.assertEqual(datos['count'], 40)
+
+    def test_mis_registros_detalle(self):
+        self.assertPresupuesto(self.doctor, f'/dashboard/api/mis-registros/{self.parto.pk}/', self.EQUIPO + self.DETALLE)
+
+
+@ajustes_prueba
+class AlcanceEquipoTests(TransactionTestCase):
+    # Sin transacción envolvente: el LRU de cuentas.equipos no guarda lecturas hechas dentro de una.
+
+    def setUp(self):
+        caches['compartida'].clear()
+        self.doctor = CustomUser.objects.create(username='doctor', rol=CustomUser.DOCTOR)
+        self.enfermero = CustomUser.objects.create(username='enfermero', rol=CustomUser.ENFERMERO)
+        self.otro = CustomUser.objects.create(username='otro', rol=CustomUser.ENFERMERO)
+        self.equipo = Equipo.objects.create(nombre='Equipo A', lider=self.doctor)
+        self.equipo.miembros.add(self.enfermero)
+
+    def test_lista_en_cache_sin_consultas(self):
+        registradores_visibles(self.doctor)
+        with self.assertNumQueries(0):
+            self.assertCountEqual(registradores_visibles(self.doctor), [self.doctor.id, self.enfermero.id])
+
+    def test_cambio_de_miembros_invalida(self):
+        registradores_visibles(self.doctor)
+        self.equipo.miembros.add(self.otro)
+        self.assertIn(self.otro.id, registradores_visibles(self.doctor))
+        self.equipo.miembros.remove(self.enfermero)
+        self.assertNotIn(self.enfermero.id, registradores_visibles(self.doctor))
+
+    def test_activar_otro_equipo_invalida(self):
+        nuevo = Equipo.objects.create(nombre='Equipo B', lider=self.doctor, activo=False)
+        nuevo.miembros.add(self.otro)
+        registradores_visibles(self.doctor)
+        cliente = APIClient()
+        cliente.force_authenticate(self.doctor)
+        self.assertEqual(cliente.post(f'/cuentas/api/equipos/{nuevo.pk}/activar/').status_code, 200)
+        self.assertCountEqual(registradores_visibles(self.doctor), [self.doctor.id, self.otro.id])
+
+    def test_filtro_coincide_con_la_lista(self):
+        generar_partos(10, usuarios=[self.doctor, self.enfermero, self.otro])
+        por_filtro = set(RegistroParto.objects.filter(filtro_registradores(self.doctor)).values_list('id', flat=True))
+        por_lista = set(RegistroParto.objects.filter(registrado_por_id__in=registradores_visibles(self.doctor)).values_list('id', flat=True))
+        self.assertEqual(por_filtro, por_lista)
+        self.assertTrue(por_filtro)
+
+
+@ajustes_prueba
+class ImportacionTests(TestCase):
+    COLUMNAS = 'madre_rut,madre_nombre,madre_fecha_nacimiento,fecha_parto,edad_gestacional_semanas,tipo_parto,rn_sexo,rn_peso_grs,rn_talla_cm,rn_apgar_1_min,rn_apgar_5_min\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_partos(1, rut_inicial=20_000_000)
+        cls.existente = Madre.objects.get()
+
+    def _csv(self, filas):
+        return io.BytesIO((self.COLUMNAS + ''.join(filas)).encode())
+
+    def _fila(self, rut, peso=3200):
+        return f'{rut},Ana Soto,1990-01-01,2024-03-01T10:00:00,39,Cesárea Electiva,F,{peso},49.5,9,10\n'
+
+    def test_deduplica_madres_por_rut_e_informa_errores(self):
+        resultado = importar(self._csv([
+            self._fila('11.111.111-1'),
+            self._fila('111111111'),  # misma madre, otro formato
+            self._fila(self.existente.rut.replace('-', '')),
+            self._fila('11.111.111-2'),  # dígito verificador incorrecto
+            self._fila('22.222.222-2', peso=-1),
+        ]), 'csv')
+
+        self.assertEqual((resultado.filas, resultado.partos, resultado.recien_nacidos), (5, 3, 3))
+        self.assertEqual((resultado.madres_nuevas, resultado.madres_existentes), (1, 1))
+        self.assertEqual([e['linea'] for e in resultado.errores], [5, 6])
+        self.assertIn('madre', resultado.errores[0]['errores'])
+        self.assertIn('recien_nacidos', resultado.errores[1]['errores'])
+        madre = Madre.objects.get(rut_cuerpo=11_111_111)
+        self.assertEqual((madre.rut, madre.partos.count()), (formatear_rut(11_111_111, '1'), 2))
+        self.assertEqual(self.existente.partos.count(), 2)
+
+    def test_consultas_por_lote_no_dependen_de_las_filas(self):
+        def consultas(n, desde):
+            filas = [self._fila(formatear_rut(c, digito_verificador(c))) for c in range(desde, desde + n)]
+            with CaptureQueriesContext(connection) as capturadas:
+                importar(self._csv(filas), 'csv')
+            return len(capturadas)
+
+        consultas(1, 29_000_000)  # el ContentType de la auditoría queda en la caché del proceso
+        self.assertEqual(consultas(5, 30_000_000), consultas(50, 31_000_000))
+
+    def test_jsonl_con_lineas_invalidas(self):
+        filas = [
+            {'madre': {'rut': '11.111.111-1', 'nombre': 'Ana Soto', 'fecha_nacimiento': '1990-01-01'},
+             'parto': {'fecha_parto': '2024-03-01T10:00:00', 'edad_gestacional_semanas': 39},
+             'recien_nacidos': [{'sexo': 'F', 'peso_grs': 3200, 'talla_cm': 49.5, 'apgar_1_min': 9, 'apgar_5_min': 10}]},
+            '{"madre": ',
+            ['no es un objeto'],
+        ]
+        contenido = '\n'.join(f if isinstance(f, str) else json.dumps(f) for f in filas)
+        resultado = importar(io.BytesIO(contenido.encode()), 'jsonl')
+        self.assertEqual((resultado.filas, resultado.partos, resultado.recien_nacidos), (3, 1, 1))
+        self.assertEqual([e['linea'] for e in resultado.errores], [2, 3])
+        self.assertIn('JSON inválido', resultado.errores[0]['errores']['fila'][0])
+
+    def test_reintenta_el_lote_si_otro_proceso_registra_la_madre(self):
+        insertar = importacion._insertar_lote
+
+        def madre_registrada_entretanto(*args):
+            if not Madre.objects.filter(rut_cuerpo=11_111_111).exists():
+                Madre.objects.create(rut='11.111.111-1', nombre='Ana Soto', fecha_nacimiento=date(1990, 1, 1))
+                raise IntegrityError('UNIQUE constraint failed: dashboard_madre.rut')
+            return insertar(*args)
+
+        with mock.patch.object(importacion, '_insertar_lote', side_effect=madre_registrada_entretanto):
+            resultado = importar(self._csv([self._fila('11.111.111-1')]), 'csv')
+        self.assertEqual((resultado.partos, resultado.madres_nuevas, resultado.madres_existentes), (1, 0, 1))
+        self.assertEqual(Madre.objects.get(rut_cuerpo=11_111_111).partos.count(), 1)
+
+    def test_lote_con_integrity_error_repetido_se_informa(self):
+        with mock.patch.object(importacion, '_insertar_lote', side_effect=IntegrityError('sin suerte')):
+            resultado = importar(self._csv([self._fila('11.111.111-1'), self._fila('22.222.222-2')]), 'csv')
+        self.assertEqual(resultado.partos, 0)
+        self.assertEqual([e['linea'] for e in resultado.errores], [2, 3])
+        self.assertIn('sin suerte', resultado.errores[0]['errores']['fila'][0])
+
+    def test_endpoint_encola_y_el_worker_importa(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        supervisor = CustomUser.objects.create(username='supervisor', rol=CustomUser.SUPERVISOR)
+        cliente = APIClient()
+        cliente.force_authenticate(supervisor)
+        subido = SimpleUploadedFile('historicos.csv', self._csv([self._fila('11.111.111-1')]).getvalue())
+
+        with override_settings(IMPORTACIONES_DIR=os.path.join(directorio, 'subidas'), REPORTES_DIR=os.path.join(directorio, 'reportes')):
+            respuesta = cliente.post('/dashboard/api/importacion/partos/', {'archivo': subido}, format='multipart')
+            self.assertEqual(respuesta.status_code, 202, respuesta.content)
+            self.assertEqual((respuesta.json()['tipo'], respuesta.json()['estado']), ('importacion_partos', 'pendiente'))
+            self.assertEqual(Madre.objects.filter(rut_cuerpo=11_111_111).count(), 0)
+            trabajo = TrabajoReporte.objects.get(pk=respuesta.json()['id'])
+            self.assertTrue(respuesta['Location'].endswith(f'/trabajos-reporte/{trabajo.pk}/'))
+
+            with mock.patch('dashboard.trabajos.connection'):  # el worker cierra su conexión al terminar
+                [(pk, intento)] = reclamar_pendientes(1)
+                self.assertEqual(pk, trabajo.pk)
+                self.assertEqual(ejecutar_trabajo(pk, intento), 'completado')
+            self.assertEqual(os.listdir(os.path.join(directorio, 'subidas')), [])
+            descarga = cliente.get(f'/dashboard/api/trabajos-reporte/{trabajo.pk}/descargar/')
+            resumen = json.loads(b''.join(descarga.streaming_content))
+        self.assertEqual((resumen['partos'], resumen['madres_nuevas']), (1, 1))
+        self.assertEqual(Madre.objects.get(rut_cuerpo=11_111_111).partos.get().registrado_por, supervisor)
+
+    def test_no_se_encola_por_el_endpoint_generico(self):
+        supervisor = CustomUser.objects.create(username='supervisor', rol=CustomUser.SUPERVISOR)
+        cliente = APIClient()
+        cliente.force_authenticate(supervisor)
+        respuesta = cliente.post(
+            '/dashboard/api/trabajos-reporte/',
+            {'tipo': 'importacion_partos', 'parametros': {'archivo': '../../db.sqlite3', 'formato': 'csv'}}, format='json',
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('tipo', respuesta.json())
+
+
+@ajustes_prueba
+class ColaTrabajosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = CustomUser.objects.create(username='supervisor', rol=CustomUser.SUPERVISOR)
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        self.reportes = os.path.join(directorio, 'reportes')
+        self.enterContext(override_settings(REPORTES_DIR=self.reportes))
+        self.enterContext(mock.patch('dashboard.trabajos.connection'))  # el worker cierra su conexión al terminar
+        self.enterContext(mock.patch.dict(trabajos.GENERADORES, {'rem_pdf': self._generar}))
+        self.generados = 0
+        self.trabajo = TrabajoReporte.objects.create(tipo='rem_pdf', solicitado_por=self.supervisor, parametros={})
+
+    def _generar(self, parametros, destino):
+        self.generados += 1
+        destino.write(b'contenido')
+        return 'informe.pdf', 'application/pdf'
+
+    def _sin_latido(self, minutos=31):
+        TrabajoReporte.objects.filter(pk=self.trabajo.pk).update(timestamp_latido=timezone.now() - timedelta(minutes=minutos))
+
+    def test_completa_y_deja_el_archivo(self):
+        [(pk, intento)] = reclamar_pendientes(5)
+        self.assertEqual(ejecutar_trabajo(pk, intento), 'completado')
+        self.trabajo.refresh_from_db()
+        self.assertEqual((self.trabajo.estado, self.trabajo.nombre_archivo), ('completado', 'informe.pdf'))
+        with open(trabajos.ruta_archivo(self.trabajo), 'rb') as archivo:
+            self.assertEqual(archivo.read(), b'contenido')
+        self.assertEqual(os.listdir(self.reportes), [self.trabajo.archivo])
+
+    def test_un_trabajo_se_reclama_una_sola_vez(self):
+        self.assertEqual(len(reclamar_pendientes(5)), 1)
+        self.assertEqual(reclamar_pendientes(5), [])
+
+    def test_solo_se_libera_sin_latido(self):
+        [(_, intento)] = reclamar_pendientes(1)
+        self._sin_latido(minutos=10)
+        self.assertEqual(liberar_colgados(30), 0)
+        self._sin_latido()
+        self.assertEqual(latir([intento]), 1)  # el worker sigue vivo
+        self.assertEqual(liberar_colgados(30), 0)
+        self._sin_latido()
+        self.assertEqual(liberar_colgados(30), 1)
+        self.trabajo.refresh_from_db()
+        self.assertEqual((self.trabajo.estado, self.trabajo.intento), ('pendiente', None))
+        self.assertEqual(latir([intento]), 0)
+
+    def test_intento_liberado_no_pisa_al_nuevo(self):
+        [(pk, viejo)] = reclamar_pendientes(1)
+        self._sin_latido()
+        liberar_colgados(30)
+        [(_, nuevo)] = reclamar_pendientes(1)
+        self.assertNotEqual(viejo, nuevo)
+
+        # El intento viejo termina después de ser liberado: descarta su resultado.
+        self.assertEqual(ejecutar_trabajo(pk, viejo), 'descartado')
+        self.trabajo.refresh_from_db()
+        self.assertEqual((self.trabajo.estado, self.trabajo.intento), ('en_proceso', nuevo))
+        self.assertFalse(os.listdir(self.reportes))
+
+        self.assertEqual(ejecutar_trabajo(pk, nuevo), 'completado')
+        self.trabajo.refresh_from_db()
+        self.assertEqual(self.trabajo.archivo, f'trabajo_{pk}_{nuevo.hex}')
+        self.assertEqual(os.listdir(self.reportes), [self.trabajo.archivo])
+        # Un error tardío del intento viejo tampoco cambia el estado.
+        with mock.patch.dict(trabajos.GENERADORES, {'rem_pdf': mock.Mock(side_effect=ValueError('tarde'))}):
+            self.assertEqual(ejecutar_trabajo(pk, viejo), 'descartado')
+        self.trabajo.refresh_from_db()
+        self.assertEqual((self.trabajo.estado, self.trabajo.error), ('completado', None))
+        self.assertEqual(self.generados, 2)
+
+    def test_error_del_intento_vigente(self):
+        [(pk, intento)] = reclamar_pendientes(1)
+        with mock.patch.dict(trabajos.GENERADORES, {'rem_pdf': mock.Mock(side_effect=ValueError('sin datos'))}):
+            self.assertEqual(ejecutar_trabajo(pk, intento), 'error')
+        self.trabajo.refresh_from_db()
+        self.assertEqual((self.trabajo.estado, self.trabajo.error), ('error', 'sin datos'))
+        self.assertFalse(os.listdir(self.reportes))
+
+
+@ajustes_prueba
+class DetectorConsultasTests(TestCase):
+    URL = '/dashboard/api/solicitudes-correccion/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = CustomUser.objects.create(username='supervisor', rol=CustomUser.SUPERVISOR)
+        enfermero = CustomUser.objects.create(username='enfermero', rol=CustomUser.ENFERMERO)
+        generar_partos(6, usuarios=[enfermero])
+        for parto in RegistroParto.objects.all():
+            SolicitudCorreccion.objects.create(registro=parto, solicitado_por=enfermero, mensaje='Revisar peso')
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.supervisor)
+
+    def test_huella_ignora_valores(self):
+        self.assertEqual(
+            huella_sql('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s, %s, %s) AND "a"."n" = 10'),
+            huella_sql('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s) AND "a"."n" = 7'),
+        )
+        self.assertNotEqual(huella_sql('SELECT "a"."id" FROM "a"'), huella_sql('SELECT "b"."id" FROM "b"'))
+
+    def test_lista_sin_n_mas_1(self):
+        with self.assertNoLogs('sistema_hospital.instrumentacion', 'WARNING'):
+            respuesta = self.cliente.get(self.URL)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['results'][0]['solicitado_por']['username'], 'enfermero')
+
+    def test_n_mas_1_se_informa_y_excede_el_presupuesto(self):
+        with mock.patch.object(SolicitudCorreccionViewSet, 'planes_consultas', {}), \
+                self.assertLogs('sistema_hospital.instrumentacion', 'WARNING') as avisos, \
+                self.assertLogs('django.request', 'ERROR'), \
+                self.assertRaises(PresupuestoConsultasExcedido) as error:
+            self.cliente.get(self.URL)
+        self.assertIn('Posible N+1 en dashboard.api_views.SolicitudCorreccionViewSet.list: 6 sentencias', avisos.output[0])
+        self.assertIn('rest_framework', avisos.output[0])  # la pila llega al campo del serializer
+        self.assertIn('su presupuesto es 2', str(error.exception))
+
+    @override_settings(INSTRUMENTACION_CONSULTA_LENTA_MS=0)
+    def test_consulta_lenta_con_vista_y_pila(self):
+        with self.assertLogs('sistema_hospital.instrumentacion', 'WARNING') as avisos:
+            self.cliente.get(self.URL)
+        self.assertIn('Consulta lenta', avisos.output[0])
+        self.assertIn('SolicitudCorreccionViewSet.list', avisos.output[0])
+
+    def test_streaming_se_mide_hasta_agotar_el_stream(self):
+        url = '/dashboard/api/export/registros/?fecha_inicio=2000-01-01&fecha_fin=2100-12-31'
+        with mock.patch.object(registro, 'observar') as observar:
+            respuesta = self.cliente.get(url)
+            self.assertFalse(observar.called)
+            contenido = b''.join(respuesta.streaming_content)
+        medidas = {c.args[0]: c.args[2] for c in observar.call_args_list}
+        self.assertGreaterEqual(medidas['hospital_db_consultas'], 1)
+        self.assertEqual(medidas['hospital_respuesta_bytes'], len(contenido))
+
+    def test_streaming_respeta_el_presupuesto(self):
+        url = '/dashboard/api/export/registros/?fecha_inicio=2000-01-01&fecha_fin=2100-12-31'
+        with mock.patch.object(ExportRegistrosView, 'presupuesto_consultas', 0, create=True), \
+                self.assertRaises(PresupuestoConsultasExcedido):
+            b''.join(self.cliente.get(url).streaming_content)
+
+
+class VolcadoMetricasTests(SimpleTestCase):
+
+    def setUp(self):
+        parche = mock.patch('sistema_hospital.instrumentacion.atexit')  # el directorio no sobrevive al test
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_suma_los_volcados_de_cada_proceso(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        procesos = [Registro(), Registro()]
+        for numero, proceso in enumerate(procesos, 1):
+            proceso.incrementar('hospital_requests_total', endpoint='/x', codigo=200)
+            proceso.observar('hospital_request_segundos', (0.1, 1), numero / 2, endpoint='/x')
+            proceso.volcar(directorio)
+        texto = procesos[0].texto_prometheus(directorio)
+        self.assertIn('hospital_requests_total{codigo="200",endpoint="/x"} 2', texto)
+        self.assertIn('hospital_request_segundos_bucket{endpoint="/x",le="1"} 2', texto)
+        self.assertIn('hospital_request_segundos_sum{endpoint="/x"} 1.5', texto)
+
+    def test_volcado_espaciado_por_intervalo(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        proceso = Registro()
+        proceso.incrementar('hospital_requests_total')
+        proceso.volcar(directorio, intervalo=60)
+        proceso.incrementar('hospital_requests_total')
+        proceso.volcar(directorio, intervalo=60)
+        self.assertIn('hospital_requests_total 1', Registro().texto_prometheus(directorio))
+
+
+@ajustes_prueba
+class TableroSupervisorTests(TestCase):
+    URL = '/dashboard/api/supervisor_dashboard_stats/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = CustomUser.objects.create(username='supervisor', rol=CustomUser.SUPERVISOR)
+        cls.enfermero = CustomUser.objects.create(username='enfermero', rol=CustomUser.ENFERMERO)
+        generar_partos(8, usuarios=[cls.enfermero])
+        for parto in RegistroParto.objects.all()[:6]:
+            SolicitudCorreccion.objects.create(registro=parto, solicitado_por=cls.enfermero)
+
+    def setUp(self):
+        caches['compartida'].clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.supervisor)
+
+    def test_consultas_cache_y_304(self):
+        with self.assertNumQueries(2):
+            respuesta = self.cliente.get(self.URL)
+        datos = respuesta.json()
+        self.assertEqual(datos['pending_corrections_count'], 6)
+        self.assertEqual(len(datos['latest_pending_corrections']), 5)
+        self.assertEqual(datos['latest_pending_corrections'][0]['solicitado_por'], 'enfermero')
+
+        with self.assertNumQueries(0):
+            no_modificado = self.cliente.get(self.URL, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(no_modificado.status_code, 304)
+
+    def test_escribir_una_solicitud_invalida(self):
+        etag = self.cliente.get(self.URL)['ETag']
+        SolicitudCorreccion.objects.create(registro=RegistroParto.objects.last(), solicitado_por=self.enfermero)
+        respuesta = self.cliente.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['pending_corrections_count'], 7)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+
+@ajustes_prueba
+class MadrePorRutTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = CustomUser.objects.create(username='doctor', rol=CustomUser.DOCTOR)
+        generar_partos(2, rut_inicial=12_345_678)
+        cls.madre, cls.repetida = Madre.objects.order_by('rut_cuerpo')
+        # Como lo deja la migración 0012: un RUT antiguo repetido en otra forma queda sin cuerpo.
+        Madre.objects.filter(pk=cls.repetida.pk).update(rut='12.345.678-5', rut_cuerpo=None, rut_dv='')
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.doctor)
+
+    def test_busca_en_cualquier_formato(self):
+        for rut in ('12.345.678-5', '12345678-5', '123456785'):
+            respuesta = self.cliente.get(f'/dashboard/api/madres/rut/{rut}/')
+            self.assertEqual(respuesta.status_code, 200, rut)
+            self.assertEqual(respuesta.json()['id'], self.madre.pk)
+
+    def test_rut_invalido_o_inexistente(self):
+        self.assertEqual(self.cliente.get('/dashboard/api/madres/rut/12.345.678-4/').status_code, 400)
+        self.assertEqual(self.cliente.get('/dashboard/api/madres/rut/11.111.111-1/').status_code, 404)
+
+    def test_alta_de_madre_con_rut_antiguo_repetido(self):
+        respuesta = self.cliente.post(f'/dashboard/api/madres/{self.repetida.pk}/dar_alta/')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertIsNone(Madre.objects.get(pk=self.repetida.pk).rut_cuerpo)
+
+
+class CacheDocumentosTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+
+    def _en_disco(self):
+        return sum(e.stat().st_size for sub in os.scandir(self.directorio) for e in os.scandir(sub.path))
+
+    def test_solo_recorre_el_disco_al_pasar_el_maximo(self):
+        cache = CacheDocumentos(self.directorio, 10_000, 0, intervalo_recuento=3600)
+        with mock.patch.object(cache, '_recortar_disco', wraps=cache._recortar_disco) as recortar:
+            for numero in range(10):
+                cache.guardar(f'{numero:064x}', b'x' * 1000)
+            self.assertEqual(recortar.call_count, 1)  # el recuento inicial
+            cache.guardar(f'{10:064x}', b'x' * 1000)
+            self.assertEqual(recortar.call_count, 2)
+            self.assertEqual(self._en_disco(), 9000)
+            cache.guardar(f'{11:064x}', b'x' * 1000)
+            self.assertEqual(recortar.call_count, 2)
+
+    def test_recuenta_lo_escrito_por_otros_procesos(self):
+        cache = CacheDocumentos(self.directorio, 10_000, 0, intervalo_recuento=0)
+        otro = CacheDocumentos(self.directorio, 10_000, 0, intervalo_recuento=3600)
+        for numero in range(12):
+            (cache if numero % 2 else otro).guardar(f'{numero:064x}', b'x' * 1000)
+        self.assertLessEqual(self._en_disco(), 10_000)
+
+
+@override_settings(COMPROBANTES_LOTE_WORKERS=2)
+class LoteComprobantesTests(SimpleTestCase):
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        self.cache = CacheDocumentos(directorio, 10 * 1024 * 1024, 1024 * 1024)
+        for objetivo, valor in (
+            ('cache_documentos', lambda: self.cache),
+            ('pdf_comprobante', lambda datos: f"pdf {datos['id']}".encode()),
+        ):
+            parche = mock.patch.object(lote_comprobantes, objetivo, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.datos = [{'id': i} for i in range(10)]
+
+    def test_los_aciertos_se_leen_al_entregarlos(self):
+        for datos in self.datos[:5]:
+            self.cache.guardar(clave_documento('comprobante', datos), b'cacheado')
+        with mock.patch.object(self.cache, 'leer', wraps=self.cache.leer) as leer:
+            generador = lote_comprobantes.renderizar_comprobantes(self.datos)
+            primero = next(generador)
+            self.assertEqual(leer.call_count, 1)
+            resto = list(generador)
+        self.assertEqual([pdf for _, pdf in [primero, *resto]], [b'cacheado'] * 5 + [f'pdf {i}'.encode() for i in range(5, 10)])
+
+    def test_pool_caido_termina_en_el_proceso_web(self):
+        class PoolRoto:
+            def map(self, funcion, datos, chunksize):
+                yield funcion(datos[0])
+                raise BrokenProcessPool
+
+        @contextmanager
+        def pool_roto():
+            yield PoolRoto()
+
+        with mock.patch.object(lote_comprobantes, '_pool_procesos', pool_roto), \
+                mock.patch.object(lote_comprobantes, '_descartar') as descartar, \
+                self.assertLogs('dashboard.lote_comprobantes', 'ERROR'):
+            pdfs = [pdf for _, pdf in lote_comprobantes.renderizar_comprobantes(self.datos)]
+        self.assertEqual(pdfs, [f'pdf {i}'.encode() for i in range(10)])
+        descartar.assert_called_once()
+
+
+@ajustes_prueba
+class BusquedaMadresTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        def madre(cuerpo, nombre):
+            dv = digito_verificador(cuerpo)
+            return Madre(rut=f'{cuerpo}-{dv}', rut_cuerpo=cuerpo, rut_dv=dv, nombre=nombre, fecha_nacimiento=date(1990, 1, 1))
+
+        # La mejor coincidencia es la más antigua, detrás de 2.100 más nuevas.
+        cls.mejor = Madre.objects.create(rut='15.000.000-9', nombre='Sepúlveda Sepúlveda', fecha_nacimiento=date(1990, 1, 1))
+        Madre.objects.bulk_create(
+            [madre(16_000_000 + i, f'Josefa Sepúlveda Muñoz {i}') for i in range(2100)]
+            + [madre(17_000_000 + i, f'Ana Contreras {i}') for i in range(30)],
+        )
+
+    def test_ranking_sobre_todas_las_coincidencias(self):
+        self.assertEqual(buscar_madres('sepulveda', 1), [self.mejor])
+
+    def test_filtro_sin_tope(self):
+        self.assertEqual(filtrar_madres(Madre.objects.all(), 'sepulveda').count(), 2101)
+        self.assertEqual(filtrar_madres(Madre.objects.all(), 'Contreras').count(), 30)
+        self.assertEqual(list(filtrar_madres(Madre.objects.all(), '15.000.000-9')), [self.mejor])
+        self.assertEqual(filtrar_madres(Madre.objects.all(), '160000').count(), 100)
+
+    def test_vista_acota_el_limite(self):
+        cliente = APIClient()
+        cliente.force_authenticate(CustomUser.objects.create(username='supervisor', rol=CustomUser.SUPERVISOR))
+        with mock.patch('dashboard.api_views.buscar_partos', return_value=[]) as partos, \
+                mock.patch('dashboard.api_views.buscar_madres', wraps=buscar_madres) as madres:
+            respuesta = cliente.get('/dashboard/api/busqueda/', {'q': 'sepulveda', 'limite': 100_000})
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(madres.call_args.args[1], LIMITE_MAXIMO)
+        self.assertEqual(partos.call_args.args[1], LIMITE_MAXIMO)
+        self.assertEqual(len(respuesta.json()['madres']), LIMITE_MAXIMO)
+        self.assertEqual(respuesta.json()['madres'][0]['id'], self.mejor.pk)
+
+    def test_admin_filtra_con_el_indice(self):
+        modelo_admin = admin.site._registry[Madre]
+        queryset, duplicados = modelo_admin.get_search_results(None, Madre.objects.all(), 'josefa')
+        self.assertFalse(duplicados)
+        self.assertEqual(queryset.count(), 2100)
+        # Subconsulta sobre el índice, no una lista de ids ya truncada.
+        partos = admin.site._registry[RegistroParto].get_search_results(None, RegistroParto.objects.all(), 'sepulveda')[0]
+        self.assertIn('IN (SELECT', str(partos.query))
+
+
+@ajustes_prueba
+class ResumenREMTests(TestCase):
+    """El REM desde ResumenDiarioREM (mantenido por dashboard.signals) debe coincidir con el cálculo directo."""
+    DESDE = date(2024, 3, 1)
+    HASTA = date(2024, 3, 10)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.inicio = timezone.make_aware(datetime.combine(cls.DESDE, datetime.min.time()))
+        cls.fin = timezone.make_aware(datetime.combine(cls.HASTA, datetime.max.time()))
+        generar_partos(30, desde=cls.inicio, hasta=cls.fin, rut_inicial=40_000_000)
+        recalcular_resumen(cls.DESDE, cls.HASTA)
+        cls.cesarea = TipoParto.objects.get(nombre='Cesárea de Urgencia')
+
+    def _fecha(self, dia, hora=10):
+        return timezone.make_aware(datetime(2024, 3, dia, hora))
+
+    def assertRemCoincide(self, fecha_inicio=None, fecha_fin=None, desde_resumen=True):
+        fecha_inicio, fecha_fin = fecha_inicio or self.inicio, fecha_fin or self.fin
+        directo = calcular_datos_rem_directo(fecha_inicio, fecha_fin)
+        with mock.patch('dashboard.rem.calcular_datos_rem_directo', wraps=calcular_datos_rem_directo) as espia:
+            self.assertEqual(calcular_datos_rem(fecha_inicio, fecha_fin), directo)
+        # Sin la espía no se sabría si el resultado salió del resumen o del respaldo directo.
+        self.assertEqual(espia.called, not desde_resumen)
+
+    def _crear_parto(self, dia=5, **campos):
+        with self.captureOnCommitCallbacks(execute=True):
+            madre = Madre.objects.create(rut='15.000.000-9', nombre='Ana Soto', fecha_nacimiento=date(2008, 5, 1))
+            parto = RegistroParto.objects.create(
+                madre=madre, fecha_parto=self._fecha(dia), edad_gestacional_semanas=36,
+                tipo_parto=self.cesarea, uso_oxitocina=True, **campos,
+            )
+            rn = RecienNacido.objects.create(
+                parto_asociado=parto, sexo='F', peso_grs=1400, talla_cm=40, apgar_1_min=3, apgar_5_min=6,
+                reanimacion='basica', alimentacion_alta='LME',
+            )
+        return madre, parto, rn
+
+    def test_resumen_inicial(self):
+        self.assertRemCoincide()
+
+    def test_crear(self):
+        self._crear_parto()
+        self.assertRemCoincide()
+        self.assertEqual(ResumenDiarioREM.objects.get(fecha=date(2024, 3, 5)).pretermino,
+                         RegistroParto.objects.filter(fecha_parto__date=date(2024, 3, 5), edad_gestacional_semanas__lt=37).count())
+
+    def test_editar_fecha_del_parto(self):
+        madre, parto, rn = self._crear_parto(dia=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            parto.fecha_parto = self._fecha(8)
+            parto.save()
+        # Se recalculan el día de origen y el de destino.
+        self.assertRemCoincide()
+        self.assertRemCoincide(self._fecha(5, 0), timezone.make_aware(datetime(2024, 3, 5, 23, 59, 59)))
+        self.assertRemCoincide(self._fecha(8, 0), timezone.make_aware(datetime(2024, 3, 8, 23, 59, 59)))
+
+    def test_editar_recien_nacido(self):
+        madre, parto, rn = self._crear_parto()
+        with self.captureOnCommitCallbacks(execute=True):
+            rn.peso_grs = 4100
+            rn.sexo = 'M'
+            rn.save()
+        self.assertRemCoincide()
+
+    def test_defunciones(self):
+        madre, parto, rn = self._crear_parto(dia=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            madre.fallecida, madre.fecha_fallecimiento = True, self._fecha(3)
+            madre.save()
+            rn.fallecido, rn.fecha_fallecimiento = True, self._fecha(9)
+            rn.save()
+        self.assertRemCoincide()
+        self.assertEqual(ResumenDiarioREM.objects.get(fecha=date(2024, 3, 3)).mort_materna, 1)
+        self.assertEqual(ResumenDiarioREM.objects.get(fecha=date(2024, 3, 9)).mort_neonatal, 1)
+
+        # Corregir la fecha de defunción saca la muerte del día anterior.
+        with self.captureOnCommitCallbacks(execute=True):
+            madre.fecha_fallecimiento = self._fecha(4)
+            madre.save()
+            rn.fallecido, rn.fecha_fallecimiento = False, None
+            rn.save()
+        self.assertRemCoincide()
+        self.assertEqual(ResumenDiarioREM.objects.get(fecha=date(2024, 3, 3)).mort_materna, 0)
+        self.assertEqual(ResumenDiarioREM.objects.get(fecha=date(2024, 3, 9)).mort_neonatal, 0)
+
+    def test_eliminar(self):
+        madre, parto, rn = self._crear_parto()
+        with self.captureOnCommitCallbacks(execute=True):
+            rn.delete()
+        self.assertRemCoincide()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            parto.delete()
+        self.assertRemCoincide()
+
+    def test_eliminar_madre_en_cascada(self):
+        madre, parto, rn = self._crear_parto(dia=6)
+        with self.captureOnCommitCallbacks(execute=True):
+            madre.fallecida, madre.fecha_fallecimiento = True, self._fecha(7)
+            madre.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            madre.delete()
+        self.assertRemCoincide()
+
+    def test_dia_sin_resumen_usa_calculo_directo(self):
+        ResumenDiarioREM.objects.filter(fecha=date(2024, 3, 4)).delete()
+        self.assertRemCoincide(desde_resumen=False)
+
+    def test_rango_sin_dias_completos_usa_calculo_directo(self):
+        self.assertRemCoincide(self._fecha(1, 8), self.fin, desde_resumen=False)
+        self.assertRemCoincide(self.inicio, self._fecha(10, 12), desde_resumen=False)
+
+    def test_carga_masiva_requiere_recalcular(self):
+        # bulk_create no dispara señales: quien carga en lote recalcula el periodo.
+        generar_partos(10, semilla=3, desde=self.inicio, hasta=self.fin, rut_inicial=41_000_000)
+        self.assertNotEqual(calcular_datos_rem(self.inicio, self.fin)['a'], calcular_datos_rem_directo(self.inicio, self.fin)['a'])
+        recalcular_resumen(self.DESDE, self.HASTA)
+        self.assertRemCoincide()
+
+
+def _rem_por_secciones(fecha_inicio, fecha_fin):
+    """Cálculo previo del REM A.24 (una consulta por sección), como referencia para el recorrido único de dashboard.rem."""
+    partos_q = RegistroParto.objects.filter(fecha_parto__range=(fecha_inicio, fecha_fin))
+    rn_q = RecienNacido.objects.filter(parto_asociado__in=partos_q)
+    seccion_a = partos_q.aggregate(
+        total_partos=Count('id'),
+        vaginal_espontaneo=Count('id', filter=Q(tipo_parto__nombre__icontains='Espontáneo')),
+        vaginal_instrumental=Count('id', filter=Q(tipo_parto__nombre__icontains='Instrumental')),
+        cesarea_electiva=Count('id', filter=Q(tipo_parto__nombre='Cesárea Electiva')),
+        cesarea_urgencia=Count('id', filter=Q(tipo_parto__nombre='Cesárea de Urgencia')),
+        con_oxitocina=Count('id', filter=Q(uso_oxitocina=True)),
+        con_ligadura_tardia=Count('id', filter=Q(ligadura_tardia_cordon=True)),
+        con_piel_a_piel=Count('id', filter=Q(contacto_piel_a_piel=True)),
+        pretermino=Count('id', filter=Q(edad_gestacional_semanas__lt=37)),
+        termino=Count('id', filter=Q(edad_gestacional_semanas__gte=37, edad_gestacional_semanas__lte=41)),
+        posttermino=Count('id', filter=Q(edad_gestacional_semanas__gte=42)),
+    )
+
+    madres = Madre.objects.filter(id__in=partos_q.values_list('madre_id', flat=True))
+    edades = [fecha_inicio.year - m.fecha_nacimiento.year for m in madres]
+    seccion_demografia = {
+        'adolescente': sum(edad < 18 for edad in edades),
+        'adulta': sum(18 <= edad < 35 for edad in edades),
+        'anosa': sum(edad >= 35 for edad in edades),
+        'chilena': madres.filter(nacionalidad='Chilena').count(),
+        'extranjera': madres.exclude(nacionalidad='Chilena').count(),
+        'pueblo_originario': madres.filter(pertenece_pueblo_originario=True).count(),
+    }
+
+    seccion_d1 = rn_q.aggregate(
+        total_rn=Count('id'),
+        peso_menor_1500=Count('id', filter=Q(peso_grs__lt=1500)),
+        peso_1500_2499=Count('id', filter=Q(peso_grs__gte=1500, peso_grs__lte=2499)),
+        peso_2500_3999=Count('id', filter=Q(peso_grs__gte=2500, peso_grs__lte=3999)),
+        peso_mayor_4000=Count('id', filter=Q(peso_grs__gte=4000)),
+        p_lt_500=Count('id', filter=Q(peso_grs__lt=500)),
+        p_500_999=Count('id', filter=Q(peso_grs__gte=500, peso_grs__lte=999)),
+        p_1000_1499=Count('id', filter=Q(peso_grs__gte=1000, peso_grs__lte=1499)),
+        p_1500_1999=Count('id', filter=Q(peso_grs__gte=1500, peso_grs__lte=1999)),
+        p_2000_2499=Count('id', filter=Q(peso_grs__gte=2000, peso_grs__lte=2499)),
+        p_2500_2999=Count('id', filter=Q(peso_grs__gte=2500, peso_grs__lte=2999)),
+        p_3000_3999=Count('id', filter=Q(peso_grs__gte=3000, peso_grs__lte=3999)),
+        p_gte_4000=Count('id', filter=Q(peso_grs__gte=4000)),
+        con_anomalia=Count('id', filter=Q(anomalia_congenita=True)),
+        sexo_m=Count('id', filter=Q(sexo='M')),
+        sexo_f=Count('id', filter=Q(sexo='F')),
+        sexo_i=Count('id', filter=Q(sexo='I')),
+    )
+
+    seccion_d2 = rn_q.aggregate(
+        profilaxis_ocular=Count('id', filter=Q(profilaxis_ocular=True)),
+        profilaxis_hepb=Count('id', filter=Q(vacuna_hepatitis_b=True)),
+        rn_vaginal=Count('id', filter=Q(parto_asociado__tipo_parto__nombre__icontains='Espontáneo')),
+        rn_instrumental=Count('id', filter=Q(parto_asociado__tipo_parto__nombre__icontains='Instrumental')),
+        rn_cesarea=Count('id', filter=Q(parto_asociado__tipo_parto__nombre__icontains='Cesárea')),
+        apgar_1_critico=Count('id', filter=Q(apgar_1_min__lte=3)),
+        apgar_5_critico=Count('id', filter=Q(apgar_5_min__lte=6)),
+        reanimacion_basica=Count('id', filter=Q(reanimacion='basica')),
+        reanimacion_avanzada=Count('id', filter=Q(reanimacion='avanzada')),
+    )
+
+    es_migrante = ~Q(parto_asociado__madre__nacionalidad='Chilena') & Q(parto_asociado__madre__nacionalidad__isnull=False)
+    es_pueblo = Q(parto_asociado__madre__pertenece_pueblo_originario=True)
+    seccion_e = rn_q.aggregate(
+        lme_total=Count('id', filter=Q(alimentacion_alta='LME')),
+        mixta_total=Count('id', filter=Q(alimentacion_alta='LMixta')),
+        formula_total=Count('id', filter=Q(alimentacion_alta='Formula')),
+        lme_migrante=Count('id', filter=Q(alimentacion_alta='LME') & es_migrante),
+        mixta_migrante=Count('id', filter=Q(alimentacion_alta='LMixta') & es_migrante),
+        formula_migrante=Count('id', filter=Q(alimentacion_alta='Formula') & es_migrante),
+        lme_pueblo=Count('id', filter=Q(alimentacion_alta='LME') & es_pueblo),
+        mixta_pueblo=Count('id', filter=Q(alimentacion_alta='LMixta') & es_pueblo),
+        formula_pueblo=Count('id', filter=Q(alimentacion_alta='Formula') & es_pueblo),
+    )
+
+    seccion_mortalidad = {
+        'materna': Madre.objects.filter(fallecida=True, fecha_fallecimiento__range=(fecha_inicio, fecha_fin)).count(),
+        'neonatal': RecienNacido.objects.filter(fallecido=True, fecha_fallecimiento__range=(fecha_inicio, fecha_fin)).count(),
+    }
+    return {'a': seccion_a, 'demo': seccion_demografia, 'd1': seccion_d1, 'd2': seccion_d2,
+            'e': seccion_e, 'mort': seccion_mortalidad}
+
+
+@ajustes_prueba
+class RemRecorridoUnicoTests(TestCase):
+    """El recorrido único de dashboard.rem da los mismos conteos que las consultas por sección."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.inicio = timezone.make_aware(datetime(2024, 1, 1))
+        cls.fin = timezone.make_aware(datetime(2024, 12, 31, 23, 59, 59))
+        generar_partos(80, desde=cls.inicio, hasta=cls.fin, rut_inicial=42_000_000)
+        cesarea, espontaneo = TipoParto.objects.get(pk=5), TipoParto.objects.get(pk=1)
+
+        def rn(parto, **campos):
+            campos = {'sexo': 'F', 'peso_grs': 3200, 'talla_cm': 49, 'apgar_1_min': 8, 'apgar_5_min': 9,
+                      'alimentacion_alta': 'LME', **campos}
+            return RecienNacido.objects.create(parto_asociado=parto, **campos)
+
+        # Madre con varios partos (y gemelos) en el periodo: cuenta una vez en la demografía.
+        repetida = Madre.objects.create(rut='15.000.000-9', nombre='Ana Soto', fecha_nacimiento=date(2008, 5, 1),
+                                        nacionalidad='Haitiana', pertenece_pueblo_originario=True)
+        for mes, tipo in ((2, cesarea), (11, espontaneo)):
+            parto = RegistroParto.objects.create(madre=repetida, fecha_parto=timezone.make_aware(datetime(2024, mes, 3)),
+                                                 edad_gestacional_semanas=36, tipo_parto=tipo)
+            rn(parto, sexo='M', peso_grs=2100)
+            rn(parto, alimentacion_alta='LMixta', fallecido=True, fecha_fallecimiento=timezone.make_aware(datetime(2024, mes, 4)))
+
+        # Madre fallecida sin nacionalidad registrada.
+        sin_nacionalidad = Madre.objects.create(
+            rut='11.111.111-1', nombre='Sin Nacionalidad', fecha_nacimiento=date(1985, 1, 1), nacionalidad=None,
+            fallecida=True, fecha_fallecimiento=timezone.make_aware(datetime(2024, 6, 2)),
+        )
+        parto = RegistroParto.objects.create(madre=sin_nacionalidad, fecha_parto=timezone.make_aware(datetime(2024, 6, 1)),
+                                             edad_gestacional_semanas=42)
+        rn(parto, alimentacion_alta='Formula', apgar_1_min=2, apgar_5_min=5, reanimacion='avanzada')
+
+        # La misma madre tuvo además un parto (y una muerte neonatal) antes del periodo.
+        parto = RegistroParto.objects.create(madre=repetida, fecha_parto=timezone.make_aware(datetime(2023, 12, 20)),
+                                             edad_gestacional_semanas=39)
+        rn(parto, fallecido=True, fecha_fallecimiento=timezone.make_aware(datetime(2023, 12, 21)))
+
+    def test_mismos_conteos_que_por_seccion(self):
+        esperado = _rem_por_secciones(self.inicio, self.fin)
+        self.assertEqual(calcular_datos_rem_directo(self.inicio, self.fin), esperado)
+        self.assertEqual(esperado['mort'], {'materna': 1, 'neonatal': 2})
+
+    def test_periodo_parcial(self):
+        fin = timezone.make_aware(datetime(2024, 6, 1, 12))
+        self.assertEqual(calcular_datos_rem_directo(self.inicio, fin), _rem_por_secciones(self.inicio, fin))
+
+
+@ajustes_prueba
+class PaginacionCursorTests(TestCase):
+    """?paginacion=cursor (sistema_hospital.paginacion) sobre claves de orden repetidas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = CustomUser.objects.create(username='supervisor', rol=CustomUser.SUPERVISOR)
+        generar_partos(40, usuarios=[cls.supervisor])
+        # Solo tres fechas distintas: cada empate cruza el borde de una página de 15.
+        fechas = [timezone.make_aware(datetime(2024, 5, dia, 8)) for dia in (1, 2, 3)]
+        for i, pk in enumerate(RegistroParto.objects.order_by('pk').values_list('pk', flat=True)):
+            RegistroParto.objects.filter(pk=pk).update(fecha_parto=fechas[i % 3])
+        # Gemelos: el orden por parto_asociado__fecha_parto también empata dentro de un mismo parto.
+        for rn in RecienNacido.objects.order_by('pk')[:5]:
+            rn.pk = None
+            rn.save()
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.supervisor)
+
+    def _recorrer(self, url):
+        ids, paginas = [], 0
+        # Sin avisos de N+1 del detector (sistema_hospital.instrumentacion) al armar los enlaces.
+        with CaptureQueriesContext(connection) as consultas, self.assertNoLogs('sistema_hospital.instrumentacion', 'WARNING'):
+            while url:
+                datos = self.cliente.get(url).json()
+                self.assertNotIn('count', datos)
+                ids += [fila['id'] for fila in datos['results']]
+                url, paginas = datos['next'], paginas + 1
+        self.assertFalse([c['sql'] for c in consultas.captured_queries if 'COUNT(' in c['sql'].upper()])
+        return ids, paginas
+
+    def test_cursor_sin_repetir_ni_saltar_filas(self):
+        for url, modelo in (
+            ('/dashboard/api/registros-parto/?paginacion=cursor', RegistroParto),
+            ('/dashboard/api/recien-nacidos/?paginacion=cursor', RecienNacido),
+        ):
+            with self.subTest(url=url):
+                ids, paginas = self._recorrer(url)
+                self.assertEqual(sorted(ids), sorted(modelo.objects.values_list('pk', flat=True)))
+                self.assertEqual(paginas, -(-modelo.objects.count() // 15))
+
+    def test_numero_de_pagina_sin_cambios(self):
+        datos = self.cliente.get('/dashboard/api/registros-parto/?page=2').json()
+        self.assertEqual(datos['count'], 40)
+        self.assertIn('page=3', datos['next'])
+        self.assertEqual(len(datos['results']), 15)
+        esperados = list(RegistroParto.objects.order_by('-fecha_parto').values_list('pk', flat=True)[15:30])
+        self.assertEqual(len(set(esperados) & {fila['id'] for fila in datos['results']}), 15)
+
+
+@ajustes_prueba
+class ExportesTests(TestCase):
+    """Contenido de las exportaciones (dashboard.exportes), leído de vuelta, con lotes de 3 filas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.inicio = timezone.make_aware(datetime(2024, 4, 1))
+        cls.fin = timezone.make_aware(datetime(2024, 4, 30, 23, 59, 59))
+        generar_partos(6, desde=cls.inicio, hasta=cls.fin, rut_inicial=43_000_000)
+        generar_partos(2, semilla=5, desde=cls.fin + timedelta(days=1), rut_inicial=44_000_000)
+
+        # Sin nacionalidad ni complicaciones, con gemelos y uno de ellos con alta.
+        madre = Madre.objects.create(rut='15.000.000-9', nombre='Ana Soto', fecha_nacimiento=date(1990, 2, 3))
+        parto = RegistroParto.objects.create(madre=madre, fecha_parto=timezone.make_aware(datetime(2024, 4, 10, 9, 30)),
+                                             edad_gestacional_semanas=37)
+        for peso, fecha_alta in ((2400, timezone.make_aware(datetime(2024, 4, 12, 15))), (2300, None)):
+            RecienNacido.objects.create(parto_asociado=parto, sexo='M', peso_grs=peso, talla_cm='46.5',
+                                        apgar_1_min=8, apgar_5_min=9, anomalia_congenita=peso == 2300, fecha_alta=fecha_alta)
+        # Un parto sin RN: sale en la exportación analítica con las columnas rn_* vacías.
+        RegistroParto.objects.create(madre=madre, fecha_parto=timezone.make_aware(datetime(2024, 4, 20, 22)),
+                                     edad_gestacional_semanas=40)
+
+    def setUp(self):
+        parche = mock.patch('dashboard.exportes.TAMANO_LOTE', 3)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_excel(self):
+        libro = load_workbook(generar_excel_registros(self.inicio, self.fin), read_only=True)
+        self.addCleanup(libro.close)
+        filas = list(libro.active.iter_rows(values_only=True))
+
+        self.assertEqual(list(filas[0]), [encabezado for encabezado, _, _ in COLUMNAS_EXCEL])
+        esperadas = [
+            (rn.parto_asociado.madre.rut, f'{rn.parto_asociado.fecha_parto:%d/%m/%Y}', rn.peso_grs, rn.apgar_1_min,
+             rn.apgar_5_min, rn.get_reanimacion_display(), 'SI' if rn.anomalia_congenita else 'NO', rn.get_alimentacion_alta_display())
+            for rn in RecienNacido.objects.filter(parto_asociado__fecha_parto__range=(self.inicio, self.fin))
+            .select_related('parto_asociado__madre')
+        ]
+        self.assertGreater(len(esperadas), 6)
+        self.assertEqual(sorted(filas[1:]), sorted(esperadas))
+        fechas = [datetime.strptime(fila[1], '%d/%m/%Y') for fila in filas[1:]]
+        self.assertEqual(fechas, sorted(fechas))
+
+    def _esperadas(self):
+        """Una fila por RN (o una con rn_* vacías si el parto no tiene), en el orden de la exportación."""
+        filas = []
+        partos = (RegistroParto.objects.filter(fecha_parto__range=(self.inicio, self.fin))
+                  .select_related('madre').prefetch_related('recien_nacidos').order_by('fecha_parto', 'id'))
+        for parto in partos:
+            for rn in sorted(parto.recien_nacidos.all(), key=lambda rn: rn.pk) or [None]:
+                filas.append({
+                    'parto_id': parto.pk, 'fecha_parto': parto.fecha_parto,
+                    'madre_nacionalidad': parto.madre.nacionalidad, 'madre_fecha_nacimiento': parto.madre.fecha_nacimiento,
+                    'complicaciones': parto.complicaciones_texto,
+                    'rn_id': rn and rn.pk, 'rn_talla_cm': rn and rn.talla_cm, 'rn_fecha_alta': rn and rn.fecha_alta,
+                })
+        return filas
+
+    def test_csv(self):
+        columnas = list(COLUMNAS_EXPORT)
+        partes = list(stream_csv(self.inicio, self.fin, columnas))
+        filas = list(csv.DictReader(io.StringIO(b''.join(partes).decode('utf-8'))))
+        esperadas = self._esperadas()
+
+        # Encabezado y luego un trozo por lote.
+        self.assertEqual(list(filas[0]), columnas)
+        self.assertEqual(len(partes), 1 + -(-len(esperadas) // 3))
+        def texto(valor):
+            # Vacío para los nulos; fechas en ISO 8601.
+            if valor is None:
+                return ''
+            return valor.isoformat() if hasattr(valor, 'isoformat') else str(valor)
+
+        self.assertEqual(
+            [{c: fila[c] for c in esperada} for fila, esperada in zip(filas, esperadas)],
+            [{c: texto(v) for c, v in esperada.items()} for esperada in esperadas],
+        )
+        self.assertEqual(len(filas), len(esperadas))
+
+    def test_csv_columnas_pedidas(self):
+        contenido = b''.join(stream_csv(self.inicio, self.fin, ['rn_id', 'parto_id'])).decode('utf-8')
+        self.assertEqual(contenido.splitlines()[0], 'rn_id,parto_id')
+
+    def test_parquet(self):
+        import pyarrow.parquet as pq
+
+        columnas = list(COLUMNAS_EXPORT)
+        archivo = pq.ParquetFile(io.BytesIO(b''.join(stream_parquet(self.inicio, self.fin, columnas))))
+        esperadas = self._esperadas()
+
+        self.assertEqual(archivo.schema_arrow.names, columnas)
+        self.assertEqual(archivo.metadata.num_row_groups, -(-len(esperadas) // 3))
+        filas = archivo.read().to_pylist()
+        self.assertEqual(
+            [{c: fila[c] for c in esperada} for fila, esperada in zip(filas, esperadas)],
+            [{**esperada, 'rn_talla_cm': esperada['rn_talla_cm'] and float(esperada['rn_talla_cm'])} for esperada in esperadas],
+        )
+        self.assertEqual(len(filas), len(esperadas))
@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .documentos import pdf_rem, pdf_comprobante, pdf_certificado, datos_comprobante, datos_certificado
+from .cache_documentos import documento_cacheado
+from .exportes import generar_excel_registros
+from cuentas.models import CustomUser
+from .models import Madre, RegistroParto, RecienNacido, TrabajoReporte
+from .rem import calcular_datos_rem
+
+
+# Tipos que requieren rol supervisor (los mismos que sus endpoints síncronos).
+TIPOS_SUPERVISOR = {'rem_pdf', 'registros_excel'}
+# Tipos que solo se encolan desde su propio endpoint (con el archivo subido), no por /trabajos-reporte/.
+TIPOS_INTERNOS = {'importacion_partos'}
+
+
+def _rango(parametros):
+    fi = datetime.strptime(parametros['fecha_inicio'], '%Y-%m-%d')
+    ff = datetime.strptime(parametros['fecha_fin'], '%Y-%m-%d').replace(hour=23, minute=59, second=59)
+    return fi, ff
+
+
+def _paciente_fallecido(parametros):
+    if parametros.get('tipo_paciente') == 'madre':
+        return Madre.objects.get(pk=parametros['pk'], fallecida=True)
+    return RecienNacido.objects.get(pk=parametros['pk'], fallecido=True)
+
+
+def validar_parametros(tipo, parametros):
+    """Lanza ValueError si los parámetros no permiten generar el documento."""
+    try:
+        if tipo in ('rem_pdf', 'registros_excel'):
+            _rango(parametros)
+        elif tipo == 'comprobante_pdf':
+            RegistroParto.objects.only('id').get(pk=parametros['pk'])
+        elif tipo == 'certificado_defuncion_pdf':
+            if parametros.get('tipo_paciente') not in ('madre', 'rn'):
+                raise ValueError("tipo_paciente debe ser 'madre' o 'rn'")
+            _paciente_fallecido(parametros)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Parámetros inválidos: {e}")
+    except (RegistroParto.DoesNotExist, Madre.DoesNotExist, RecienNacido.DoesNotExist):
+        raise ValueError("El registro no existe o no corresponde a un paciente fallecido")
+
+
+def _rem_pdf(p, destino):
+    datos = {'rem': calcular_datos_rem(*_rango(p)), 'fecha_inicio': p['fecha_inicio'], 'fecha_fin': p['fecha_fin']}
+    destino.write(documento_cacheado('rem', datos, lambda d: pdf_rem(d['rem'], d['fecha_inicio'], d['fecha_fin'])))
+    return f"Informe_REM_A24_{p['fecha_inicio']}.pdf", 'application/pdf'
+
+
+def _registros_excel(p, destino):
+    with generar_excel_registros(*_rango(p)) as archivo:
+        shutil.copyfileobj(archivo, destino)
+    return 'reporte.xlsx', 'application/vnd.ms-excel'
+
+
+def _comprobante_pdf(p, destino):
+    parto = (
+        RegistroParto.objects
+        .select_related('madre', 'tipo_parto', 'tipo_analgesia', 'registrado_por')
+        .prefetch_related('recien_nacidos')
+        .get(pk=p['pk'])
+    )
+    destino.write(documento_cacheado('comprobante', datos_comprobante(parto), pdf_comprobante))
+    return f"Comprobante_Parto_{p['pk']}.pdf", 'application/pdf'
+
+
+def guardar_importacion(archivo, formato):
+    """Guarda un archivo subido en IMPORTACIONES_DIR y devuelve su nombre relativo."""
+    os.makedirs(settings.IMPORTACIONES_DIR, exist_ok=True)
+    nombre = f"{uuid.uuid4().hex}.{formato}"
+    ruta = os.path.join(settings.IMPORTACIONES_DIR, nombre)
+    with open(ruta + '.tmp', 'wb') as destino:
+        for bloque in archivo.chunks():
+            destino.write(bloque)
+    os.replace(ruta + '.tmp', ruta)
+    return nombre
+
+
+def _importacion_partos(p, destino):
+    from .importacion import importar  # importacion usa los serializers, que importan este módulo
+
+    ruta = os.path.join(settings.IMPORTACIONES_DIR, os.path.basename(p['archivo']))
+    try:
+        with open(ruta, 'rb') as archivo:
+            usuario = CustomUser.objects.filter(pk=p.get('usuario_id')).first()
+            resultado = importar(archivo, p['formato'], usuario=usuario, origen=p.get('origen', ''))
+    finally:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+    destino.write(json.dumps(resultado.como_dict(), ensure_ascii=False, indent=2).encode('utf-8'))
+    return f"Importacion_{os.path.splitext(p.get('origen') or 'partos')[0]}.json", 'application/json'
+
+
+def _certificado_defuncion_pdf(p, destino):
+    datos = datos_certificado(p['tipo_paciente'], _paciente_fallecido(p))
+    destino.write(documento_cacheado('certificado', datos, pdf_certificado))
+    return f"Certificado_Defuncion_{p['tipo_paciente']}_{p['pk']}.pdf", 'application/pdf'
+
+
+GENERADORES = {
+    'rem_pdf': _rem_pdf,
+    'registros_excel': _registros_excel,
+    'comprobante_pdf': _comprobante_pdf,
+    'certificado_defuncion_pdf': _certificado_defuncion_pdf,
+    'importacion_partos': _importacion_partos,
+}
+
+
+def ruta_archivo(trabajo):
+    return os.path.join(settings.REPORTES_DIR, trabajo.archivo)
+
+
+def reclamar_pendientes(limite):
+    """Marca hasta `limite` trabajos pendientes como en_proceso y devuelve sus (id, intento).
+
+    El UPDATE condicionado a estado='pendiente' hace que dos workers nunca tomen el mismo trabajo.
+    Cada reclamo lleva un `intento` nuevo: solo ese intento puede latir y dejar el resultado.
+    """
+    reclamados = []
+    candidatos = TrabajoReporte.objects.filter(estado='pendiente').order_by('timestamp_creacion').values_list('id', flat=True)
+    for pk in candidatos[:limite * 2]:
+        intento, ahora = uuid.uuid4(), timezone.now()
+        if TrabajoReporte.objects.filter(pk=pk, estado='pendiente').update(
+            estado='en_proceso', intento=intento, timestamp_inicio=ahora, timestamp_latido=ahora,
+        ):
+            reclamados.append((pk, intento))
+            if len(reclamados) == limite:
+                break
+    return reclamados
+
+
+def latir(intentos):
+    """Renueva el latido de los intentos que este worker sigue ejecutando."""
+    if not intentos:
+        return 0
+    return TrabajoReporte.objects.filter(estado='en_proceso', intento__in=list(intentos)).update(timestamp_latido=timezone.now())
+
+
+def liberar_colgados(minutos):
+    """Devuelve a la cola los trabajos en_proceso cuyo worker dejó de latir hace más de `minutos`."""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return TrabajoReporte.objects.filter(estado='en_proceso', timestamp_latido__lt=limite).update(estado='pendiente', intento=None)
+
+
+def _cerrar_intento(pk, intento, **campos):
+    # Solo si el intento sigue siendo el vigente: uno liberado y vuelto a reclamar no pisa al nuevo.
+    return TrabajoReporte.objects.filter(pk=pk, estado='en_proceso', intento=intento).update(
+        timestamp_fin=timezone.now(), **campos,
+    )
+
+
+def ejecutar_trabajo(pk, intento):
+    """Genera el documento de un trabajo ya reclamado (con `intento`) y lo deja en REPORTES_DIR."""
+    try:
+        trabajo = TrabajoReporte.objects.get(pk=pk)
+        os.makedirs(settings.REPORTES_DIR, exist_ok=True)
+        # El archivo es del intento: otro intento del mismo trabajo nunca escribe en él.
+        relativo = f"trabajo_{trabajo.pk}_{intento.hex}"
+        final = os.path.join(settings.REPORTES_DIR, relativo)
+        temporal = final + '.tmp'
+        try:
+            with open(temporal, 'wb') as destino:
+                nombre, content_type = GENERADORES[trabajo.tipo](trabajo.parametros, destino)
+            os.replace(temporal, final)
+        except Exception as e:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            return 'error' if _cerrar_intento(pk, intento, estado='error', error=str(e)) else 'descartado'
+
+        if not _cerrar_intento(
+            pk, intento, estado='completado', archivo=relativo, nombre_archivo=nombre, content_type=content_type, error=None,
+        ):
+            os.remove(final)
+            return 'descartado'
+        return 'completado'
+    finally:
+        connection.close()
@@ -16,6 +16,7 @@ router.register(r'solicitudes-correccion', api_views.SolicitudCorreccionViewSet,
 router.register(r'historial-altas', api_views.HistorialAltasViewSet, basename='historial-altas')
 router.register(r'historial-altas-madres', api_views.HistorialAltasMadresViewSet, basename='historial-altas-madres')
 router.register(r'altas-validadas', api_views.RecienNacidosAltaValidadaViewSet, basename='altas-validadas')
+router.register(r'trabajos-reporte', api_views.TrabajoReporteViewSet, basename='trabajo-reporte')
 
 urlpatterns = [
     path('admin/', views.dashboard_admin, name='dashboard_admin'),
@@ -25,8 +26,12 @@ urlpatterns = [
     path('api/reportes/rem/', api_views.ReporteREMView.as_view(), name='api-reporte-rem'),
     path('api/reportes/rem/pdf/', api_views.ExportReporteREMPDFView.as_view(), name='api-reporte-rem-pdf'),
     path('api/export/excel/', api_views.ExportRegistrosExcelView.as_view(), name='api-export-excel'),
+    path('api/export/registros/', api_views.ExportRegistrosView.as_view(), name='api-export-registros'),
     path('api/supervisor_dashboard_stats/', api_views.supervisor_dashboard_stats, name='api_supervisor_dashboard_stats'),
     path('api/comprobante/<int:pk>/pdf/', api_views.GenerarComprobantePDF.as_view(), name='comprobante_pdf'),
+    path('api/comprobantes/lote/', api_views.ComprobantesLoteView.as_view(), name='comprobantes_lote'),
+    path('api/importacion/partos/', api_views.ImportacionPartosView.as_view(), name='api-importacion-partos'),
+    path('api/busqueda/', api_views.BusquedaView.as_view(), name='api-busqueda'),
     path('api/defunciones/', api_views.DefuncionesViewSet.as_view(), name='api-defunciones'),
     path('api/certificado-defuncion/<str:tipo_paciente>/<int:pk>/pdf/', api_views.GenerarCertificadoDefuncionPDF.as_view(), name='certificado_defuncion_pdf'),
 ]
\ No newline at end of file
@@ -0,0 +1,496 @@
+import atexit
+import cProfile
+import functools
+import json
+import logging
+import os
+import random
+import re
+import sysconfig
+import threading
+import time
+import traceback
+import uuid
+from bisect import bisect_left
+from contextlib import ExitStack
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+
+from cuentas.permissions import IsAdminRol
+
+
+logger = logging.getLogger(__name__)
+
+# Instrumentación por request.
+#
+# InstrumentacionMiddleware mide, por endpoint (la ruta de la URL, no el path concreto), el tiempo
+# total, las consultas a la base y su tiempo (connection.execute_wrapper en cada alias), el tiempo
+# de serialización (render de la respuesta: JSON de DRF, plantillas) y el tamaño de la respuesta
+# (las respuestas en streaming se miden cuando el cliente termina de leerlas: las consultas que hace
+# el generador, su tiempo y el detector de abajo incluyen el stream). Todo se acumula en histogramas
+# en memoria del proceso.
+#
+# Los workers de gunicorn comparten host y puerto, así que Prometheus no puede rasparlos por separado:
+# cada proceso vuelca su estado, a lo más cada INSTRUMENTACION_METRICAS_VOLCADO segundos y al salir,
+# en un archivo propio de INSTRUMENTACION_METRICAS_DIR, y metricas() expone la suma de todos los
+# archivos en formato de texto de Prometheus. Los archivos de procesos ya terminados se siguen sumando
+# (los contadores no retroceden al reciclarse un worker); el directorio se vacía en cada despliegue.
+#
+# Perfilado opcional (INSTRUMENTACION_PERFILADO): una fracción de los requests corre bajo cProfile y,
+# si supera INSTRUMENTACION_PERFIL_UMBRAL_MS, el perfil se guarda en INSTRUMENTACION_PERFIL_DIR
+# (se abre con `python -m pstats archivo.prof` o snakeviz). Se conservan los más recientes.
+#
+# Detector de consultas: cada sentencia se reduce a su huella (huella_sql: sin valores, con las
+# listas IN colapsadas). Si una misma huella se repite INSTRUMENTACION_N_MAS_1_UMBRAL veces en un
+# request, es la firma de un N+1 (un serializer que sigue una relación por fila): se registra un
+# aviso con la vista, la sentencia y la pila de la repetición. Las sentencias más lentas que
+# INSTRUMENTACION_CONSULTA_LENTA_MS se registran con la vista y la pila. Las vistas pueden declarar
+# `presupuesto_consultas` (ver presupuesto_de); excederlo se registra y, con INSTRUMENTACION_ESTRICTO
+# (activo en los tests, vía sistema_hospital.pruebas), lanza PresupuestoConsultasExcedido.
+
+SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Histograma:
+    __slots__ = ('limites', 'cuentas', 'suma', 'total')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.cuentas = [0] * (len(limites) + 1)  # la última es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.cuentas[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+class Registro:
+    """Histogramas y contadores con etiquetas, protegidos por un lock (los workers con hilos comparten el registro)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}
+        self._contadores = {}
+        self._ayuda = {}
+        self._archivo = None  # (pid, directorio, ruta) del volcado de este proceso
+        self._ultimo_volcado = None
+        self._lock_volcado = threading.Lock()
+
+    def describir(self, nombre, tipo, ayuda):
+        self._ayuda[nombre] = (tipo, ayuda)
+
+    def observar(self, nombre, limites, valor, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = Histograma(limites)
+            histograma.observar(valor)
+
+    def incrementar(self, nombre, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + 1
+
+    def limpiar(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._contadores.clear()
+
+    def _estado(self):
+        with self._lock:
+            return {
+                'histogramas': [
+                    [nombre, etiquetas, h.limites, list(h.cuentas), h.suma, h.total]
+                    for (nombre, etiquetas), h in self._histogramas.items()
+                ],
+                'contadores': [[nombre, etiquetas, valor] for (nombre, etiquetas), valor in self._contadores.items()],
+            }
+
+    def volcar(self, directorio, intervalo=0):
+        """Escribe el estado de este proceso en su archivo de `directorio`, si pasaron `intervalo` segundos del último volcado."""
+        ahora = time.monotonic()
+        if self._ultimo_volcado is not None and ahora - self._ultimo_volcado < intervalo:
+            return
+        if not self._lock_volcado.acquire(blocking=False):
+            return  # otro hilo del proceso está volcando
+        try:
+            self._ultimo_volcado = ahora
+            pid = os.getpid()
+            if self._archivo is None or self._archivo[:2] != (pid, directorio):
+                # Un nombre por proceso (y no solo por pid, que el sistema reutiliza).
+                os.makedirs(directorio, exist_ok=True)
+                self._archivo = (pid, directorio, os.path.join(directorio, f'metricas-{pid}-{uuid.uuid4().hex[:12]}.json'))
+                atexit.register(self.volcar, directorio)
+            ruta = self._archivo[2]
+            with open(f'{ruta}.tmp', 'w', encoding='utf-8') as archivo:
+                json.dump(self._estado(), archivo)
+            os.replace(f'{ruta}.tmp', ruta)
+        except OSError:
+            logger.exception("No se pudieron volcar las métricas en %s", directorio)
+        finally:
+            self._lock_volcado.release()
+
+    def texto_prometheus(self, directorio=None):
+        """El estado en formato de texto de Prometheus; con `directorio`, la suma de los volcados de todos los procesos."""
+        if directorio is None:
+            estados = [self._estado()]
+        else:
+            self.volcar(directorio)
+            estados = _leer_volcados(directorio)
+        sumados, contadores = {}, {}
+        for estado in estados:
+            for nombre, etiquetas, limites, cuentas, suma, total in estado['histogramas']:
+                clave = (nombre, tuple(map(tuple, etiquetas)))
+                acumulado = sumados.setdefault(clave, [tuple(limites), [0] * len(cuentas), 0.0, 0])
+                acumulado[1] = [a + b for a, b in zip(acumulado[1], cuentas)]
+                acumulado[2] += suma
+                acumulado[3] += total
+            for nombre, etiquetas, valor in estado['contadores']:
+                clave = (nombre, tuple(map(tuple, etiquetas)))
+                contadores[clave] = contadores.get(clave, 0) + valor
+        histogramas = sorted((k, cuentas, suma, total, limites) for k, (limites, cuentas, suma, total) in sumados.items())
+        contadores = sorted(contadores.items())
+        lineas = []
+        anterior = None
+        for (nombre, etiquetas), cuentas, suma, total, limites in histogramas:
+            if nombre != anterior:
+                lineas.extend(self._encabezado(nombre))
+                anterior = nombre
+            acumulado = 0
+            for limite, cuenta in zip((*limites, '+Inf'), cuentas):
+                acumulado += cuenta
+                lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas, le=limite)} {acumulado}")
+            lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {suma!r}")
+            lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {total}")
+        for (nombre, etiquetas), valor in contadores:
+            if nombre != anterior:
+                lineas.extend(self._encabezado(nombre))
+                anterior = nombre
+            lineas.append(f"{nombre}{_etiquetas(etiquetas)} {valor}")
+        return '\n'.join(lineas) + '\n'
+
+    def _encabezado(self, nombre):
+        tipo, ayuda = self._ayuda.get(nombre, ('untyped', ''))
+        return [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+
+
+def _leer_volcados(directorio):
+    try:
+        nombres = sorted(n for n in os.listdir(directorio) if n.startswith('metricas-') and n.endswith('.json'))
+    except FileNotFoundError:
+        return
+    for nombre in nombres:
+        try:
+            with open(os.path.join(directorio, nombre), encoding='utf-8') as archivo:
+                yield json.load(archivo)
+        except (OSError, ValueError):
+            logger.exception("Volcado de métricas ilegible: %s", nombre)
+
+
+def _etiquetas(etiquetas, **extra):
+    pares = [*etiquetas, *extra.items()]
+    if not pares:
+        return ''
+    escapar = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escapar(v)}"' for k, v in pares) + '}'
+
+
+registro = Registro()
+registro.describir('hospital_request_segundos', 'histogram', 'Tiempo total del request.')
+registro.describir('hospital_db_consultas', 'histogram', 'Consultas a la base por request.')
+registro.describir('hospital_db_segundos', 'histogram', 'Tiempo en la base por request.')
+registro.describir('hospital_serializacion_segundos', 'histogram', 'Tiempo de render de la respuesta por request.')
+registro.describir('hospital_respuesta_bytes', 'histogram', 'Tamaño del cuerpo de la respuesta.')
+registro.describir('hospital_requests_total', 'counter', 'Requests atendidos por endpoint, método y código.')
+registro.describir('hospital_consultas_lentas_total', 'counter', 'Sentencias sobre el umbral de consulta lenta.')
+registro.describir('hospital_n_mas_1_total', 'counter', 'Requests con una misma sentencia repetida sobre el umbral.')
+registro.describir('hospital_presupuesto_excedido_total', 'counter', 'Requests que superaron el presupuesto de consultas de la vista.')
+
+
+class PresupuestoConsultasExcedido(AssertionError):
+    pass
+
+
+_LITERALES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?+)'),           # IN (...) y filas de VALUES
+    (re.compile(r'\(\?\+\)(?:\s*,\s*\(\?\+\))+'), '(?+)+'),       # VALUES de varias filas
+    (re.compile(r'\s+'), ' '),
+)
+_SENTENCIAS_DML = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+# En la pila quedan el código del proyecto y el de DRF (el campo del serializer que hizo la consulta).
+_DJANGO = os.path.dirname(django.__file__)
+_STDLIB = sysconfig.get_path('stdlib')
+_PAQUETES = sysconfig.get_path('purelib')
+
+
+def huella_sql(sql):
+    """La sentencia sin valores: dos consultas que solo difieren en parámetros tienen la misma huella."""
+    # Las sentencias largas (bulk_create, IN enormes) casi no se repiten: no ocupan la caché.
+    return _huella(sql) if len(sql) <= 4096 else _huella.__wrapped__(sql)
+
+
+@functools.lru_cache(maxsize=1024)
+def _huella(sql):
+    for patron, reemplazo in _LITERALES:
+        sql = patron.sub(reemplazo, sql)
+    return sql.strip()
+
+
+def _pila():
+    """Los marcos que llevaron a la consulta actual, sin los de Django, la stdlib ni este módulo."""
+    marcos = [m for m in traceback.extract_stack()[:-2] if _marco_util(m.filename)]
+    return ''.join(traceback.format_list(marcos[-10:]))
+
+
+def _marco_util(ruta):
+    if ruta == __file__ or ruta.startswith(_DJANGO):
+        return False
+    return ruta.startswith(_PAQUETES) or not ruta.startswith(_STDLIB)
+
+
+def _vista(request):
+    coincidencia = getattr(request, 'resolver_match', None)
+    if coincidencia is None:
+        return 'sin_vista'
+    accion = getattr(coincidencia.func, 'actions', {}).get(request.method.lower())
+    return f"{coincidencia._func_path}.{accion}" if accion else coincidencia._func_path
+
+
+def presupuesto_consultas(consultas):
+    """Decorador para vistas función (aplicar por fuera de @api_view); las clases declaran el atributo."""
+    def decorar(vista):
+        vista.presupuesto_consultas = consultas
+        return vista
+    return decorar
+
+
+def presupuesto_de(request):
+    """
+    Consultas permitidas a la vista del request, o None si no declara presupuesto.
+    `presupuesto_consultas` es un entero o un dict acción -> entero, donde la acción es la del
+    ViewSet (list, retrieve, o una @action) o el método en minúsculas (get, post) en las demás
+    vistas; la clave '*' vale para las acciones no listadas.
+    """
+    coincidencia = getattr(request, 'resolver_match', None)
+    if coincidencia is None:
+        return None
+    vista = coincidencia.func
+    presupuesto = getattr(vista, 'presupuesto_consultas', None)
+    if presupuesto is None:
+        presupuesto = getattr(getattr(vista, 'cls', None), 'presupuesto_consultas', None)
+    if isinstance(presupuesto, dict):
+        metodo = request.method.lower()
+        accion = getattr(vista, 'actions', {}).get(metodo, metodo)
+        presupuesto = presupuesto.get(accion, presupuesto.get('*'))
+    return presupuesto
+
+
+class _MedicionRequest:
+    __slots__ = (
+        'request', 'consultas', 'segundos_db', 'inicio_render', 'segundos_render',
+        'huellas', 'repetidas', 'umbral_n_mas_1', 'umbral_lenta',
+    )
+
+    def __init__(self, request):
+        self.request = request
+        self.consultas = 0
+        self.segundos_db = 0.0
+        self.inicio_render = None
+        self.segundos_render = 0.0
+        self.huellas = {}
+        self.repetidas = {}  # huella -> pila de la repetición que alcanzó el umbral
+        self.umbral_n_mas_1 = settings.INSTRUMENTACION_N_MAS_1_UMBRAL
+        self.umbral_lenta = settings.INSTRUMENTACION_CONSULTA_LENTA_MS / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            segundos = time.perf_counter() - inicio
+            self.segundos_db += segundos
+            self.consultas += 1
+            if sql.lstrip()[:6].upper().startswith(_SENTENCIAS_DML):
+                huella = huella_sql(sql)
+                veces = self.huellas[huella] = self.huellas.get(huella, 0) + 1
+                if veces == self.umbral_n_mas_1:
+                    self.repetidas[huella] = _pila()
+            if segundos >= self.umbral_lenta:
+                self._consulta_lenta(sql, params, segundos)
+
+    def _consulta_lenta(self, sql, params, segundos):
+        vista = _vista(self.request)
+        registro.incrementar('hospital_consultas_lentas_total', endpoint=_endpoint(self.request))
+        logger.warning(
+            "Consulta lenta (%.0f ms) en %s:\n%s\nparámetros: %.300r\npila:\n%s",
+            segundos * 1000, vista, sql[:2000], params, _pila(),
+        )
+
+    def revisar(self, endpoint):
+        """Avisos de N+1 y del presupuesto de la vista, al terminar el request."""
+        if not self.repetidas and not self.consultas:
+            return
+        vista = _vista(self.request)
+        for huella, pila in self.repetidas.items():
+            registro.incrementar('hospital_n_mas_1_total', endpoint=endpoint)
+            logger.warning(
+                "Posible N+1 en %s: %d sentencias con la misma forma (de %d en el request):\n%s\npila:\n%s",
+                vista, self.huellas[huella], self.consultas, huella[:2000], pila,
+            )
+        presupuesto = presupuesto_de(self.request)
+        if presupuesto is not None and self.consultas > presupuesto:
+            registro.incrementar('hospital_presupuesto_excedido_total', endpoint=endpoint)
+            frecuentes = sorted(self.huellas.items(), key=lambda h: -h[1])[:5]
+            mensaje = (
+                f"{vista} hizo {self.consultas} consultas; su presupuesto es {presupuesto}. Las más repetidas:\n"
+                + '\n'.join(f"  {veces} x {huella[:300]}" for huella, veces in frecuentes)
+            )
+            if settings.INSTRUMENTACION_ESTRICTO:
+                raise PresupuestoConsultasExcedido(mensaje)
+            logger.warning(mensaje)
+
+
+def _endpoint(request):
+    coincidencia = getattr(request, 'resolver_match', None)
+    if coincidencia is None:
+        return 'sin_ruta'
+    return '/' + coincidencia.route if coincidencia.route else coincidencia.view_name
+
+
+class _StreamMedido:
+    """
+    Contenido de una respuesta en streaming que cierra la medición del request al agotarse o al
+    cerrarse (cliente que corta la descarga). Es un iterador con close() y no un generador porque el
+    `finally` de un generador que nunca empezó no corre, y la medición quedaría abierta.
+    """
+
+    def __init__(self, contenido, al_terminar):
+        self._contenido = iter(contenido)
+        self._al_terminar = al_terminar
+        self.tamano = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            bloque = next(self._contenido)
+        except StopIteration:
+            self.close()
+            raise
+        self.tamano += len(bloque)
+        return bloque
+
+    def close(self):
+        al_terminar, self._al_terminar = self._al_terminar, None
+        if al_terminar is None:
+            return
+        try:
+            if hasattr(self._contenido, 'close'):
+                self._contenido.close()
+        finally:
+            al_terminar(self.tamano)
+
+
+class InstrumentacionMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.INSTRUMENTACION_ACTIVA:
+            return self.get_response(request)
+
+        medicion = request._instrumentacion = _MedicionRequest(request)
+        perfil = None
+        if settings.INSTRUMENTACION_PERFILADO and random.random() < settings.INSTRUMENTACION_PERFIL_MUESTREO:
+            perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(medicion))
+            if perfil is not None:
+                perfil.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if perfil is not None:
+                    perfil.disable()
+            if response.streaming:
+                # El generador (stream_csv, ZIP de comprobantes) consulta la base mientras el cliente
+                # lee: los execute_wrapper y el reloj siguen abiertos hasta que el stream termina.
+                abiertos = pila.pop_all()
+
+                def al_terminar(tamano):
+                    abiertos.close()
+                    self._terminar(request, response, medicion, perfil, time.perf_counter() - inicio, tamano)
+                response.streaming_content = _StreamMedido(response.streaming_content, al_terminar)
+                return response
+        self._terminar(request, response, medicion, perfil, time.perf_counter() - inicio, len(response.content))
+        return response
+
+    def _terminar(self, request, response, medicion, perfil, segundos, tamano):
+        endpoint = _endpoint(request)
+        registro.observar('hospital_request_segundos', SEGUNDOS, segundos, endpoint=endpoint, metodo=request.method)
+        registro.observar('hospital_db_consultas', CONSULTAS, medicion.consultas, endpoint=endpoint)
+        registro.observar('hospital_db_segundos', SEGUNDOS, medicion.segundos_db, endpoint=endpoint)
+        registro.observar('hospital_serializacion_segundos', SEGUNDOS, medicion.segundos_render, endpoint=endpoint)
+        registro.observar('hospital_respuesta_bytes', BYTES, tamano, endpoint=endpoint)
+        registro.incrementar('hospital_requests_total', endpoint=endpoint, metodo=request.method, codigo=response.status_code)
+        registro.volcar(settings.INSTRUMENTACION_METRICAS_DIR, settings.INSTRUMENTACION_METRICAS_VOLCADO)
+
+        if perfil is not None and segundos * 1000 >= settings.INSTRUMENTACION_PERFIL_UMBRAL_MS:
+            _guardar_perfil(perfil, endpoint, request.method, segundos)
+        medicion.revisar(endpoint)
+
+    def process_template_response(self, request, response):
+        # Se llama justo antes de response.render() (DRF y TemplateResponse); el callback, justo después.
+        medicion = getattr(request, '_instrumentacion', None)
+        if medicion is not None:
+            medicion.inicio_render = time.perf_counter()
+
+            def fin_render(r):
+                medicion.segundos_render = time.perf_counter() - medicion.inicio_render
+            response.add_post_render_callback(fin_render)
+        return response
+
+
+_lock_perfiles = threading.Lock()
+
+
+def _guardar_perfil(perfil, endpoint, metodo, segundos):
+    directorio = settings.INSTRUMENTACION_PERFIL_DIR
+    nombre = '_'.join(p for p in endpoint.replace('<', '').replace('>', '').split('/') if p) or 'raiz'
+    archivo = f"{timezone.now():%Y%m%d_%H%M%S_%f}_{metodo}_{nombre[:80]}_{segundos * 1000:.0f}ms.prof"
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        perfil.dump_stats(os.path.join(directorio, archivo))
+        with _lock_perfiles:
+            perfiles = sorted(f for f in os.listdir(directorio) if f.endswith('.prof'))
+            for viejo in perfiles[:-settings.INSTRUMENTACION_PERFIL_MAXIMO]:
+                os.remove(os.path.join(directorio, viejo))
+    except OSError:
+        logger.exception("No se pudo guardar el perfil de %s %s", metodo, endpoint)
+        return
+    logger.info("Perfil de request lento guardado: %s", archivo)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminRol])
+def metricas(request):
+    """Métricas de todos los procesos en formato de texto de Prometheus (solo rol admin)."""
+    return HttpResponse(registro.texto_prometheus(settings.INSTRUMENTACION_METRICAS_DIR), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,43 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class _CursorKeyset(CursorPagination):
+    """CursorPagination que admite campos de orden a través de relaciones ('parto_asociado__fecha_parto')."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # La posición se lee de cada fila de la página: la relación del orden viene en el mismo SELECT.
+        relacion = self.ordering[0].lstrip('-').rpartition('__')[0]
+        if relacion:
+            queryset = queryset.select_related(relacion)
+        return super().paginate_queryset(queryset, request, view)
+
+    def _get_position_from_instance(self, instance, ordering):
+        valor = instance
+        for parte in ordering[0].lstrip('-').split('__'):
+            valor = getattr(valor, parte)
+        return str(valor)
+
+
+class PaginacionHibrida(PageNumberPagination):
+    """
+    Paginación por número de página (con COUNT) por defecto. Las vistas que declaran `orden_cursor`
+    permiten optar por keyset con ?paginacion=cursor (o al seguir un ?cursor= de una respuesta previa):
+    cada página filtra por el último valor visto en vez de usar OFFSET, así que cuesta lo mismo a
+    cualquier profundidad, y la respuesta no incluye `count`.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        orden = getattr(view, 'orden_cursor', None)
+        params = request.query_params
+        if orden and (params.get('paginacion') == 'cursor' or 'cursor' in params):
+            self.keyset = _CursorKeyset()
+            self.keyset.ordering = orden
+            self.keyset.page_size = self.page_size
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
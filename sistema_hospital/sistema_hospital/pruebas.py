@@ -0,0 +1,22 @@
+from django.test import override_settings
+
+
+# Ajustes comunes a todos los tests, declarados en las clases (y no deducidos de sys.argv en
+# settings.py) para que valgan con cualquier runner: manage.py test, pytest, un IDE.
+AJUSTES_PRUEBA = {
+    # Los tests corren dentro de transacciones que el hilo escritor no ve: ahí se escribe en línea.
+    'AUDITORIA_ASINCRONA': False,
+    # Exceder el presupuesto de consultas de una vista hace fallar el test (ver instrumentacion).
+    'INSTRUMENTACION_ESTRICTO': True,
+    # La caché compartida en memoria: nada de lo que escriben los tests queda en cache_compartida/
+    # (sobrevive entre tests de una misma clase; las clases que la usan la vacían en setUp).
+    'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas'},
+        'compartida': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas-compartida'},
+    },
+}
+
+
+def ajustes_prueba(clase):
+    """Decorador de clases de test: aplica AJUSTES_PRUEBA."""
+    return override_settings(**AJUSTES_PRUEBA)(clase)
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 # --- MIDDLEWARE ---
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',                   # CORS 
+    'sistema_hospital.instrumentacion.InstrumentacionMiddleware',  # Métricas por endpoint
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',              # WhiteNoise para archivos estáticos
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -131,11 +132,19 @@ SESSION_COOKIE_AGE = 1300
 # --- DRF & JWT ---
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication sin consulta por request (usuario desde los claims, ver cuentas.autenticacion)
+        'cuentas.autenticacion.JWTAutenticacionRapida',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'sistema_hospital.paginacion.PaginacionHibrida',
     'PAGE_SIZE': 15,
+    # Endpoints de login/2FA (cuentas.limites)
+    'DEFAULT_THROTTLE_RATES': {
+        'auth_ip': config('AUTH_LIMITE_IP', default='30/min'),
+        'auth_usuario': config('AUTH_LIMITE_USUARIO', default='10/min'),
+    },
 }
+# Dónde se cuentan los intentos: 'default' (memoria de cada proceso) o 'compartida' (todos los procesos)
+AUTH_LIMITE_CACHE = config('AUTH_LIMITE_CACHE', default='compartida')
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -143,6 +152,89 @@ SIMPLE_JWT = {
 }
 
 
+# --- CACHÉS ---
+# 'compartida' la ven todos los procesos (gunicorn, workers): versiones de invalidación y contadores.
+# Por defecto en archivos; en producción conviene Redis/Memcached vía CACHE_COMPARTIDA_BACKEND/LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'compartida': {
+        'BACKEND': config('CACHE_COMPARTIDA_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_COMPARTIDA_LOCATION', default=str(BASE_DIR / 'cache_compartida')),
+    },
+}
+# Alcance por equipo de MisRegistros (cuentas.equipos): entradas del LRU por proceso
+EQUIPOS_CACHE_MAXIMO = config('EQUIPOS_CACHE_MAXIMO', default=1024, cast=int)
+# Segundos que el tablero del supervisor vive en la caché compartida (se invalida al escribir).
+SUPERVISOR_TABLERO_TTL = config('SUPERVISOR_TABLERO_TTL', default=30, cast=int)
+# Ídem el panel de administración (cuentas.tablero), que se invalida con cada escritura de auditoría.
+ADMIN_TABLERO_TTL = config('ADMIN_TABLERO_TTL', default=60, cast=int)
+
+
+# --- REPORTES EN SEGUNDO PLANO (dashboard.TrabajoReporte) ---
+REPORTES_DIR = config('REPORTES_DIR', default=str(BASE_DIR / 'reportes_generados'))
+REPORTES_MAX_CONCURRENTES = config('REPORTES_MAX_CONCURRENTES', default=2, cast=int)
+# Archivos subidos a /api/importacion/partos/ a la espera del worker (se borran al importarlos).
+IMPORTACIONES_DIR = config('IMPORTACIONES_DIR', default=str(BASE_DIR / 'importaciones_pendientes'))
+
+# --- AUDITORÍA (auditoria.escritor) ---
+# Los tests lo desactivan con sistema_hospital.pruebas.ajustes_prueba (escriben en línea).
+AUDITORIA_ASINCRONA = config('AUDITORIA_ASINCRONA', default=True, cast=bool)
+AUDITORIA_SPOOL_DIR = config('AUDITORIA_SPOOL_DIR', default=str(BASE_DIR / 'spool_auditoria'))
+AUDITORIA_LOTE = config('AUDITORIA_LOTE', default=100, cast=int)
+AUDITORIA_INTERVALO = config('AUDITORIA_INTERVALO', default=1.0, cast=float)
+# Particiones mensuales (solo PostgreSQL) y archivado (auditoria.particiones)
+AUDITORIA_MESES_RETENCION = config('AUDITORIA_MESES_RETENCION', default=24, cast=int)
+AUDITORIA_ARCHIVO_DIR = config('AUDITORIA_ARCHIVO_DIR', default=str(BASE_DIR / 'archivo_auditoria'))
+
+# --- CACHÉ DE DOCUMENTOS PDF (dashboard.cache_documentos) ---
+DOCUMENTOS_CACHE_DIR = config('DOCUMENTOS_CACHE_DIR', default=str(BASE_DIR / 'cache_documentos'))
+DOCUMENTOS_CACHE_MAX_MB_DISCO = config('DOCUMENTOS_CACHE_MAX_MB_DISCO', default=500, cast=int)
+DOCUMENTOS_CACHE_MAX_MB_MEMORIA = config('DOCUMENTOS_CACHE_MAX_MB_MEMORIA', default=32, cast=int)
+# Cada cuántos segundos un proceso recuenta el disco para sumar lo que escribieron los demás.
+DOCUMENTOS_CACHE_RECUENTO = config('DOCUMENTOS_CACHE_RECUENTO', default=300, cast=int)
+COMPROBANTES_LOTE_MAXIMO = config('COMPROBANTES_LOTE_MAXIMO', default=1000, cast=int)
+# Procesos de render por worker web (dashboard.lote_comprobantes); se cierran tras la inactividad (segundos).
+COMPROBANTES_LOTE_WORKERS = config('COMPROBANTES_LOTE_WORKERS', default=min(2, os.cpu_count() or 1), cast=int)
+COMPROBANTES_LOTE_INACTIVIDAD = config('COMPROBANTES_LOTE_INACTIVIDAD', default=60, cast=int)
+
+
+# --- INSTRUMENTACIÓN (sistema_hospital.instrumentacion) ---
+INSTRUMENTACION_ACTIVA = config('INSTRUMENTACION_ACTIVA', default=True, cast=bool)
+# Volcados por proceso que /metricas/ suma; vaciar el directorio al desplegar.
+INSTRUMENTACION_METRICAS_DIR = config('INSTRUMENTACION_METRICAS_DIR', default=str(BASE_DIR / 'metricas'))
+INSTRUMENTACION_METRICAS_VOLCADO = config('INSTRUMENTACION_METRICAS_VOLCADO', default=5, cast=float)
+# Perfilado con cProfile de una fracción de los requests; se guardan los que superan el umbral.
+INSTRUMENTACION_PERFILADO = config('INSTRUMENTACION_PERFILADO', default=False, cast=bool)
+INSTRUMENTACION_PERFIL_MUESTREO = config('INSTRUMENTACION_PERFIL_MUESTREO', default=0.05, cast=float)
+INSTRUMENTACION_PERFIL_UMBRAL_MS = config('INSTRUMENTACION_PERFIL_UMBRAL_MS', default=1000, cast=int)
+INSTRUMENTACION_PERFIL_DIR = config('INSTRUMENTACION_PERFIL_DIR', default=str(BASE_DIR / 'perfiles'))
+INSTRUMENTACION_PERFIL_MAXIMO = config('INSTRUMENTACION_PERFIL_MAXIMO', default=200, cast=int)
+# Detector de consultas: sentencias lentas, N+1 (misma huella repetida) y presupuestos por vista.
+INSTRUMENTACION_CONSULTA_LENTA_MS = config('INSTRUMENTACION_CONSULTA_LENTA_MS', default=200, cast=int)
+INSTRUMENTACION_N_MAS_1_UMBRAL = config('INSTRUMENTACION_N_MAS_1_UMBRAL', default=5, cast=int)
+# Estricto: exceder el presupuesto de consultas de una vista lanza un error. Los tests lo activan
+# con sistema_hospital.pruebas.ajustes_prueba.
+INSTRUMENTACION_ESTRICTO = config('INSTRUMENTACION_ESTRICTO', default=False, cast=bool)
+
+# --- LOGGING ---
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'root': {'handlers': ['consola'], 'level': config('LOG_NIVEL', default='INFO')},
+    'loggers': {
+        'django': {'handlers': ['consola'], 'level': config('LOG_NIVEL_DJANGO', default='INFO'), 'propagate': False},
+    },
+}
+
+
 # --- CORS (Conexión con Frontend) ---
 CORS_ALLOW_ALL_ORIGINS = True
 
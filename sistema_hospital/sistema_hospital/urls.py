@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from two_factor.urls import urlpatterns as tf_urls
 from django.views.generic import RedirectView 
+from .instrumentacion import metricas
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -9,5 +10,6 @@ urlpatterns = [
     path('dashboard/', include('dashboard.urls')),
     path('cuentas/', include('cuentas.urls')),
     path('auditoria/', include('auditoria.urls')),
+    path('metricas/', metricas, name='metricas'),
     path('', RedirectView.as_view(pattern_name='two_factor:login', permanent=False)), 
 ]
\ No newline at end of file